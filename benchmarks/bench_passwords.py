@@ -0,0 +1,107 @@
+"""
+Login burst benchmark: scrypt verification on the request threads versus
+the bounded hashing process pool of social_network.utils.passwords.
+
+A burst of logins is spread over a fixed number of request threads while a
+probe thread keeps serving a cheap pure-Python "endpoint"; the script
+reports login throughput and latency, and the probe latency, i.e. how much
+the logins slow down every other request of the worker.
+
+Usage: python benchmarks/bench_passwords.py [logins] [request_threads]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from django.conf import settings  # noqa: E402
+
+N, R, P = 2**14, 8, 1
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def probe(stop, latencies):
+    # Stands in for a cheap request: ~0.2 ms of Python work
+    while not stop.is_set():
+        started = time.perf_counter()
+        sum(i * i for i in range(2000))
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.001)
+
+
+def burst(verify, logins, threads):
+    latencies, probe_latencies = [], []
+
+    def login():
+        started = time.perf_counter()
+        verify()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    stop = threading.Event()
+    prober = threading.Thread(target=probe, args=(stop, probe_latencies))
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in range(logins):
+            executor.submit(login)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    return elapsed, latencies, probe_latencies
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    workers = os.cpu_count() or 2
+    settings.configure(
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_MAX_PENDING=64,
+        PASSWORD_HASH_TIMEOUT=60,
+        PASSWORD_SCRYPT_N=N,
+        PASSWORD_SCRYPT_R=R,
+        PASSWORD_SCRYPT_P=P,
+    )
+
+    from social_network.utils import kdf, passwords
+
+    encoded = kdf.hash_password("secret", N, R, P)
+    # Start the workers before measuring
+    passwords.verify_password("secret", encoded)
+
+    cases = [
+        ("inline", lambda: kdf.verify_password("secret", encoded)),
+        ("pool", lambda: passwords.verify_password("secret", encoded)),
+    ]
+    print(
+        "{} logins, {} request threads, {} hash workers, "
+        "scrypt n={} r={} p={}".format(logins, threads, workers, N, R, P)
+    )
+    for name, verify in cases:
+        elapsed, latencies, probe_latencies = burst(verify, logins, threads)
+        print(
+            "{:<7} {:6.1f} logins/s  login p50 {:7.1f} ms p95 {:7.1f} ms"
+            "  probe p50 {:6.2f} ms p99 {:6.2f} ms".format(
+                name,
+                logins / elapsed,
+                statistics.median(latencies),
+                percentile(latencies, 0.95),
+                statistics.median(probe_latencies),
+                percentile(probe_latencies, 0.99),
+            )
+        )
+
+    passwords.hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Micro-benchmark: per-call Python time of the hot query builders.
+
+Compares building the queries with session.query() on every call (the
+previous implementation) against the cached lambda statements in
+operations.statements. Runs against an in-memory SQLite database so the
+numbers are dominated by statement construction and compilation.
+
+Usage: python benchmarks/bench_statements.py [iterations]
+"""
+import os
+import sys
+import timeit
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from operations import statements  # noqa: E402
+from operations.models import (  # noqa: E402
+    Base,
+    Comment,
+    GroupMembership,
+    Like,
+    Post,
+    SocialGroup,
+    User,
+)
+
+
+def seed(session):
+    group = SocialGroup(code=str(uuid.uuid4()), name="bench")
+    user = User(
+        code=str(uuid.uuid4()),
+        name="bench",
+        email_address="bench@example.com",
+        password="x",
+    )
+    session.add_all([group, user])
+    session.flush()
+    session.add(GroupMembership(user_id=user.id, group_id=group.id))
+    post = Post(
+        code=str(uuid.uuid4()),
+        user_id=user.id,
+        group_id=group.id,
+        content="bench",
+    )
+    session.add(post)
+    session.flush()
+    session.add(
+        Comment(
+            code=str(uuid.uuid4()),
+            user_id=user.id,
+            post_id=post.id,
+            content="bench",
+        )
+    )
+    session.add(
+        Like(code=str(uuid.uuid4()), user_id=user.id, post_id=post.id)
+    )
+    session.commit()
+    return group.code, post.code, user.id
+
+
+def query_membership(session, post_code, user_id):
+    return (
+        session.query(Post)
+        .join(GroupMembership, Post.group_id == GroupMembership.group_id)
+        .filter(
+            Post.code == post_code,
+            GroupMembership.user_id == user_id,
+            Post.deleted_at.is_(None),
+            GroupMembership.deleted_at.is_(None),
+        )
+        .all()
+    )
+
+
+def query_posts(session, group_code):
+    comments = (
+        session.query(
+            Comment.post_id,
+            func.count(Comment.post_id).label("total_comments"),
+        )
+        .filter(Comment.deleted_at.is_(None))
+        .group_by(Comment.post_id)
+    ).subquery()
+    likes = (
+        session.query(
+            Like.post_id, func.count(Like.post_id).label("total_likes")
+        )
+        .filter(Like.deleted_at.is_(None))
+        .group_by(Like.post_id)
+    ).subquery()
+    return (
+        session.query(
+            User.name,
+            Post.code.label("post_code"),
+            Post.content,
+            comments.c.total_comments,
+            likes.c.total_likes,
+        )
+        .join(SocialGroup, SocialGroup.id == Post.group_id)
+        .join(User, Post.user_id == User.id)
+        .outerjoin(comments, Post.id == comments.c.post_id)
+        .outerjoin(likes, Post.id == likes.c.post_id)
+        .filter(
+            SocialGroup.code == group_code,
+            SocialGroup.deleted_at.is_(None),
+            Post.deleted_at.is_(None),
+        )
+        .all()
+    )
+
+
+def stmt_membership(session, post_code, user_id):
+    return session.execute(
+        statements.member_post_id(post_code, user_id)
+    ).scalar()
+
+
+def stmt_posts(session, group_id):
+    # The handler resolves the group id from the in-process directory
+    return session.execute(statements.group_posts(group_id)).all()
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    engine = create_engine("sqlite://")
+    # The MySQL function defaults are not valid SQLite DDL
+    for table in Base.metadata.tables.values():
+        for column in table.columns:
+            default = column.server_default
+            if default is not None and not default.arg.text.isdigit():
+                column.server_default = None
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    group_code, post_code, user_id = seed(session)
+    group_id = session.execute(statements.group_by_code(group_code)).scalar()
+
+    cases = [
+        (
+            "membership check",
+            lambda: query_membership(session, post_code, user_id),
+            lambda: stmt_membership(session, post_code, user_id),
+        ),
+        (
+            "group post listing",
+            lambda: query_posts(session, group_code),
+            lambda: stmt_posts(session, group_id),
+        ),
+    ]
+
+    print("{} iterations per case".format(iterations))
+    for name, rebuilt, cached in cases:
+        # Warm up the compiled statement cache
+        rebuilt()
+        cached()
+        rebuilt_us = timeit.timeit(rebuilt, number=iterations)
+        cached_us = timeit.timeit(cached, number=iterations)
+        rebuilt_us = rebuilt_us / iterations * 1e6
+        cached_us = cached_us / iterations * 1e6
+        print(
+            "{:<20} query(): {:8.1f} us  lambda_stmt: {:8.1f} us"
+            "  saved: {:6.1f} us ({:.0%})".format(
+                name,
+                rebuilt_us,
+                cached_us,
+                rebuilt_us - cached_us,
+                1 - cached_us / rebuilt_us,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
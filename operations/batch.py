@@ -0,0 +1,208 @@
+"""
+Batch endpoint running many writes in one request and one transaction.
+
+Each sub-operation runs in its own SAVEPOINT, so a failing one is undone
+and reported without affecting the others, and the request's transaction
+commits everything that succeeded at once. Writes are always made in that
+transaction, never through the write-behind pipeline.
+"""
+import logging
+from typing import Tuple
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.versioning import NamespaceVersioning
+from rest_framework.views import APIView
+
+from operations import schemas
+from operations.comments import create_comment
+from operations.likes import toggle_like
+from operations.posts import create_post
+from social_network.utils import custom_exceptions as ce
+from social_network.utils.custom_validator import ThreadLocalValidator
+from social_network.utils.transactions import savepoint
+from users.views import insert_group_membership
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# Get an instance of Custom Validator
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
+
+# Request-scoped DB session (proxy to the current thread's Session)
+session = settings.DB_SESSION
+
+
+class VersioningConfig(NamespaceVersioning):
+    default_version = "v1"
+    allowed_versions = ["v1"]
+    version_param = "version"
+
+
+class BatchAPIView(APIView):
+    """
+    Run a list of post, like, comment and join operations.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        """
+        Run the operations in order, returns one result per operation.
+        """
+        try:
+            if request.version == "v1":
+                is_valid = c_validator.validate(
+                    request.data, schemas.BATCH_POST
+                )
+                errors = (
+                    validate_operations(request.data["operations"])
+                    if is_valid
+                    else c_validator.errors
+                )
+
+                if not errors:
+                    return run_batch(request)
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": errors,
+                        }
+                    )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.ValidationFailed as vf:
+            logger.error("BATCH API VIEW - POST: {}".format(vf))
+            raise
+
+        except ce.VersionNotSupported as vns:
+            logger.error("BATCH API VIEW - POST: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("BATCH API VIEW - POST: {}".format(e))
+            raise ce.InternalServerError
+
+
+def validate_operations(operations: list) -> dict:
+    """
+    Validate each operation against the schema of its kind, returns the
+    errors keyed by operation index.
+    """
+    errors = {}
+    for index, operation in enumerate(operations):
+        schema = schemas.BATCH_OPERATIONS.get(operation.get("op"))
+        if schema is None:
+            errors[index] = {
+                "op": [
+                    "must be one of {}".format(
+                        sorted(schemas.BATCH_OPERATIONS)
+                    )
+                ]
+            }
+        elif not c_validator.validate(operation, schema):
+            errors[index] = c_validator.errors
+    return errors
+
+
+def run_batch(request) -> Response:
+    """
+    Run every operation of the batch in its own savepoint.
+    """
+    results = []
+    for index, operation in enumerate(request.data["operations"]):
+        try:
+            with savepoint(session):
+                code, message, data = OPERATIONS[operation["op"]](
+                    operation, request.user
+                )
+        except ce.ErrorMSG as em:
+            code, message, data = em.status_code, str(em.detail), None
+        except Exception as e:
+            logger.error("RUN BATCH: {}".format(e))
+            code = status.HTTP_500_INTERNAL_SERVER_ERROR
+            message, data = "Internal Server Error", None
+
+        results.append(
+            {
+                "index": index,
+                "op": operation["op"],
+                "status": code,
+                "message": message,
+                "data": data,
+            }
+        )
+
+    return Response(
+        {
+            "message": "Batch processed",
+            "data": results,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def batch_create_post(operation: dict, user: dict) -> Tuple[int, str, dict]:
+    post = create_post(
+        group_code=operation["group_code"],
+        user_id=user["id"],
+        content=operation["content"],
+    )
+    if not post:
+        raise ce.ErrorMSG("Failed to create post")
+    return (
+        status.HTTP_201_CREATED,
+        "Post created successfully",
+        {"post_code": post.code},
+    )
+
+
+def batch_toggle_like(operation: dict, user: dict) -> Tuple[int, str, dict]:
+    if not toggle_like(
+        operation["post_code"], user["id"], allow_write_behind=False
+    ):
+        raise ce.ErrorMSG("Like not found or deletion failed")
+    return status.HTTP_204_NO_CONTENT, "Action performed successfully", None
+
+
+def batch_create_comment(
+    operation: dict, user: dict
+) -> Tuple[int, str, dict]:
+    comment = create_comment(
+        operation["post_code"],
+        user["id"],
+        operation["content"],
+        allow_write_behind=False,
+    )
+    if not comment:
+        raise ce.ErrorMSG("Failed to create comment")
+    return (
+        status.HTTP_201_CREATED,
+        "Comment created successfully",
+        {"comment_code": comment.code},
+    )
+
+
+def batch_join_group(operation: dict, user: dict) -> Tuple[int, str, dict]:
+    membership = insert_group_membership(
+        user_id=user["id"],
+        group_code=operation["group_code"],
+        user_code=user["code"],
+    )
+    if not membership:
+        raise ce.ErrorMSG("Unable to join group")
+    return status.HTTP_200_OK, "Joined group successfully", None
+
+
+# Operation name -> handler returning (status, message, data)
+OPERATIONS = {
+    "create_post": batch_create_post,
+    "toggle_like": batch_toggle_like,
+    "create_comment": batch_create_comment,
+    "join_group": batch_join_group,
+}
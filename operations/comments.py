@@ -1,7 +1,7 @@
 import hashlib
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import jwt
 from django.conf import settings
@@ -10,21 +10,26 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.versioning import NamespaceVersioning
 from rest_framework.views import APIView
+from sqlalchemy import insert
 
-from operations import schemas
+from operations import schemas, statements, versions, write_behind
+from operations.listing_cache import invalidate_group_listing
+from operations.membership import member_post, member_post_id
 from social_network.utils import custom_exceptions as ce
-from social_network.utils.custom_validator import CustomValidator
+from social_network.utils.custom_validator import ThreadLocalValidator
 from social_network.utils.data_formatter import (
     result_list_to_dict,
     result_row_to_dict,
 )
-from users.models import Comment, Post, User, GroupMembership
+from social_network.utils.codes import new_code
+from social_network.utils.pagination import decode_cursor, paginate
+from users.models import Comment
 
 # Get an instance of logger
 logger = logging.getLogger("operations")
 
 # Get an instance of Custom Validator
-c_validator = CustomValidator({}, allow_unknown=True)
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
 
 
 class VersioningConfig(NamespaceVersioning):
@@ -33,9 +38,12 @@ class VersioningConfig(NamespaceVersioning):
     version_param = "version"
 
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 
 class CommentsAPIView(APIView):
     """
@@ -51,8 +59,20 @@ class CommentsAPIView(APIView):
         """
         try:
             if request.version == "v1":
-                response = retrieve_comment(request, post_code)
-                return response
+                is_valid = c_validator.validate(
+                    request.query_params, schemas.COMMENT_GET
+                )
+
+                if is_valid:
+                    response = retrieve_comment(request, post_code)
+                    return response
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": c_validator.errors,
+                        }
+                    )
             else:
                 raise ce.VersionNotSupported
 
@@ -118,18 +138,77 @@ class CommentsAPIView(APIView):
             raise ce.InternalServerError
 
 
+class BulkCommentsAPIView(APIView):
+    """
+    Creates many comments on a post at once.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (AllowAny,)
+
+    def post(self, request, post_code):
+        """
+        Create the comments and return their codes in request order.
+        """
+        try:
+            if request.version == "v1":
+                is_valid = c_validator.validate(
+                    request.data, schemas.COMMENTS_BULK_POST
+                )
+
+                if is_valid:
+                    return create_comments_instance(request, post_code)
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": c_validator.errors,
+                        }
+                    )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.ErrorMSG as em:
+            logger.error("BULK COMMENTS API VIEW - POST: {}".format(em))
+            raise
+        except ce.ValidationFailed as vf:
+            logger.error("BULK COMMENTS API VIEW - POST: {}".format(vf))
+            raise
+
+        except ce.VersionNotSupported as vns:
+            logger.error("BULK COMMENTS API VIEW - POST: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("BULK COMMENTS API VIEW - POST: {}".format(e))
+            raise ce.InternalServerError
+
+
 def retrieve_comment(request, post_code) -> Response:
     """
     Retrieve comments on a post.
     """
     try:
-        comments = fetch_all_comments(post_code, request.user["id"])
+        limit = int(
+            request.query_params.get("limit", settings.PAGE_SIZE)
+        )
+        cursor = request.query_params.get("cursor")
+        newest_first = request.query_params.get("order") == "newest"
+
+        comments, next_cursor = fetch_all_comments(
+            post_code,
+            request.user["id"],
+            limit=limit,
+            cursor=decode_cursor(cursor) if cursor else None,
+            newest_first=newest_first,
+        )
 
         if comments:
             return Response(
                 {
                     "message": "Comment found successfully",
                     "data": comments,
+                    "next_cursor": next_cursor,
                 },
                 status=status.HTTP_200_OK,
             )
@@ -145,6 +224,9 @@ def retrieve_comment(request, post_code) -> Response:
     except ce.ErrorMSG as em:
         logger.error("RETRIEVE COMMENT: {}".format(em))
         raise
+    except ce.ValidationFailed as vf:
+        logger.error("RETRIEVE COMMENT: {}".format(vf))
+        raise
     except Exception as e:
         logger.error("RETRIEVE COMMENT: {}".format(e))
         raise ce.InternalServerError
@@ -192,83 +274,120 @@ def create_comment_instance(request, post_code) -> Response:
         raise ce.InternalServerError
 
 
-def fetch_all_comments(post_code: str, user_id: int) -> List[Comment]:
-    """Fetch all comments for a specific post."""
+def create_comments_instance(request, post_code) -> Response:
+    """
+    Create many comments on a post.
+    """
     try:
-        if not (
-            session.query(Post)
-            .join(
-                GroupMembership,
-                Post.group_id == GroupMembership.group_id,
-            )
-            .filter(
-                Post.code == post_code,
-                GroupMembership.user_id == user_id,
-                Post.deleted_at.is_(None),
-                GroupMembership.deleted_at.is_(None),
+        comment_codes = create_comments(
+            post_code=post_code,
+            user_id=request.user["id"],
+            contents=[
+                comment["content"] for comment in request.data["comments"]
+            ],
+        )
+        if comment_codes:
+            return Response(
+                {
+                    "message": "Comments created successfully",
+                    "data": {"comment_codes": comment_codes},
+                },
+                status=status.HTTP_201_CREATED,
             )
-            .all()
-        ):
+
+        return Response(
+            {
+                "message": "Failed to create comments",
+                "data": None,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    except ce.ErrorMSG as em:
+        logger.error("CREATE COMMENTS: {}".format(em))
+        raise
+    except Exception as e:
+        logger.error("CREATE COMMENTS: {}".format(e))
+        raise ce.InternalServerError
+
+
+def fetch_all_comments(
+    post_code: str,
+    user_id: int,
+    limit: int = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    newest_first: bool = False,
+) -> Tuple[List[Comment], Optional[str]]:
+    """
+    Fetch a page of comments for a specific post, oldest first unless
+    newest_first, along with the cursor of the next page.
+    """
+    limit = min(limit or settings.PAGE_SIZE, settings.MAX_PAGE_SIZE)
+    try:
+        post_id = member_post_id(read_session, post_code, user_id)
+        if post_id is None:
             raise ce.ErrorMSG("You are not member of this post group")
 
-        comments = (
-            session.query(
-                Comment.code.label("comment_code"),
-                User.name,
-                Comment.content,
+        # One extra row tells whether there is a next page
+        comments = read_session.execute(
+            statements.post_comments(
+                post_id,
+                limit=limit + 1,
+                cursor=cursor,
+                newest_first=newest_first,
             )
-            .join(Post, Post.id == Comment.post_id)
-            .join(User, Comment.user_id == User.id)
-            .filter(
-                Post.code == post_code,
-                Post.deleted_at.is_(None),
-                Comment.deleted_at.is_(None),
-            )
-            .all()
-        )
-        session.commit()
+        ).all()
 
-        comments = result_list_to_dict(comments) if comments else None
+        comments, next_cursor = paginate(
+            result_list_to_dict(comments), limit
+        )
+        comments = comments or None
 
     except ce.ErrorMSG as em:
         logger.error("FETCH ALL COMMENTS: {}".format(em))
-        session.rollback()
+        read_session.rollback()
         raise
     except Exception as e:
         logger.error("FETCH ALL COMMENTS: {}".format(e))
-        session.rollback()
-        comments = []
+        read_session.rollback()
+        comments, next_cursor = [], None
 
-    return comments
+    return comments, next_cursor
 
 
 def create_comment(
-    post_code: str, user_id: int, content: str
+    post_code: str,
+    user_id: int,
+    content: str,
+    allow_write_behind: bool = True,
 ) -> Optional[Comment]:
-    """Create a new comment on a post."""
+    """
+    Create a new comment on a post. With `allow_write_behind` False the
+    comment is always written in the request's own transaction.
+    """
     try:
-        post = (
-            session.query(Post)
-            .join(
-                GroupMembership,
-                Post.group_id == GroupMembership.group_id,
-            )
-            .filter(
-                Post.code == post_code,
-                GroupMembership.user_id == user_id,
-                Post.deleted_at.is_(None),
-                GroupMembership.deleted_at.is_(None),
-            )
-            .one_or_none()
-        )
-        if not post:
+        post = member_post(session, post_code, user_id)
+        if post is None:
             raise ce.ErrorMSG("You are not member of this post group")
+        post_id = post.id
+
+        if settings.WRITE_BEHIND and allow_write_behind:
+            # Returns once the batch holding the comment is committed
+            code = write_behind.submit_comment(post_id, user_id, content)
+            invalidate_group_listing(session, post.group_id)
+            return Comment(
+                code=code, user_id=user_id, post_id=post_id, content=content
+            )
 
         comment = Comment(
-            user_id=user_id, post_id=post.id, content=content
+            user_id=user_id, post_id=post_id, content=content
         )
         session.add(comment)
-        session.commit()
+        # Keep the post's comment total in the same transaction
+        session.execute(statements.adjust_comment_count(post_id, 1))
+        versions.bump(session, versions.group_posts(post.group_id))
+        session.flush()
+        invalidate_group_listing(session, post.group_id)
 
     except ce.ErrorMSG as em:
         logger.error("CREATE COMMENT: {}".format(em))
@@ -281,3 +400,52 @@ def create_comment(
         comment = None
 
     return comment
+
+
+def create_comments(
+    post_code: str, user_id: int, contents: List[str]
+) -> Optional[List[str]]:
+    """
+    Create comments on a post with multi-row INSERTs of BULK_CHUNK_SIZE
+    rows, returns their codes in order. Always written in the request's own
+    transaction, never through write-behind.
+    """
+    try:
+        post = member_post(session, post_code, user_id)
+        if post is None:
+            raise ce.ErrorMSG("You are not member of this post group")
+
+        # Codes are generated here, so no row has to be read back
+        rows = [
+            {
+                "code": new_code(),
+                "user_id": user_id,
+                "post_id": post.id,
+                "content": content,
+            }
+            for content in contents
+        ]
+        for start in range(0, len(rows), settings.BULK_CHUNK_SIZE):
+            session.execute(
+                insert(Comment).values(
+                    rows[start:start + settings.BULK_CHUNK_SIZE]
+                )
+            )
+
+        # Keep the post's comment total in the same transaction
+        session.execute(statements.adjust_comment_count(post.id, len(rows)))
+        versions.bump(session, versions.group_posts(post.group_id))
+        invalidate_group_listing(session, post.group_id)
+        comment_codes = [row["code"] for row in rows]
+
+    except ce.ErrorMSG as em:
+        logger.error("CREATE COMMENTS: {}".format(em))
+        session.rollback()
+        raise
+
+    except Exception as e:
+        logger.error("CREATE COMMENTS: {}".format(e))
+        session.rollback()
+        comment_codes = None
+
+    return comment_codes
@@ -0,0 +1,261 @@
+"""
+Home feed: the posts of every group a user is a member of, newest first.
+
+Feeds are precomputed (fan-out on write). create_post adds an entry to the
+timeline of each live member of the group, delete_post and delete_group
+retract the entries again, and joining a group copies in its
+FEED_BACKFILL most recent posts. Entries carry the post's creation time, so
+a feed read is one range of idx_timeline_user_created, ordered and paged by
+(created_at, post_id) like the group post listing.
+
+Joining a group trims the member's timeline to FEED_MAX_ENTRIES. Fan-out
+does not, it would cost a DELETE per member on every post; `manage.py
+trim_feeds` has to run periodically to bound the other timelines.
+"""
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.versioning import NamespaceVersioning
+from rest_framework.views import APIView
+from sqlalchemy import and_, delete, insert, literal, or_, select
+
+from operations import schemas, statements
+from operations.models import GroupMembership, Post, TimelineEntry
+from social_network.utils import custom_exceptions as ce
+from social_network.utils.custom_validator import ThreadLocalValidator
+from social_network.utils.data_formatter import result_list_to_dict
+from social_network.utils.pagination import decode_cursor, paginate
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# Get an instance of Custom Validator
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
+
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
+TIMELINE_COLUMNS = ["user_id", "post_id", "group_id", "created_at"]
+
+
+class VersioningConfig(NamespaceVersioning):
+    default_version = "v1"
+    allowed_versions = ["v1"]
+    version_param = "version"
+
+
+class FeedAPIView(APIView):
+    """
+    Home feed of the authenticated user.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        """
+        Retrieve a page of posts from all the user's groups.
+        """
+        try:
+            if request.version == "v1":
+                is_valid = c_validator.validate(
+                    request.query_params, schemas.FEED_GET
+                )
+
+                if is_valid:
+                    return retrieve_feed(request)
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": c_validator.errors,
+                        }
+                    )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.ValidationFailed as vf:
+            logger.error("FEED API VIEW - GET: {}".format(vf))
+            raise
+
+        except ce.VersionNotSupported as vns:
+            logger.error("FEED API VIEW - GET: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("FEED API VIEW - GET: {}".format(e))
+            raise ce.InternalServerError
+
+
+def retrieve_feed(request) -> Response:
+    """
+    Retrieve the user's feed.
+    """
+    try:
+        limit = int(
+            request.query_params.get("limit", settings.PAGE_SIZE)
+        )
+        cursor = request.query_params.get("cursor")
+
+        posts, next_cursor = fetch_feed(
+            user_id=request.user["id"],
+            limit=limit,
+            cursor=decode_cursor(cursor) if cursor else None,
+        )
+        if posts:
+            return Response(
+                {
+                    "message": "Feed found successfully",
+                    "data": posts,
+                    "next_cursor": next_cursor,
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        return Response(
+            {
+                "message": "Feed is empty",
+                "data": None,
+            },
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    except ce.ValidationFailed as vf:
+        logger.error("RETRIEVE FEED: {}".format(vf))
+        raise
+    except Exception as e:
+        logger.error("RETRIEVE FEED: {}".format(e))
+        raise ce.InternalServerError
+
+
+def fetch_feed(
+    user_id: int,
+    limit: int = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Post], Optional[str]]:
+    """
+    Fetch a page of the user's feed, newest first, along with the cursor of
+    the next page.
+    """
+    limit = min(limit or settings.PAGE_SIZE, settings.MAX_PAGE_SIZE)
+    try:
+        # One extra row tells whether there is a next page
+        posts = read_session.execute(
+            statements.user_feed(user_id, limit=limit + 1, cursor=cursor)
+        ).all()
+
+        posts, next_cursor = paginate(result_list_to_dict(posts), limit)
+        posts = posts or None
+
+    except Exception as e:
+        logger.error("FETCH FEED: {}".format(e))
+        read_session.rollback()
+        posts, next_cursor = [], None
+
+    return posts, next_cursor
+
+
+def fan_out_post(session, post_id: int, group_id: int) -> None:
+    """
+    Add a new post to the timeline of every live member of its group.
+    """
+    fan_out_posts(session, [post_id], group_id)
+
+
+def fan_out_posts(session, post_ids: List[int], group_id: int) -> None:
+    """
+    Add new posts of a group to the timeline of every live member, in one
+    statement.
+    """
+    entries = (
+        select(
+            GroupMembership.user_id, Post.id, Post.group_id, Post.created_at
+        )
+        .join(Post, Post.group_id == GroupMembership.group_id)
+        .where(
+            GroupMembership.group_id == group_id,
+            GroupMembership.deleted_at.is_(None),
+            Post.id.in_(post_ids),
+        )
+        .distinct()
+    )
+    session.execute(
+        insert(TimelineEntry)
+        .from_select(TIMELINE_COLUMNS, entries)
+        .prefix_with("IGNORE", dialect="mysql")
+    )
+
+
+def backfill_member(session, user_id: int, group_id: int) -> None:
+    """
+    Copy the most recent posts of a group into a new member's timeline,
+    then trim it to FEED_MAX_ENTRIES.
+    """
+    recent = (
+        select(literal(user_id), Post.id, Post.group_id, Post.created_at)
+        .where(Post.group_id == group_id, Post.deleted_at.is_(None))
+        # The order of idx_posts_group_created
+        .order_by(Post.created_at.desc(), Post.id.desc())
+        .limit(settings.FEED_BACKFILL)
+    )
+    session.execute(
+        insert(TimelineEntry)
+        .from_select(TIMELINE_COLUMNS, recent)
+        .prefix_with("IGNORE", dialect="mysql")
+    )
+    trim_timeline(session, user_id, settings.FEED_MAX_ENTRIES)
+
+
+def trim_timeline(session, user_id: int, max_entries: int) -> int:
+    """
+    Delete the entries of a user's timeline past its `max_entries` newest,
+    returns the number deleted.
+    """
+    # Newest entry past the cap, everything from it on is old
+    cutoff = session.execute(
+        select(TimelineEntry.created_at, TimelineEntry.post_id)
+        .where(TimelineEntry.user_id == user_id)
+        .order_by(
+            TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()
+        )
+        .offset(max_entries)
+        .limit(1)
+    ).first()
+    if cutoff is None:
+        return 0
+
+    return session.execute(
+        delete(TimelineEntry).where(
+            TimelineEntry.user_id == user_id,
+            or_(
+                TimelineEntry.created_at < cutoff.created_at,
+                and_(
+                    TimelineEntry.created_at == cutoff.created_at,
+                    TimelineEntry.post_id <= cutoff.post_id,
+                ),
+            ),
+        )
+    ).rowcount
+
+
+def retract_post(session, post_id: int) -> None:
+    """
+    Remove a post from every timeline.
+    """
+    session.execute(
+        delete(TimelineEntry).where(TimelineEntry.post_id == post_id)
+    )
+
+
+def retract_group(session, group_id: int) -> None:
+    """
+    Remove every post of a group from every timeline.
+    """
+    session.execute(
+        delete(TimelineEntry).where(TimelineEntry.group_id == group_id)
+    )
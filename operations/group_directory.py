@@ -0,0 +1,219 @@
+"""
+In-process directory of social groups, mapping each group code to its id
+and deletion time.
+
+The whole table is loaded when the app starts and reloaded every
+GROUP_DIRECTORY_REFRESH seconds by a background thread, which is how
+deletions made by other processes reach this one; lookups never wait for
+a reload and keep using the current map meanwhile. A code missing
+from the map, e.g. a group just created elsewhere, is looked up in the
+database and added. Creating or deleting a group updates the map of the
+process that served the write once its transaction commits; such writes
+are re-applied over a reload whose snapshot may have been read before
+they committed.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Optional
+
+from django.conf import settings
+from sqlalchemy import select
+
+from operations import statements
+from operations.models import SocialGroup
+from social_network.utils.cache import register_cache
+from social_network.utils.transactions import on_commit
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+GroupRef = namedtuple("GroupRef", ["id", "deleted_at"])
+
+
+class GroupDirectory:
+    def __init__(self, engine, refresh_seconds: float):
+        self.engine = engine
+        self.refresh_seconds = refresh_seconds
+        # group code -> GroupRef
+        self._groups = {}
+        # group code -> (time.monotonic() at commit, GroupRef) of the groups
+        # created or deleted by this process since the last reload began
+        self._committed = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        # Serializes changes to the map, each one swaps in a new dict
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def load(self) -> None:
+        """
+        Replace the map with every group in the database, keeping the
+        groups this process created or deleted while it was being read.
+        """
+        started = time.monotonic()
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(
+                    SocialGroup.code, SocialGroup.id, SocialGroup.deleted_at
+                )
+            ).all()
+
+        groups = {
+            str(code): GroupRef(group_id, deleted_at)
+            for code, group_id, deleted_at in rows
+        }
+        with self._write_lock:
+            for group_code, (committed_at, group) in list(
+                self._committed.items()
+            ):
+                if committed_at < started:
+                    # Committed before the read, the snapshot has it
+                    del self._committed[group_code]
+                else:
+                    groups[group_code] = group
+            # Swapped in one assignment, readers never see a partial map
+            self._groups = groups
+        self._loaded_at = time.monotonic()
+        with self._stats_lock:
+            self.reloads += 1
+
+    def resolve(self, session, group_code: str) -> Optional[GroupRef]:
+        """
+        Id and deletion time of the group, or None if there is no such
+        group. `session` answers codes missing from the map.
+        """
+        self.start()
+        group_code = str(group_code).lower()
+        group = self._groups.get(group_code)
+        with self._stats_lock:
+            if group is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if group is not None:
+            return group
+
+        row = session.execute(statements.group_by_code(group_code)).first()
+        if row is None:
+            return None
+
+        group = GroupRef(row.id, row.deleted_at)
+        self._put(group_code, group)
+        return group
+
+    def resolve_live(self, session, group_code: str) -> Optional[GroupRef]:
+        """
+        Like resolve(), but None for a deleted group as well.
+        """
+        group = self.resolve(session, group_code)
+        if group is None or group.deleted_at is not None:
+            return None
+        return group
+
+    def remember(self, session, group: SocialGroup) -> None:
+        """
+        Record a created or deleted group once `session` commits. Until
+        then the entry is dropped, so lookups go to the database.
+        """
+        group_code = str(group.code).lower()
+        ref = GroupRef(group.id, group.deleted_at)
+        self._pop(group_code)
+        on_commit(session, lambda: self._put(group_code, ref, committed=True))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            hits, misses, reloads = self.hits, self.misses, self.reloads
+        lookups = hits + misses
+        return {
+            "size": len(self._groups),
+            "refresh": self.refresh_seconds,
+            "age": (
+                round(time.monotonic() - self._loaded_at, 1)
+                if self._loaded_at is not None
+                else None
+            ),
+            "reloads": reloads,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _put(
+        self, group_code: str, group: GroupRef, committed: bool = False
+    ) -> None:
+        with self._write_lock:
+            if committed:
+                self._committed[group_code] = (time.monotonic(), group)
+            groups = dict(self._groups)
+            groups[group_code] = group
+            self._groups = groups
+
+    def _pop(self, group_code: str) -> None:
+        with self._write_lock:
+            groups = dict(self._groups)
+            groups.pop(group_code, None)
+            self._groups = groups
+
+    def start(self) -> None:
+        """
+        Start the background refresher, once.
+        """
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="group-directory", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            if self._loaded_at is not None:
+                age = time.monotonic() - self._loaded_at
+                if age < self.refresh_seconds:
+                    time.sleep(self.refresh_seconds - age)
+                    continue
+            try:
+                self.load()
+            except Exception as e:
+                logger.error("GROUP DIRECTORY RELOAD: {}".format(e))
+                # Retry after another period rather than in a tight loop
+                time.sleep(self.refresh_seconds)
+
+
+group_directory = GroupDirectory(
+    engine=settings.ENGINE,
+    refresh_seconds=settings.GROUP_DIRECTORY_REFRESH,
+)
+register_cache("group_directory", group_directory)
+
+
+def resolve_group(session, group_code: str) -> Optional[GroupRef]:
+    return group_directory.resolve(session, group_code)
+
+
+def resolve_live_group(session, group_code: str) -> Optional[GroupRef]:
+    return group_directory.resolve_live(session, group_code)
+
+
+def remember_group(session, group: SocialGroup) -> None:
+    group_directory.remember(session, group)
+
+
+def preload() -> None:
+    """
+    Load the directory at startup and start its refresher; a failure
+    leaves the load to the refresher.
+    """
+    try:
+        group_directory.load()
+    except Exception as e:
+        logger.error("GROUP DIRECTORY PRELOAD: {}".format(e))
+    group_directory.start()
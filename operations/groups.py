@@ -12,22 +12,25 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.versioning import NamespaceVersioning
 from rest_framework.views import APIView
-from sqlalchemy import and_
 
 from social_network.utils import custom_exceptions as ce
-from social_network.utils.custom_validator import CustomValidator
+from social_network.utils.custom_validator import ThreadLocalValidator
 from social_network.utils.data_formatter import (
     result_list_to_dict,
     result_row_to_dict,
 )
-from operations import schemas
-from operations.models import GroupMembership, SocialGroup, User
+from operations import schemas, statements, versions
+from operations.feed import retract_group
+from operations.group_directory import remember_group
+from operations.listing_cache import invalidate_group_listing
+from operations.membership import invalidate_group
+from operations.models import SocialGroup
 
 # Get an instance of logger
 logger = logging.getLogger("operations")
 
 # Get an instance of Custom Validator
-c_validator = CustomValidator({}, allow_unknown=True)
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
 
 
 class VersioningConfig(NamespaceVersioning):
@@ -36,9 +39,12 @@ class VersioningConfig(NamespaceVersioning):
     version_param = "version"
 
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 
 class SocialGroupsAPIView(APIView):
     """
@@ -170,6 +176,16 @@ def retrieve_group(request) -> Response:
         group_code = request.query_params.get("group_code")
         user_code = request.query_params.get("user_code")
 
+        resources = [versions.GROUPS]
+        if user_code:
+            resources.append(versions.user_groups(user_code))
+        etag = versions.etag(
+            request, versions.current(read_session, resources)
+        )
+        not_modified = versions.not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         groups = fetch_groups(
             group_code=group_code, user_code=user_code
         )
@@ -180,6 +196,7 @@ def retrieve_group(request) -> Response:
                     "data": groups,
                 },
                 status=status.HTTP_200_OK,
+                headers={"ETag": etag},
             )
 
         return Response(
@@ -282,35 +299,15 @@ def fetch_groups(
     Returns a list of social groups or an empty list if none are found.
     """
     try:
-        groups = session.query(
-            SocialGroup.code.label("group_code"),
-            SocialGroup.name,
-            SocialGroup.description,
-        ).filter(SocialGroup.deleted_at.is_(None))
-
-        if group_code:
-            groups = groups.filter(SocialGroup.code == group_code)
-        if user_code:
-            groups = groups.join(
-                GroupMembership,
-                SocialGroup.id == GroupMembership.group_id,
-            ).join(
-                User,
-                and_(
-                    GroupMembership.user_id == User.id,
-                    User.code == user_code,
-                    GroupMembership.deleted_at.is_(None),
-                ),
-            )
-
-        groups = groups.all()
-        session.commit()
+        groups = read_session.execute(
+            statements.groups(group_code=group_code, user_code=user_code)
+        ).all()
 
         groups = result_list_to_dict(groups) if groups else None
 
     except Exception as e:
         logger.error("FETCH GROUPS: {}".format(e))
-        session.rollback()
+        read_session.rollback()
         groups = []
 
     return groups
@@ -325,7 +322,9 @@ def create_group(name: str, description: str) -> Optional[SocialGroup]:
     try:
         group = SocialGroup(name=name, description=description)
         session.add(group)
-        session.commit()
+        versions.bump(session, versions.GROUPS)
+        session.flush()
+        remember_group(session, group)
     except alchexc.IntegrityError as ie:
         logger.error("CREATE GROUP: {}".format(ie))
         session.rollback()
@@ -352,7 +351,12 @@ def delete_group(group_code: str) -> bool:
         )
         if group:
             group.deleted_at = datetime.now()
-            session.commit()
+            versions.bump(session, versions.GROUPS)
+            session.flush()
+            retract_group(session, group.id)
+            invalidate_group(session, group.id)
+            invalidate_group_listing(session, group.id)
+            remember_group(session, group)
             return True
     except Exception as e:
         logger.error("DELETE GROUP: {}".format(e))
@@ -1,7 +1,7 @@
 import hashlib
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 import jwt
 from django.conf import settings
@@ -12,20 +12,26 @@ from rest_framework.versioning import NamespaceVersioning
 from rest_framework.views import APIView
 
 from social_network.utils import custom_exceptions as ce
-from social_network.utils.custom_validator import CustomValidator
+from social_network.utils.custom_validator import ThreadLocalValidator
 from social_network.utils.data_formatter import result_list_to_dict
-from operations import schemas
-from operations.models import Like, Post, User, GroupMembership
+from social_network.utils.pagination import decode_cursor, paginate
+from operations import schemas, statements, versions, write_behind
+from operations.listing_cache import invalidate_group_listing
+from operations.membership import member_post, member_post_id
+from operations.models import Like
 
 # Get an instance of logger
 logger = logging.getLogger("operations")
 
 # Get an instance of Custom Validator
-c_validator = CustomValidator({}, allow_unknown=True)
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 
 class VersioningConfig(NamespaceVersioning):
     default_version = "v1"
@@ -47,9 +53,20 @@ class LikesAPIView(APIView):
         """
         try:
             if request.version == "v1":
-
-                response = retrieve_like(request, post_code)
-                return response
+                is_valid = c_validator.validate(
+                    request.query_params, schemas.LIKE_GET
+                )
+
+                if is_valid:
+                    response = retrieve_like(request, post_code)
+                    return response
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": c_validator.errors,
+                        }
+                    )
 
             else:
                 raise ce.VersionNotSupported
@@ -100,15 +117,44 @@ class LikesAPIView(APIView):
 
 def retrieve_like(request, post_code) -> Response:
     """
-    Retrieve likes on a specific post.
+    Retrieve likes on a specific post: only the total with `count`, the
+    total and the first likers with `sample`, a page of likers otherwise.
     """
     try:
-        likes = fetch_all_likes(post_code, request.user["id"])
+        params = request.query_params
+        count_only = str(params.get("count", "")).lower() in ("true", "1")
+        sample = int(params.get("sample", 0))
+
+        if count_only or sample:
+            summary = fetch_like_summary(
+                post_code, request.user["id"], sample=sample
+            )
+            if summary is None:
+                raise ce.InternalServerError
+
+            return Response(
+                {
+                    "message": "Likes found successfully",
+                    "data": summary,
+                },
+                status=status.HTTP_200_OK,
+            )
+
+        limit = int(params.get("limit", settings.PAGE_SIZE))
+        cursor = params.get("cursor")
+
+        likes, next_cursor = fetch_all_likes(
+            post_code,
+            request.user["id"],
+            limit=limit,
+            cursor=decode_cursor(cursor) if cursor else None,
+        )
         if likes:
             return Response(
                 {
                     "message": "Likes found successfully",
                     "data": likes,
+                    "next_cursor": next_cursor,
                 },
                 status=status.HTTP_200_OK,
             )
@@ -124,6 +170,9 @@ def retrieve_like(request, post_code) -> Response:
     except ce.ErrorMSG as em:
         logger.error("RETRIEVE LIKE: {}".format(em))
         raise
+    except ce.ValidationFailed as vf:
+        logger.error("RETRIEVE LIKE: {}".format(vf))
+        raise
     except Exception as e:
         logger.error("RETRIEVE LIKE: {}".format(e))
         raise ce.InternalServerError
@@ -162,95 +211,121 @@ def toggle_like_instance(request, post_code) -> Response:
         raise ce.InternalServerError
 
 
-def fetch_all_likes(post_code: str, user_id: int) -> List[Like]:
+def fetch_member_post_id(post_code: str, user_id: int) -> int:
     """
-    Fetch all likes for a specific post.
+    Resolve a post the user can see to its id.
+    """
+    post_id = member_post_id(read_session, post_code, user_id)
+    if post_id is None:
+        raise ce.ErrorMSG("You are not member of this post group")
+
+    return post_id
+
+
+def fetch_like_summary(
+    post_code: str, user_id: int, sample: int = 0
+) -> Optional[dict]:
+    """
+    Count the live likes on a post, along with the names of the first
+    `sample` likers when requested.
     """
     try:
-        if not (
-            session.query(Post)
-            .join(
-                GroupMembership,
-                Post.group_id == GroupMembership.group_id,
-            )
-            .filter(
-                Post.code == post_code,
-                GroupMembership.user_id == user_id,
-                Post.deleted_at.is_(None),
-                GroupMembership.deleted_at.is_(None),
-            )
-            .all()
-        ):
-            raise ce.ErrorMSG("You are not member of this post group")
+        post_id = fetch_member_post_id(post_code, user_id)
+
+        summary = {
+            "post_code": post_code,
+            "total_likes": read_session.execute(
+                statements.post_like_total(post_id)
+            ).scalar(),
+        }
+        if sample:
+            likers = read_session.execute(
+                statements.post_likers(post_id, limit=sample)
+            ).all()
+            summary["likers"] = [liker.name for liker in likers]
 
-        likes = (
-            session.query(User.name, Post.code.label("post_code"))
-            .join(Like, Post.id == Like.post_id)
-            .join(User, Like.user_id == User.id)
-            .filter(
-                Post.code == post_code,
-                Post.deleted_at.is_(None),
-                Like.deleted_at.is_(None),
-            )
-            .all()
-        )
-        session.commit()
+    except ce.ErrorMSG as em:
+        logger.error("FETCH LIKE SUMMARY: {}".format(em))
+        read_session.rollback()
+        raise
+    except Exception as e:
+        logger.error("FETCH LIKE SUMMARY: {}".format(e))
+        read_session.rollback()
+        summary = None
+
+    return summary
+
+
+def fetch_all_likes(
+    post_code: str,
+    user_id: int,
+    limit: int = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+) -> Tuple[List[Like], Optional[str]]:
+    """
+    Fetch a page of likers of a specific post, oldest like first, along with
+    the cursor of the next page.
+    """
+    limit = min(limit or settings.PAGE_SIZE, settings.MAX_PAGE_SIZE)
+    try:
+        post_id = fetch_member_post_id(post_code, user_id)
 
-        likes = result_list_to_dict(likes) if likes else None
+        # One extra row tells whether there is a next page
+        likes = read_session.execute(
+            statements.post_likers(post_id, limit=limit + 1, cursor=cursor)
+        ).all()
+
+        likes, next_cursor = paginate(result_list_to_dict(likes), limit)
+        likes = likes or None
 
     except ce.ErrorMSG as em:
         logger.error("FETCH ALL LIKES: {}".format(em))
-        session.rollback()
+        read_session.rollback()
         raise
     except Exception as e:
         logger.error("FETCH ALL LIKES: {}".format(e))
-        session.rollback()
-        likes = []
+        read_session.rollback()
+        likes, next_cursor = [], None
 
-    return likes
+    return likes, next_cursor
 
 
-def toggle_like(post_code: str, user_id: int) -> Optional[Like]:
+def toggle_like(
+    post_code: str, user_id: int, allow_write_behind: bool = True
+) -> Optional[Like]:
     """
-    Toggle like status for a post by a user.
+    Toggle like status for a post by a user. With `allow_write_behind`
+    False the toggle is always made in the request's own transaction.
     """
     try:
-        post = (
-            session.query(Post)
-            .join(
-                GroupMembership,
-                Post.group_id == GroupMembership.group_id,
-            )
-            .filter(
-                Post.code == post_code,
-                GroupMembership.user_id == user_id,
-                Post.deleted_at.is_(None),
-                GroupMembership.deleted_at.is_(None),
-            )
-            .one_or_none()
-        )
-        if not post:
+        post = member_post(session, post_code, user_id)
+        if post is None:
             raise ce.ErrorMSG("You are not member of this post group")
-
-        # Check if the user has already liked this post
-        existing_like = (
-            session.query(Like)
-            .filter(Like.post_id == post.id, Like.user_id == user_id)
-            .one_or_none()
+        post_id = post.id
+
+        if settings.WRITE_BEHIND and allow_write_behind:
+            # Returns once the batch holding the toggle is committed
+            result = write_behind.submit_like_toggle(post_id, user_id)
+            invalidate_group_listing(session, post.group_id)
+            return result
+
+        # Like, unlike or like again in one write, then read the outcome
+        session.execute(
+            statements.flip_likes(
+                session.get_bind().dialect.name, [(post_id, user_id)]
+            )
         )
-        if existing_like:
-            if existing_like.deleted_at is not None:
-                existing_like.deleted_at = None
-            else:
-                existing_like.deleted_at = datetime.now()
-
-            session.commit()
-            return True
-        else:
-            like = Like(user_id=user_id, post_id=post.id)
-            session.add(like)
-            session.commit()
-            return True
+        deleted_at = session.execute(
+            statements.user_like(post_id, user_id)
+        ).scalar_one()
+        delta = 1 if deleted_at is None else -1
+
+        # Keep the post's like total in the same transaction
+        session.execute(statements.adjust_like_count(post_id, delta))
+        versions.bump(session, versions.group_posts(post.group_id))
+        session.flush()
+        invalidate_group_listing(session, post.group_id)
+        return True
 
     except ce.ErrorMSG as em:
         logger.error("CREATE LIKE: {}".format(em))
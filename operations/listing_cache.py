@@ -0,0 +1,57 @@
+"""
+In-process cache of group post listing pages.
+
+Pages are keyed by group, the group's post listing version (see
+operations.versions), the requested post code, page size and cursor. A
+write to the group in any process bumps that version, so a cached page is
+never served once the data behind it changed; writes served here also drop
+the group's pages at once to free the memory. Pages otherwise expire after
+GROUP_POSTS_CACHE_TTL seconds.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from social_network.utils.cache import TTLCache
+from social_network.utils.transactions import on_commit
+
+listing_cache = TTLCache(
+    "group_posts",
+    maxsize=settings.GROUP_POSTS_CACHE_SIZE,
+    ttl=settings.GROUP_POSTS_CACHE_TTL,
+)
+
+
+def page_key(
+    group_id: int,
+    version: int,
+    post_code: Optional[str],
+    limit: int,
+    cursor: Optional[Tuple[datetime, int]],
+) -> tuple:
+    return (group_id, version, post_code, limit, cursor)
+
+
+def get_page(key: tuple):
+    """
+    The cached (posts, next_cursor) of a page, or None.
+    """
+    return listing_cache.get(key, None)
+
+
+def set_page(key: tuple, posts, next_cursor: Optional[str]) -> None:
+    listing_cache.set(key, (posts, next_cursor))
+
+
+def invalidate_group_listing(session, group_id: int) -> None:
+    """
+    Drop every cached page of the group, now and once `session` commits.
+    """
+
+    def drop():
+        listing_cache.pop_where(lambda key: key[0] == group_id)
+
+    drop()
+    on_commit(session, drop)
+
@@ -0,0 +1,253 @@
+import logging
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sqlalchemy import select
+
+from operations import statements, versions
+from operations.models import Post, SocialGroup, User
+from service_auth.auth import token_user
+from service_auth.views import login_user, user_by_criteria
+from users.views import user_details
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# EXPLAIN access types that read the whole table or index
+FULL_SCANS = {"ALL": "full table scan", "index": "full index scan"}
+
+
+def fetch_sample(connection) -> Optional[dict]:
+    """
+    Real key values to explain the queries with, so the optimizer sees
+    the same selectivity as in production.
+    """
+    row = connection.execute(
+        select(
+            Post.id.label("post_id"),
+            Post.code.label("post_code"),
+            Post.created_at,
+            SocialGroup.id.label("group_id"),
+            SocialGroup.code.label("group_code"),
+            User.id.label("user_id"),
+            User.code.label("user_code"),
+            User.email_address,
+        )
+        .join(SocialGroup, SocialGroup.id == Post.group_id)
+        .join(User, User.id == Post.user_id)
+        .where(Post.deleted_at.is_(None))
+        .limit(1)
+    ).first()
+    return dict(row._mapping) if row is not None else None
+
+
+def hot_queries(sample: dict) -> list:
+    """
+    The queries issued by the request handlers of operations/, users/ and
+    service_auth/, built by the same functions the handlers call, with
+    the parameters they are called with.
+    """
+    page = settings.PAGE_SIZE + 1
+    cursor = (sample["created_at"], sample["post_id"])
+    return [
+        (
+            "operations.versions.current",
+            versions.stamps(
+                [versions.GROUPS, versions.group_posts(sample["group_id"])]
+            ),
+        ),
+        (
+            "operations.groups.fetch_groups",
+            statements.groups(group_code=sample["group_code"]),
+        ),
+        (
+            "operations.groups.fetch_groups (user_code)",
+            statements.groups(user_code=sample["user_code"]),
+        ),
+        (
+            "operations.posts.fetch_all_posts",
+            statements.group_posts(sample["group_id"], limit=page),
+        ),
+        (
+            "operations.posts.fetch_all_posts (cursor)",
+            statements.group_posts(
+                sample["group_id"], limit=page, cursor=cursor
+            ),
+        ),
+        (
+            "operations.posts.fetch_all_posts (post_code)",
+            statements.group_posts(
+                sample["group_id"], post_code=sample["post_code"]
+            ),
+        ),
+        (
+            "operations.group_directory.resolve_group",
+            statements.group_by_code(sample["group_code"]),
+        ),
+        (
+            "operations.posts.delete_post",
+            statements.post_entity(sample["post_code"]),
+        ),
+        (
+            "operations.post_cache.resolve_post",
+            statements.post_by_code(sample["post_code"]),
+        ),
+        (
+            "operations.membership.is_member, "
+            "users.views.insert_group_membership",
+            statements.live_membership(sample["user_id"], sample["group_id"]),
+        ),
+        (
+            "operations.feed.fetch_feed",
+            statements.user_feed(sample["user_id"], limit=page),
+        ),
+        (
+            "operations.feed.fetch_feed (cursor)",
+            statements.user_feed(
+                sample["user_id"], limit=page, cursor=cursor
+            ),
+        ),
+        (
+            "operations.comments.fetch_all_comments",
+            statements.post_comments(sample["post_id"], limit=page),
+        ),
+        (
+            "operations.comments.fetch_all_comments (newest)",
+            statements.post_comments(
+                sample["post_id"], limit=page, newest_first=True
+            ),
+        ),
+        (
+            "operations.likes.fetch_like_summary",
+            statements.post_like_total(sample["post_id"]),
+        ),
+        (
+            "operations.likes.fetch_all_likes",
+            statements.post_likers(sample["post_id"], limit=page),
+        ),
+        (
+            "operations.likes.toggle_like",
+            statements.user_like(sample["post_id"], sample["user_id"]),
+        ),
+        (
+            "users.views.fetch_user_details",
+            user_details(user_code=sample["user_code"]),
+        ),
+        (
+            "service_auth.auth.fetch_user_by_criteria",
+            token_user(sample["user_code"]),
+        ),
+        (
+            "service_auth.views.authenticate_user",
+            login_user(sample["email_address"]),
+        ),
+        (
+            "service_auth.views.fetch_user",
+            user_by_criteria(user_code=sample["user_code"]),
+        ),
+    ]
+
+
+def bind_params(compiled) -> dict:
+    """
+    Parameters of a compiled statement as the driver receives them, each
+    processed by its type (codes become BINARY(16) values in binary
+    storage).
+    """
+    processors = compiled._bind_processors
+    return {
+        name: processors[name](value) if name in processors else value
+        for name, value in compiled.construct_params().items()
+    }
+
+
+def explain(connection, statement) -> list:
+    """
+    EXPLAIN rows of a statement, bound with its own parameters.
+    """
+    compiled = statement.compile(dialect=connection.dialect)
+    params = bind_params(compiled)
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    return (
+        connection.exec_driver_sql("EXPLAIN " + str(compiled), params)
+        .mappings()
+        .all()
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the hot queries of operations/, users/ and "
+        "service_auth/ and flag the ones that scan a whole table or index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="Exit with an error when a full scan is found",
+        )
+
+    def handle(self, *args, **options):
+        flagged = []
+        try:
+            with settings.ENGINE.connect() as connection:
+                sample = fetch_sample(connection)
+                if sample is None:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            "No live posts found, explaining with "
+                            "placeholder values; plans on empty tables "
+                            "may not match production"
+                        )
+                    )
+                    placeholder = str(uuid.UUID(int=0))
+                    sample = {
+                        "post_id": 0,
+                        "post_code": placeholder,
+                        "created_at": datetime.now(),
+                        "group_id": 0,
+                        "group_code": placeholder,
+                        "user_id": 0,
+                        "user_code": placeholder,
+                        "email_address": "",
+                    }
+
+                for name, statement in hot_queries(sample):
+                    self.stdout.write(name)
+                    for row in explain(connection, statement):
+                        scan = FULL_SCANS.get(row["type"])
+                        line = (
+                            "  {table}: type={type} key={key} "
+                            "rows={rows} {Extra}".format(**row)
+                        )
+                        if scan:
+                            flagged.append((name, row["table"], scan))
+                            self.stdout.write(
+                                self.style.WARNING(line + " <- " + scan)
+                            )
+                        else:
+                            self.stdout.write(line)
+
+        except Exception as e:
+            logger.error("EXPLAIN QUERIES: {}".format(e))
+            raise
+
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS("No full scans found"))
+            return
+
+        summary = "{} full scans: {}".format(
+            len(flagged),
+            ", ".join(
+                "{} ({}, {})".format(*scan) for scan in flagged
+            ),
+        )
+        if options["fail_on_scan"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.WARNING(summary))
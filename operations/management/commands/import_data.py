@@ -0,0 +1,226 @@
+import csv
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sqlalchemy import DateTime, insert, select
+
+from operations import versions
+from operations.feed import fan_out_posts
+from operations.models import (
+    Comment,
+    GroupMembership,
+    Like,
+    Post,
+    SocialGroup,
+    User,
+)
+from social_network.utils.codes import new_code
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# Table name -> model, in the order the tables have to be imported
+MODELS = {
+    model.__tablename__: model
+    for model in (User, SocialGroup, GroupMembership, Post, Comment, Like)
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream an NDJSON or CSV file into one table with chunked "
+        "multi-row INSERTs, committing each chunk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("table", choices=sorted(MODELS))
+        parser.add_argument("path", help="File holding one row per record")
+        parser.add_argument(
+            "--format",
+            choices=["ndjson", "csv"],
+            help="File format, taken from the extension by default",
+        )
+        parser.add_argument(
+            "--offset",
+            type=int,
+            default=0,
+            help="Number of records to skip, to resume a stopped import",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.BULK_CHUNK_SIZE,
+            help="Number of records inserted per transaction",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=100000,
+            help="Report progress after this many records",
+        )
+
+    def handle(self, *args, **options):
+        model = MODELS[options["table"]]
+        path = options["path"]
+        file_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "ndjson"
+        )
+        offset = options["offset"]
+        batch_size = options["batch_size"]
+        progress_every = options["progress_every"]
+        session = settings.DB_SESSION
+
+        imported = 0
+        reported = offset
+        started = time.monotonic()
+        try:
+            with open(path, newline="") as source:
+                records = enumerate(read_records(source, file_format))
+                records = islice(records, offset, None)
+                fields = None
+                while True:
+                    chunk = list(islice(records, batch_size))
+                    if not chunk:
+                        break
+
+                    if fields is None:
+                        fields = check_fields(model, chunk[0][1])
+                    rows = [
+                        to_row(model, fields, number, record)
+                        for number, record in chunk
+                    ]
+                    session.execute(insert(model).values(rows))
+                    after_insert(session, model, rows)
+                    session.commit()
+
+                    imported += len(rows)
+                    offset = chunk[-1][0] + 1
+                    if offset - reported >= progress_every:
+                        self.report(imported, offset, started)
+                        reported = offset
+
+        except Exception as e:
+            logger.error("IMPORT DATA: {}".format(e))
+            session.rollback()
+            raise CommandError(
+                "{} (resume with --offset {})".format(e, offset)
+            )
+        finally:
+            settings.DB_SESSION.remove()
+            # Apply the version bumps of the committed chunks before exiting
+            versions.bumper.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported {} {} rows in {:.0f}s".format(
+                    imported, model.__tablename__, time.monotonic() - started
+                )
+            )
+        )
+        if model in (Comment, Like):
+            self.stdout.write(
+                "Run reconcile_post_counters to update the post totals"
+            )
+
+    def report(self, imported: int, offset: int, started: float) -> None:
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            "Imported {} rows ({:.0f}/s), next offset {}".format(
+                imported, imported / elapsed if elapsed else 0, offset
+            )
+        )
+
+
+def read_records(source, file_format: str):
+    """
+    Yield the records of the file one by one as dicts.
+    """
+    if file_format == "csv":
+        for record in csv.DictReader(source):
+            # Empty cells are NULL
+            yield {key: value or None for key, value in record.items()}
+    else:
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def check_fields(model, record: dict) -> list:
+    """
+    The fields of the first record, which every record must have.
+    """
+    columns = model.__table__.columns
+    unknown = set(record) - set(columns.keys())
+    if unknown:
+        raise CommandError(
+            "Unknown {} columns: {}".format(
+                model.__tablename__, ", ".join(sorted(unknown))
+            )
+        )
+    return sorted(record)
+
+
+def to_row(model, fields: list, number: int, record: dict) -> dict:
+    """
+    The insert values of a record, with its code generated when the file
+    has none.
+    """
+    if sorted(record) != fields:
+        raise CommandError(
+            "Record {} has fields {}, expected {}".format(
+                number, sorted(record), fields
+            )
+        )
+
+    row = dict(record)
+    columns = model.__table__.columns
+    for field in fields:
+        if isinstance(columns[field].type, DateTime) and isinstance(
+            row[field], str
+        ):
+            row[field] = datetime.fromisoformat(row[field])
+    if "code" in columns and row.get("code") is None:
+        row["code"] = new_code()
+    return row
+
+
+def after_insert(session, model, rows: list) -> None:
+    """
+    Do for the chunk what the write handlers do: add new posts to the
+    member timelines in its transaction, and bump the listing versions once
+    it commits.
+    """
+    if model is User:
+        versions.bump(session, versions.USERS)
+    elif model is SocialGroup:
+        versions.bump(session, versions.GROUPS)
+    elif model is GroupMembership:
+        user_ids = {row["user_id"] for row in rows}
+        codes = session.execute(
+            select(User.code).where(User.id.in_(user_ids))
+        ).scalars()
+        versions.bump(session, *map(versions.user_groups, codes))
+    elif model is Post:
+        posts = session.execute(
+            select(Post.id, Post.group_id).where(
+                Post.code.in_([row["code"] for row in rows])
+            )
+        ).all()
+        group_posts = defaultdict(list)
+        for post in posts:
+            group_posts[post.group_id].append(post.id)
+        for group_id, post_ids in group_posts.items():
+            fan_out_posts(session, post_ids, group_id)
+        versions.bump(session, *map(versions.group_posts, group_posts))
+    else:
+        post_ids = {row["post_id"] for row in rows}
+        group_ids = session.execute(
+            select(Post.group_id).where(Post.id.in_(post_ids)).distinct()
+        ).scalars()
+        versions.bump(session, *map(versions.group_posts, group_ids))
@@ -0,0 +1,113 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sqlalchemy import func, select
+
+from operations.models import Comment, Like, Post
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# Actual live totals of the outer post
+LIVE_LIKES = (
+    select(func.count(Like.id))
+    .where(Like.post_id == Post.id, Like.deleted_at.is_(None))
+    .correlate(Post)
+    .scalar_subquery()
+)
+LIVE_COMMENTS = (
+    select(func.count(Comment.id))
+    .where(Comment.post_id == Post.id, Comment.deleted_at.is_(None))
+    .correlate(Post)
+    .scalar_subquery()
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the like_count and comment_count columns of posts from "
+        "the likes and comments tables and fix the rows that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts checked per transaction",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the posts whose counters are wrong",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+        session = settings.DB_SESSION
+
+        last_id = 0
+        checked = fixed = 0
+        try:
+            while True:
+                query = (
+                    select(
+                        Post.id,
+                        Post.like_count,
+                        Post.comment_count,
+                        LIVE_LIKES.label("likes"),
+                        LIVE_COMMENTS.label("comments"),
+                    )
+                    .where(Post.id > last_id)
+                    .order_by(Post.id)
+                    .limit(batch_size)
+                )
+                if not dry_run:
+                    # Hold the batch so concurrent toggles queue behind it
+                    query = query.with_for_update(of=Post)
+                rows = session.execute(query).all()
+                if not rows:
+                    break
+
+                drifted = [
+                    {
+                        "id": row.id,
+                        "like_count": row.likes,
+                        "comment_count": row.comments,
+                    }
+                    for row in rows
+                    if (row.like_count, row.comment_count)
+                    != (row.likes, row.comments)
+                ]
+                if drifted and not dry_run:
+                    session.bulk_update_mappings(Post, drifted)
+                session.commit()
+
+                for post in drifted:
+                    self.stdout.write(
+                        "post {id}: likes={like_count} "
+                        "comments={comment_count}".format(**post)
+                    )
+
+                checked += len(rows)
+                fixed += len(drifted)
+                last_id = rows[-1].id
+
+        except Exception as e:
+            logger.error("RECONCILE POST COUNTERS: {}".format(e))
+            session.rollback()
+            raise
+        finally:
+            settings.DB_SESSION.remove()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Checked {} posts, {} {}".format(
+                    checked,
+                    fixed,
+                    "drifted" if dry_run else "fixed",
+                )
+            )
+        )
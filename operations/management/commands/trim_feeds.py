@@ -0,0 +1,76 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sqlalchemy import select
+
+from operations.feed import trim_timeline
+from operations.models import TimelineEntry
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the oldest entries of every home feed timeline beyond "
+        "FEED_MAX_ENTRIES."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            default=settings.FEED_MAX_ENTRIES,
+            help="Entries kept per timeline",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of timelines checked per transaction",
+        )
+
+    def handle(self, *args, **options):
+        max_entries = options["max_entries"]
+        batch_size = options["batch_size"]
+        session = settings.DB_SESSION
+
+        last_user_id = 0
+        checked = trimmed = removed = 0
+        try:
+            while True:
+                user_ids = session.execute(
+                    select(TimelineEntry.user_id)
+                    .where(TimelineEntry.user_id > last_user_id)
+                    .group_by(TimelineEntry.user_id)
+                    .order_by(TimelineEntry.user_id)
+                    .limit(batch_size)
+                ).scalars().all()
+                if not user_ids:
+                    break
+
+                for user_id in user_ids:
+                    deleted = trim_timeline(session, user_id, max_entries)
+                    if deleted:
+                        trimmed += 1
+                        removed += deleted
+                session.commit()
+
+                checked += len(user_ids)
+                last_user_id = user_ids[-1]
+
+        except Exception as e:
+            logger.error("TRIM FEEDS: {}".format(e))
+            session.rollback()
+            raise
+        finally:
+            settings.DB_SESSION.remove()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Checked {} timelines, trimmed {}, removed {} entries".format(
+                    checked, trimmed, removed
+                )
+            )
+        )
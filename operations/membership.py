@@ -0,0 +1,82 @@
+"""
+Group membership checks, answered from an in-process cache.
+
+Only live memberships are cached, keyed by (user_id, group_id), so a
+missing entry always falls back to the database and joining a group is
+visible at once. Entries are dropped when a membership is inserted or its
+group deleted, and otherwise expire after MEMBERSHIP_CACHE_TTL seconds.
+"""
+from typing import Optional
+
+from django.conf import settings
+
+from operations import statements
+from operations.post_cache import PostRef, resolve_live_post
+from social_network.utils.cache import TTLCache
+from social_network.utils.transactions import on_commit
+
+membership_cache = TTLCache(
+    "membership",
+    maxsize=settings.MEMBERSHIP_CACHE_SIZE,
+    ttl=settings.MEMBERSHIP_CACHE_TTL,
+)
+
+
+def is_member(session, user_id: int, group_id: int) -> bool:
+    """
+    Whether the user is a live member of the group.
+    """
+    key = (user_id, group_id)
+    if membership_cache.get(key, False):
+        return True
+
+    member = (
+        session.execute(
+            statements.live_membership(user_id, group_id)
+        ).scalar()
+        is not None
+    )
+    if member:
+        membership_cache.set(key, True)
+    return member
+
+
+def member_post(session, post_code: str, user_id: int) -> Optional[PostRef]:
+    """
+    A live post whose group the user is a live member of.
+    """
+    post = resolve_live_post(session, post_code)
+    if post is None or not is_member(session, user_id, post.group_id):
+        return None
+
+    return post
+
+
+def member_post_id(session, post_code: str, user_id: int) -> Optional[int]:
+    """
+    Id of a live post whose group the user is a live member of.
+    """
+    post = member_post(session, post_code, user_id)
+    return post.id if post is not None else None
+
+
+def invalidate_membership(session, user_id: int, group_id: int) -> None:
+    """
+    Forget the membership now and again once `session` commits, so a
+    concurrent lookup cannot cache the state from before the write.
+    """
+    key = (user_id, group_id)
+    membership_cache.pop(key)
+    on_commit(session, lambda: membership_cache.pop(key))
+
+
+def invalidate_group(session, group_id: int) -> None:
+    """
+    Forget every membership of a group, now and once `session` commits.
+    """
+
+    def drop():
+        membership_cache.pop_where(lambda key: key[1] == group_id)
+
+    drop()
+    on_commit(session, drop)
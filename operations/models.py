@@ -1,8 +1,9 @@
 # coding: utf-8
 from sqlalchemy import (
-    CHAR,
+    BigInteger,
     Column,
     ForeignKey,
+    Index,
     Integer,
     String,
     TIMESTAMP,
@@ -12,16 +13,22 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
+from social_network.utils.codes import Code, new_code
+
 Base = declarative_base()
 metadata = Base.metadata
 
 
 class SocialGroup(Base):
     __tablename__ = "social_groups"
+    __table_args__ = (Index("uq_social_groups_code", "code", unique=True),)
 
     id = Column(Integer, primary_key=True)
     code = Column(
-        CHAR(36), nullable=False, server_default=text("(uuid())")
+        Code,
+        nullable=False,
+        default=new_code,
+        server_default=text("(uuid())"),
     )
     name = Column(String(255), nullable=False, unique=True)
     description = Column(Text)
@@ -33,14 +40,22 @@ class SocialGroup(Base):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("uq_users_code", "code", unique=True),)
 
     id = Column(Integer, primary_key=True)
     code = Column(
-        CHAR(36), nullable=False, server_default=text("(uuid())")
+        Code,
+        nullable=False,
+        default=new_code,
+        server_default=text("(uuid())"),
     )
     name = Column(String(100), nullable=False)
     email_address = Column(String(100), nullable=False, unique=True)
     password = Column(String(255), nullable=False)
+    # Bumped to revoke every token issued to the user
+    token_version = Column(
+        Integer, nullable=False, server_default=text("0")
+    )
     last_used = Column(
         TIMESTAMP,
         server_default=text(
@@ -55,6 +70,14 @@ class User(Base):
 
 class GroupMembership(Base):
     __tablename__ = "group_memberships"
+    __table_args__ = (
+        Index(
+            "idx_memberships_user_group",
+            "user_id",
+            "group_id",
+            "deleted_at",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     user_id = Column(ForeignKey("users.id"), index=True)
@@ -70,14 +93,32 @@ class GroupMembership(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        Index("uq_posts_code", "code", unique=True),
+        Index(
+            "idx_posts_group_created",
+            "group_id",
+            "deleted_at",
+            "created_at",
+            "id",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     code = Column(
-        CHAR(36), nullable=False, server_default=text("(uuid())")
+        Code,
+        nullable=False,
+        default=new_code,
+        server_default=text("(uuid())"),
     )
     user_id = Column(ForeignKey("users.id"), index=True)
     group_id = Column(ForeignKey("social_groups.id"), index=True)
     content = Column(Text, nullable=False)
+    # Live like/comment totals, maintained with the likes and comments
+    like_count = Column(Integer, nullable=False, server_default=text("0"))
+    comment_count = Column(
+        Integer, nullable=False, server_default=text("0")
+    )
     created_at = Column(
         TIMESTAMP, server_default=text("CURRENT_TIMESTAMP")
     )
@@ -89,10 +130,23 @@ class Post(Base):
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        Index("uq_comments_code", "code", unique=True),
+        Index(
+            "idx_comments_post_created",
+            "post_id",
+            "deleted_at",
+            "created_at",
+            "id",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     code = Column(
-        CHAR(36), nullable=False, server_default=text("(uuid())")
+        Code,
+        nullable=False,
+        default=new_code,
+        server_default=text("(uuid())"),
     )
     user_id = Column(ForeignKey("users.id"), index=True)
     post_id = Column(ForeignKey("posts.id"), index=True)
@@ -108,10 +162,25 @@ class Comment(Base):
 
 class Like(Base):
     __tablename__ = "likes"
+    __table_args__ = (
+        Index("uq_likes_code", "code", unique=True),
+        # One like row per user and post, toggles revive or soft delete it
+        Index("uq_likes_post_user", "post_id", "user_id", unique=True),
+        Index(
+            "idx_likes_post_created",
+            "post_id",
+            "deleted_at",
+            "created_at",
+            "id",
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     code = Column(
-        CHAR(36), nullable=False, server_default=text("(uuid())")
+        Code,
+        nullable=False,
+        default=new_code,
+        server_default=text("(uuid())"),
     )
     user_id = Column(ForeignKey("users.id"), index=True)
     post_id = Column(ForeignKey("posts.id"), index=True)
@@ -122,3 +191,52 @@ class Like(Base):
 
     post = relationship("Post")
     user = relationship("User")
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(ForeignKey("users.id"), nullable=False, index=True)
+    # Tokens of the user with a lower version are revoked
+    token_version = Column(Integer, nullable=False)
+    created_at = Column(
+        TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"), index=True
+    )
+
+    user = relationship("User")
+
+
+class TimelineEntry(Base):
+    __tablename__ = "timeline_entries"
+    __table_args__ = (
+        # The feed read order, newest post of a user first; covers the read
+        Index(
+            "idx_timeline_user_created",
+            "user_id",
+            "created_at",
+            "post_id",
+            "group_id",
+        ),
+    )
+
+    user_id = Column(ForeignKey("users.id"), primary_key=True)
+    post_id = Column(ForeignKey("posts.id"), primary_key=True, index=True)
+    group_id = Column(
+        ForeignKey("social_groups.id"), nullable=False, index=True
+    )
+    # Copied from the post, feeds are ordered like the group post listing
+    created_at = Column(TIMESTAMP, nullable=False)
+
+    user = relationship("User")
+    post = relationship("Post")
+    group = relationship("SocialGroup")
+
+
+class ResourceVersion(Base):
+    __tablename__ = "resource_versions"
+
+    # e.g. "groups" or "group-posts:<group id>", see operations.versions
+    resource = Column(String(100), primary_key=True)
+    # Bumped by every write that changes the resource's representation
+    version = Column(BigInteger, nullable=False, server_default=text("'0'"))
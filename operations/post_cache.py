@@ -0,0 +1,66 @@
+"""
+Post code resolution, answered from an in-process cache.
+
+Entries map a post code to its id, group and deletion time, for live and
+deleted posts alike; unknown codes are not cached. A created post is added
+and a deleted one updated once the transaction commits, and otherwise
+entries expire after POST_CACHE_TTL seconds, which bounds how long other
+processes keep seeing a post deleted elsewhere as live.
+"""
+from collections import namedtuple
+from typing import Optional
+
+from django.conf import settings
+
+from operations import statements
+from operations.models import Post
+from social_network.utils.cache import TTLCache
+from social_network.utils.transactions import on_commit
+
+PostRef = namedtuple("PostRef", ["id", "group_id", "deleted_at"])
+
+post_cache = TTLCache(
+    "post",
+    maxsize=settings.POST_CACHE_SIZE,
+    ttl=settings.POST_CACHE_TTL,
+)
+
+
+def resolve_post(session, post_code: str) -> Optional[PostRef]:
+    """
+    Id, group and deletion time of the post, or None if there is no such
+    post.
+    """
+    post_code = str(post_code).lower()
+    post = post_cache.get(post_code, None)
+    if post is not None:
+        return post
+
+    row = session.execute(statements.post_by_code(post_code)).first()
+    if row is None:
+        return None
+
+    post = PostRef(row.id, row.group_id, row.deleted_at)
+    post_cache.set(post_code, post)
+    return post
+
+
+def resolve_live_post(session, post_code: str) -> Optional[PostRef]:
+    """
+    Like resolve_post(), but None for a deleted post as well.
+    """
+    post = resolve_post(session, post_code)
+    if post is None or post.deleted_at is not None:
+        return None
+    return post
+
+
+def remember_post(session, post: Post) -> None:
+    """
+    Record a created or deleted post once `session` commits. Until then
+    the entry is dropped, so lookups go to the database.
+    """
+    post_code = str(post.code).lower()
+    ref = PostRef(post.id, post.group_id, post.deleted_at)
+    post_cache.pop(post_code)
+    on_commit(session, lambda: post_cache.set(post_code, ref))
@@ -1,9 +1,8 @@
 import hashlib
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 import uuid
-from sqlalchemy import func
 
 import jwt
 from django.conf import settings
@@ -12,28 +11,38 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.versioning import NamespaceVersioning
 from rest_framework.views import APIView
+from sqlalchemy import insert, select
 
 from social_network.utils import custom_exceptions as ce
-from social_network.utils.custom_validator import CustomValidator
+from social_network.utils.custom_validator import ThreadLocalValidator
 from social_network.utils.data_formatter import (
     result_list_to_dict,
     result_row_to_dict,
 )
-from operations import schemas
-from operations.models import (
-    Post,
-    SocialGroup,
-    User,
-    Comment,
-    Like,
-    GroupMembership,
+from social_network.utils.codes import new_code
+from social_network.utils.pagination import decode_cursor, paginate
+from operations import schemas, statements, versions
+from operations.feed import fan_out_post, fan_out_posts, retract_post
+from operations.group_directory import resolve_group, resolve_live_group
+from operations.listing_cache import (
+    get_page,
+    invalidate_group_listing,
+    page_key,
+    set_page,
 )
+from operations.membership import is_member
+from operations.post_cache import remember_post
+from operations.models import Post
 
 logger = logging.getLogger("operations")
-c_validator = CustomValidator({}, allow_unknown=True)
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
 
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 
 class VersioningConfig(NamespaceVersioning):
     default_version = "v1"
@@ -147,22 +156,89 @@ class PostsAPIView(APIView):
             raise ce.InternalServerError
 
 
+class BulkPostsAPIView(APIView):
+    """
+    Creates many posts in a group at once.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (AllowAny,)
+
+    def post(self, request, group_code):
+        """
+        Create the posts and return their codes in request order.
+        """
+        try:
+            if request.version == "v1":
+                is_valid = c_validator.validate(
+                    request.data, schemas.POSTS_BULK_POST
+                )
+
+                if is_valid:
+                    return create_posts_instance(request, group_code)
+                else:
+                    raise ce.ValidationFailed(
+                        {
+                            "message": "Some validations have failed",
+                            "data": c_validator.errors,
+                        }
+                    )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.ErrorMSG as em:
+            logger.error("BULK POSTS API VIEW - POST: {}".format(em))
+            raise
+        except ce.ValidationFailed as vf:
+            logger.error("BULK POSTS API VIEW - POST: {}".format(vf))
+            raise
+
+        except ce.VersionNotSupported as vns:
+            logger.error("BULK POSTS API VIEW - POST: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("BULK POSTS API VIEW - POST: {}".format(e))
+            raise ce.InternalServerError
+
+
 def retrieve_post(request, group_code) -> Response:
     """
     Retrieve post data based on the request.
     """
     try:
         post_code = request.query_params.get("post_code")
-        posts = fetch_all_posts(
-            group_code=group_code, post_code=post_code
+        limit = int(
+            request.query_params.get("limit", settings.PAGE_SIZE)
         )
+        cursor = request.query_params.get("cursor")
+
+        posts = None
+        group = resolve_live_group(read_session, group_code)
+        if group is not None:
+            resource = versions.group_posts(group.id)
+            stamps = versions.current(read_session, [resource])
+            etag = versions.etag(request, stamps)
+            not_modified = versions.not_modified(request, etag)
+            if not_modified:
+                return not_modified
+
+            posts, next_cursor = fetch_all_posts(
+                group_id=group.id,
+                post_code=post_code,
+                limit=limit,
+                cursor=decode_cursor(cursor) if cursor else None,
+                version=stamps[resource],
+            )
         if posts:
             return Response(
                 {
                     "message": "Post found successfully",
                     "data": posts,
+                    "next_cursor": next_cursor,
                 },
                 status=status.HTTP_200_OK,
+                headers={"ETag": etag},
             )
 
         return Response(
@@ -223,6 +299,41 @@ def create_post_instance(request, group_code) -> Response:
         raise ce.InternalServerError
 
 
+def create_posts_instance(request, group_code) -> Response:
+    """
+    Create many posts in a group.
+    """
+    try:
+        post_codes = create_posts(
+            group_code=group_code,
+            contents=[post["content"] for post in request.data["posts"]],
+            user_id=request.user["id"],
+        )
+        if post_codes:
+            return Response(
+                {
+                    "message": "Posts created successfully",
+                    "data": {"post_codes": post_codes},
+                },
+                status=status.HTTP_201_CREATED,
+            )
+
+        return Response(
+            {
+                "message": "Failed to create posts",
+                "data": None,
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    except ce.ErrorMSG as em:
+        logger.error("CREATE POSTS INSTANCE: {}".format(em))
+        raise
+    except Exception as e:
+        logger.error("CREATE POSTS INSTANCE: {}".format(e))
+        raise ce.InternalServerError
+
+
 def delete_post_instance(post_code) -> Response:
     """
     Delete a Post by its code.
@@ -255,64 +366,44 @@ def delete_post_instance(post_code) -> Response:
 
 
 def fetch_all_posts(
-    group_code: uuid.UUID, post_code: uuid.UUID = None
-) -> List[Post]:
+    group_id: int,
+    post_code: uuid.UUID = None,
+    limit: int = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    version: Optional[int] = None,
+) -> Tuple[List[Post], Optional[str]]:
     """
-    Fetch posts from a group.
+    Fetch a page of posts from a group, newest first, along with the cursor
+    of the next page. With the group's post listing `version`, the page is
+    served from and stored in the listing cache.
     """
+    limit = min(limit or settings.PAGE_SIZE, settings.MAX_PAGE_SIZE)
+    key = None
+    if version is not None:
+        key = page_key(group_id, version, post_code, limit, cursor)
+        page = get_page(key)
+        if page is not None:
+            return page
+
     try:
-        comments = (
-            session.query(
-                Comment.post_id,
-                func.count(Comment.post_id).label("total_comments"),
+        # One extra row tells whether there is a next page
+        posts = read_session.execute(
+            statements.group_posts(
+                group_id, post_code, limit=limit + 1, cursor=cursor
             )
-            .filter(Comment.deleted_at.is_(None))
-            .group_by(Comment.post_id)
-        ).subquery()
-
-        likes = (
-            session.query(
-                Like.post_id,
-                func.count(Like.post_id).label("total_likes"),
-            )
-            .filter(Like.deleted_at.is_(None))
-            .group_by(Like.post_id)
-        ).subquery()
-
-        posts = (
-            session.query(
-                User.name,
-                Post.code.label("post_code"),
-                Post.content,
-                comments.c.total_comments,
-                likes.c.total_likes,
-            )
-            .join(SocialGroup, SocialGroup.id == Post.group_id)
-            .join(User, Post.user_id == User.id)
-            .outerjoin(comments, Post.id == comments.c.post_id)
-            .outerjoin(likes, Post.id == likes.c.post_id)
-            .filter(
-                SocialGroup.code == group_code,
-                SocialGroup.deleted_at.is_(None),
-                Post.deleted_at.is_(None),
-            )
-        )
-
-        if post_code:
-            posts = posts.filter(Post.code == post_code)
-
-        posts = posts.all()
+        ).all()
 
-        session.commit()
-
-        posts = result_list_to_dict(posts) if posts else None
+        posts, next_cursor = paginate(result_list_to_dict(posts), limit)
+        posts = posts or None
+        if key is not None:
+            set_page(key, posts, next_cursor)
 
     except Exception as e:
         logger.error("FETCH ALL POSTS: {}".format(e))
-        session.rollback()
-        posts = []
+        read_session.rollback()
+        posts, next_cursor = [], None
 
-    return posts
+    return posts, next_cursor
 
 
 def create_post(
@@ -322,27 +413,19 @@ def create_post(
     Create a post in the specified group.
     """
     try:
-        group = (
-            session.query(SocialGroup)
-            .filter(SocialGroup.code == group_code)
-            .one_or_none()
-        )
+        group = resolve_group(session, group_code)
         if not group:
             raise ce.ErrorMSG("Group does not exist")
-        if not (
-            session.query(GroupMembership)
-            .filter(
-                GroupMembership.user_id == user_id,
-                GroupMembership.group_id == group.id,
-                GroupMembership.deleted_at.is_(None),
-            )
-            .first()
-        ):
+        if not is_member(session, user_id, group.id):
             raise ce.ErrorMSG("Not a member of group")
 
         post = Post(user_id=user_id, group_id=group.id, content=content)
         session.add(post)
-        session.commit()
+        versions.bump(session, versions.group_posts(group.id))
+        session.flush()
+        fan_out_post(session, post.id, group.id)
+        remember_post(session, post)
+        invalidate_group_listing(session, group.id)
 
     except ce.ErrorMSG as em:
         logger.error("CREATE POST: {}".format(em))
@@ -355,19 +438,70 @@ def create_post(
     return post
 
 
+def create_posts(
+    group_code: str, user_id: int, contents: List[str]
+) -> Optional[List[str]]:
+    """
+    Create posts in the specified group with multi-row INSERTs of
+    BULK_CHUNK_SIZE rows, returns their codes in order.
+    """
+    try:
+        group = resolve_group(session, group_code)
+        if not group:
+            raise ce.ErrorMSG("Group does not exist")
+        if not is_member(session, user_id, group.id):
+            raise ce.ErrorMSG("Not a member of group")
+
+        # Codes are generated here, so no row has to be read back
+        rows = [
+            {
+                "code": new_code(),
+                "user_id": user_id,
+                "group_id": group.id,
+                "content": content,
+            }
+            for content in contents
+        ]
+        for start in range(0, len(rows), settings.BULK_CHUNK_SIZE):
+            chunk = rows[start:start + settings.BULK_CHUNK_SIZE]
+            session.execute(insert(Post).values(chunk))
+            post_ids = session.execute(
+                select(Post.id).where(
+                    Post.code.in_([row["code"] for row in chunk])
+                )
+            ).scalars().all()
+            fan_out_posts(session, post_ids, group.id)
+
+        versions.bump(session, versions.group_posts(group.id))
+        invalidate_group_listing(session, group.id)
+        post_codes = [row["code"] for row in rows]
+
+    except ce.ErrorMSG as em:
+        logger.error("CREATE POSTS: {}".format(em))
+        session.rollback()
+        raise
+    except Exception as e:
+        logger.error("CREATE POSTS: {}".format(e))
+        session.rollback()
+        post_codes = None
+    return post_codes
+
+
 def delete_post(post_code: str) -> bool:
     """
     Mark a post as deleted.
     """
     try:
-        post = (
-            session.query(Post)
-            .filter(Post.code == post_code)
-            .one_or_none()
-        )
+        post = session.execute(
+            statements.post_entity(post_code)
+        ).scalar_one_or_none()
         if post:
             post.deleted_at = datetime.now()
-            session.commit()
+            versions.bump(session, versions.group_posts(post.group_id))
+            session.flush()
+            retract_post(session, post.id)
+            remember_post(session, post)
+            invalidate_group_listing(session, post.group_id)
             return True
     except Exception as e:
         logger.error("DELETE POST: {}".format(e))
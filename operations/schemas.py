@@ -1,3 +1,7 @@
+from django.conf import settings
+
+from social_network.utils.codes import CODE_PATTERN
+
 # Schema for Authentication Token
 GROUP_GET = {
     "group_code": {
@@ -18,6 +22,54 @@ COMMENT_POST = {
         "required": True,
     }
 }
+COMMENT_GET = {
+    "limit": {
+        "type": "integer",
+        "coerce": int,
+        "min": 1,
+        "max": settings.MAX_PAGE_SIZE,
+        "required": False,
+    },
+    "cursor": {
+        "type": "string",
+        "maxlength": 255,
+        "required": False,
+        "empty": False,
+    },
+    "order": {
+        "type": "string",
+        "allowed": ["oldest", "newest"],
+        "required": False,
+    },
+}
+LIKE_GET = {
+    "count": {
+        "type": "boolean",
+        "coerce": lambda value: str(value).lower() in ("true", "1"),
+        "required": False,
+    },
+    "sample": {
+        "type": "integer",
+        "coerce": int,
+        "min": 1,
+        "max": settings.MAX_PAGE_SIZE,
+        "required": False,
+        "excludes": "count",
+    },
+    "limit": {
+        "type": "integer",
+        "coerce": int,
+        "min": 1,
+        "max": settings.MAX_PAGE_SIZE,
+        "required": False,
+    },
+    "cursor": {
+        "type": "string",
+        "maxlength": 255,
+        "required": False,
+        "empty": False,
+    },
+}
 COMMENT_PATCH = {
     "content": {
         "type": "string",
@@ -37,7 +89,89 @@ POSTS_GET = {
         "required": False,
         "empty": False,
     },
+    "limit": {
+        "type": "integer",
+        "coerce": int,
+        "min": 1,
+        "max": settings.MAX_PAGE_SIZE,
+        "required": False,
+    },
+    "cursor": {
+        "type": "string",
+        "maxlength": 255,
+        "required": False,
+        "empty": False,
+    },
+}
+FEED_GET = {
+    "limit": {
+        "type": "integer",
+        "coerce": int,
+        "min": 1,
+        "max": settings.MAX_PAGE_SIZE,
+        "required": False,
+    },
+    "cursor": {
+        "type": "string",
+        "maxlength": 255,
+        "required": False,
+        "empty": False,
+    },
 }
 POSTS_POST = {
     "content": {"type": "string", "required": True, "empty": False},
 }
+POSTS_BULK_POST = {
+    "posts": {
+        "type": "list",
+        "required": True,
+        "empty": False,
+        "maxlength": settings.BULK_MAX_ROWS,
+        "schema": {"type": "dict", "schema": POSTS_POST},
+    },
+}
+COMMENTS_BULK_POST = {
+    "comments": {
+        "type": "list",
+        "required": True,
+        "empty": False,
+        "maxlength": settings.BULK_MAX_ROWS,
+        "schema": {"type": "dict", "schema": COMMENT_POST},
+    },
+}
+BATCH_POST = {
+    "operations": {
+        "type": "list",
+        "required": True,
+        "empty": False,
+        "maxlength": settings.BATCH_MAX_OPERATIONS,
+        "schema": {"type": "dict"},
+    },
+}
+# Schema of each batch sub-operation, by operation name
+BATCH_CODE = {
+    "type": "string",
+    "required": True,
+    "regex": "^{}$".format(CODE_PATTERN),
+}
+BATCH_CONTENT = {"type": "string", "required": True, "empty": False}
+BATCH_OPERATIONS = {
+    "create_post": {
+        "op": {"type": "string", "required": True},
+        "group_code": BATCH_CODE,
+        "content": BATCH_CONTENT,
+    },
+    "toggle_like": {
+        "op": {"type": "string", "required": True},
+        "post_code": BATCH_CODE,
+    },
+    "create_comment": {
+        "op": {"type": "string", "required": True},
+        "post_code": BATCH_CODE,
+        "content": BATCH_CONTENT,
+    },
+    "join_group": {
+        "op": {"type": "string", "required": True},
+        "group_code": BATCH_CODE,
+    },
+}
@@ -0,0 +1,392 @@
+"""
+Hot query statements, built once as lambda statements.
+
+Each function returns a StatementLambdaElement: the statement is constructed
+the first time the lambda runs, its compiled form is kept in SQLAlchemy's
+statement cache, and later calls only extract the closure values as bound
+parameters instead of rebuilding and recompiling the query.
+"""
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import and_, case, func, lambda_stmt, or_, select, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from operations.models import (
+    Comment,
+    GroupMembership,
+    Like,
+    Post,
+    SocialGroup,
+    TimelineEntry,
+    User,
+)
+from social_network.utils.codes import new_code
+
+def member_post_id(post_code: str, user_id: int):
+    """
+    Id of a live post whose group the user is a live member of.
+    """
+    return lambda_stmt(
+        lambda: select(Post.id)
+        .join(
+            GroupMembership,
+            Post.group_id == GroupMembership.group_id,
+        )
+        .where(
+            Post.code == post_code,
+            GroupMembership.user_id == user_id,
+            Post.deleted_at.is_(None),
+            GroupMembership.deleted_at.is_(None),
+        )
+        .limit(1)
+    )
+
+
+def post_by_code(post_code: str):
+    """
+    Id, group and deletion time of a post, live or deleted.
+    """
+    return lambda_stmt(
+        lambda: select(Post.id, Post.group_id, Post.deleted_at).where(
+            Post.code == post_code
+        )
+    )
+
+
+def post_entity(post_code: str):
+    """
+    A post, live or deleted, loaded to be updated.
+    """
+    return lambda_stmt(lambda: select(Post).where(Post.code == post_code))
+
+
+def live_membership(user_id: int, group_id: int):
+    """
+    Id of the live membership of a user in a group.
+    """
+    return lambda_stmt(
+        lambda: select(GroupMembership.id)
+        .where(
+            GroupMembership.user_id == user_id,
+            GroupMembership.group_id == group_id,
+            GroupMembership.deleted_at.is_(None),
+        )
+        .limit(1)
+    )
+
+
+def group_by_code(group_code: str):
+    """
+    Id and deletion time of a group, live or deleted.
+    """
+    return lambda_stmt(
+        lambda: select(SocialGroup.id, SocialGroup.deleted_at).where(
+            SocialGroup.code == group_code
+        )
+    )
+
+
+def groups(group_code: str = None, user_code: str = None):
+    """
+    Live groups, optionally only the one with `group_code` and only those
+    the user with `user_code` is a live member of.
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            SocialGroup.code.label("group_code"),
+            SocialGroup.name,
+            SocialGroup.description,
+        ).where(SocialGroup.deleted_at.is_(None))
+    )
+
+    if group_code:
+        stmt += lambda s: s.where(SocialGroup.code == group_code)
+
+    if user_code:
+        stmt += lambda s: s.join(
+            GroupMembership,
+            SocialGroup.id == GroupMembership.group_id,
+        ).join(
+            User,
+            and_(
+                GroupMembership.user_id == User.id,
+                User.code == user_code,
+                GroupMembership.deleted_at.is_(None),
+            ),
+        )
+
+    return stmt
+
+
+def group_posts(
+    group_id: int,
+    post_code: str = None,
+    limit: int = None,
+    cursor: Tuple[datetime, int] = None,
+):
+    """
+    Live posts of a group with their comment and like totals, newest
+    first. With `cursor`, only posts older than that keyset position.
+    Whether the group itself is live is up to the caller.
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            Post.id,
+            User.name,
+            Post.code.label("post_code"),
+            Post.content,
+            Post.created_at,
+            Post.comment_count.label("total_comments"),
+            Post.like_count.label("total_likes"),
+        )
+        .select_from(Post)
+        .join(User, Post.user_id == User.id)
+        .where(
+            Post.group_id == group_id,
+            Post.deleted_at.is_(None),
+        )
+        .order_by(Post.created_at.desc(), Post.id.desc())
+    )
+
+    if post_code:
+        stmt += lambda s: s.where(Post.code == post_code)
+
+    if cursor:
+        created_at, post_id = cursor
+        stmt += lambda s: s.where(
+            or_(
+                Post.created_at < created_at,
+                and_(Post.created_at == created_at, Post.id < post_id),
+            )
+        )
+
+    if limit:
+        stmt += lambda s: s.limit(limit)
+
+    return stmt
+
+
+def user_feed(
+    user_id: int,
+    limit: int = None,
+    cursor: Tuple[datetime, int] = None,
+):
+    """
+    Posts of a user's timeline with their group, author and totals, newest
+    first: one range of idx_timeline_user_created. With `cursor`, only
+    posts older than that keyset position.
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            Post.id,
+            SocialGroup.code.label("group_code"),
+            User.name,
+            Post.code.label("post_code"),
+            Post.content,
+            Post.created_at,
+            Post.comment_count.label("total_comments"),
+            Post.like_count.label("total_likes"),
+        )
+        .select_from(TimelineEntry)
+        .join(Post, Post.id == TimelineEntry.post_id)
+        .join(SocialGroup, SocialGroup.id == TimelineEntry.group_id)
+        .join(User, Post.user_id == User.id)
+        .where(
+            TimelineEntry.user_id == user_id,
+            # Retracted with the post or group, checked in case of a race
+            Post.deleted_at.is_(None),
+            SocialGroup.deleted_at.is_(None),
+        )
+        .order_by(
+            TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()
+        )
+    )
+
+    if cursor:
+        created_at, post_id = cursor
+        stmt += lambda s: s.where(
+            or_(
+                TimelineEntry.created_at < created_at,
+                and_(
+                    TimelineEntry.created_at == created_at,
+                    TimelineEntry.post_id < post_id,
+                ),
+            )
+        )
+
+    if limit:
+        stmt += lambda s: s.limit(limit)
+
+    return stmt
+
+
+def post_comments(
+    post_id: int,
+    limit: int = None,
+    cursor: Tuple[datetime, int] = None,
+    newest_first: bool = False,
+):
+    """
+    Live comments of a post with their author names, oldest first unless
+    `newest_first`. With `cursor`, only comments past that keyset position
+    in the requested order. Whether the post itself is live is up to the
+    caller.
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            Comment.id,
+            Comment.code.label("comment_code"),
+            User.name,
+            Comment.content,
+            Comment.created_at,
+        )
+        .join(User, Comment.user_id == User.id)
+        .where(
+            Comment.post_id == post_id,
+            Comment.deleted_at.is_(None),
+        )
+    )
+
+    if newest_first:
+        stmt += lambda s: s.order_by(
+            Comment.created_at.desc(), Comment.id.desc()
+        )
+        if cursor:
+            created_at, comment_id = cursor
+            stmt += lambda s: s.where(
+                or_(
+                    Comment.created_at < created_at,
+                    and_(
+                        Comment.created_at == created_at,
+                        Comment.id < comment_id,
+                    ),
+                )
+            )
+    else:
+        stmt += lambda s: s.order_by(
+            Comment.created_at.asc(), Comment.id.asc()
+        )
+        if cursor:
+            created_at, comment_id = cursor
+            stmt += lambda s: s.where(
+                or_(
+                    Comment.created_at > created_at,
+                    and_(
+                        Comment.created_at == created_at,
+                        Comment.id > comment_id,
+                    ),
+                )
+            )
+
+    if limit:
+        stmt += lambda s: s.limit(limit)
+
+    return stmt
+
+
+def post_like_total(post_id: int):
+    """
+    Number of live likes on a post, answered from the likes index alone.
+    """
+    return lambda_stmt(
+        lambda: select(func.count(Like.id)).where(
+            Like.post_id == post_id, Like.deleted_at.is_(None)
+        )
+    )
+
+
+def post_likers(
+    post_id: int,
+    limit: int = None,
+    cursor: Tuple[datetime, int] = None,
+):
+    """
+    Names of the users with a live like on a post, oldest like first. With
+    `cursor`, only likes past that keyset position.
+    """
+    stmt = lambda_stmt(
+        lambda: select(Like.id, User.name, Like.created_at)
+        .join(User, Like.user_id == User.id)
+        .where(Like.post_id == post_id, Like.deleted_at.is_(None))
+        .order_by(Like.created_at.asc(), Like.id.asc())
+    )
+
+    if cursor:
+        created_at, like_id = cursor
+        stmt += lambda s: s.where(
+            or_(
+                Like.created_at > created_at,
+                and_(Like.created_at == created_at, Like.id > like_id),
+            )
+        )
+
+    if limit:
+        stmt += lambda s: s.limit(limit)
+
+    return stmt
+
+
+def user_like(post_id: int, user_id: int):
+    """
+    Deletion time of the like of a user on a post, None while it is live.
+    """
+    return lambda_stmt(
+        lambda: select(Like.deleted_at).where(
+            Like.post_id == post_id, Like.user_id == user_id
+        )
+    )
+
+
+def flip_likes(dialect: str, pairs):
+    """
+    Toggle the like of each (post_id, user_id) pair in one statement:
+    insert the likes that have no row yet, and flip the live state of the
+    others. Nothing is read before writing, so concurrent first likes of a
+    post take no gap locks that could deadlock their inserts. SQLite is
+    supported for test databases.
+    """
+    # Sorted, so concurrent statements lock the rows in the same order
+    rows = [
+        {"code": new_code(), "post_id": post_id, "user_id": user_id}
+        for post_id, user_id in sorted(set(pairs))
+    ]
+    flipped = case((Like.deleted_at.is_(None), func.now()), else_=None)
+    if dialect == "sqlite":
+        return (
+            sqlite.insert(Like)
+            .values(rows)
+            .on_conflict_do_update(
+                index_elements=[Like.post_id, Like.user_id],
+                set_={"deleted_at": flipped},
+            )
+        )
+    return (
+        mysql.insert(Like)
+        .values(rows)
+        .on_duplicate_key_update(deleted_at=flipped)
+    )
+
+
+def adjust_like_count(post_id: int, delta: int):
+    """
+    Add `delta` to the denormalized like total of a post.
+    """
+    return lambda_stmt(
+        lambda: update(Post)
+        .where(Post.id == post_id)
+        .values(like_count=Post.like_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def adjust_comment_count(post_id: int, delta: int):
+    """
+    Add `delta` to the denormalized comment total of a post.
+    """
+    return lambda_stmt(
+        lambda: update(Post)
+        .where(Post.id == post_id)
+        .values(comment_count=Post.comment_count + delta)
+        .execution_options(synchronize_session=False)
+    )
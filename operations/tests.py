@@ -1,3 +1,1088 @@
-from django.test import TestCase
+import concurrent.futures
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta
 
-# Create your tests here.
+import sqlalchemy.exc as alchexc
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+
+from django.conf import settings
+
+from operations import likes, posts, statements, versions
+from operations.batch import BatchAPIView
+from operations.comments import (
+    CommentsAPIView,
+    create_comments,
+    fetch_all_comments,
+)
+from operations.feed import backfill_member, fan_out_posts, trim_timeline
+from operations.group_directory import GroupDirectory
+from operations.management.commands import import_data
+from operations.management.commands.explain_queries import bind_params
+from operations.likes import LikesAPIView, fetch_all_likes
+from operations.models import (
+    Comment,
+    GroupMembership,
+    Like,
+    Post,
+    SocialGroup,
+    TimelineEntry,
+    User,
+)
+from operations.write_behind import (
+    LIKE_TOGGLE,
+    NEW_COMMENT,
+    PendingWrite,
+    WriteBehindPipeline,
+    wait,
+)
+from social_network.middleware import DBSessionMiddleware
+from social_network.utils.codes import new_code
+from social_network.utils.pagination import decode_cursor, paginate
+from social_network.utils.testing import sqlite_engine, use_sqlite
+
+
+class WriteBehindTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        self.addCleanup(versions.bumper.flush)
+        self.session_factory = sessionmaker(bind=self.engine)
+
+        with self.session_factory() as session:
+            users = [
+                User(
+                    name="user {}".format(number),
+                    email_address="user{}@example.com".format(number),
+                    password="",
+                )
+                for number in range(3)
+            ]
+            group = SocialGroup(name="group")
+            session.add_all(users + [group])
+            session.flush()
+            post = Post(group_id=group.id, user_id=users[0].id, content="")
+            session.add(post)
+            session.commit()
+            self.user_ids = [user.id for user in users]
+            self.post_id = post.id
+
+    def pipeline(self, session_factory=None, window: float = 0.05):
+        pipeline = WriteBehindPipeline(
+            session_factory=session_factory or self.session_factory,
+            window=window,
+            max_batch=100,
+        )
+        self.addCleanup(pipeline.stop)
+        return pipeline
+
+    def toggle(self, user_id: int) -> PendingWrite:
+        return PendingWrite(LIKE_TOGGLE, post_id=self.post_id, user_id=user_id)
+
+    def comment(self, user_id: int, code: str = None) -> PendingWrite:
+        return PendingWrite(
+            NEW_COMMENT,
+            post_id=self.post_id,
+            user_id=user_id,
+            content="comment",
+            code=code or new_code(),
+        )
+
+    def counters(self) -> tuple:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(Post.like_count, Post.comment_count).where(
+                    Post.id == self.post_id
+                )
+            ).one()
+
+    def count(self, model) -> int:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(func.count()).select_from(model)
+            ).scalar()
+
+    def test_writes_queued_together_share_a_batch(self):
+        pipeline = self.pipeline()
+        writes = [self.toggle(user_id) for user_id in self.user_ids]
+        writes += [self.comment(user_id) for user_id in self.user_ids]
+
+        futures = [pipeline.submit(write) for write in writes]
+        results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(results[:3], [True] * 3)
+        self.assertEqual(results[3:], [write.code for write in writes[3:]])
+        stats = pipeline.stats()
+        self.assertEqual(stats["batches"], 1)
+        self.assertEqual(stats["operations"], 6)
+
+    def test_failing_write_does_not_fail_its_batch(self):
+        pipeline = self.pipeline()
+        duplicate = self.comment(self.user_ids[0])
+        pipeline.submit(duplicate).result(timeout=5)
+
+        failing = pipeline.submit(
+            self.comment(self.user_ids[1], duplicate.code)
+        )
+        toggle = pipeline.submit(self.toggle(self.user_ids[1]))
+        comment = pipeline.submit(self.comment(self.user_ids[2]))
+
+        with self.assertRaises(alchexc.IntegrityError):
+            failing.result(timeout=5)
+        self.assertTrue(toggle.result(timeout=5))
+        self.assertIsNotNone(comment.result(timeout=5))
+        self.assertEqual(self.count(Comment), 2)
+        self.assertEqual(self.counters(), (1, 2))
+
+    def test_counters_follow_the_net_effect_of_a_batch(self):
+        pipeline = self.pipeline()
+        first, second = self.user_ids[:2]
+        writes = [
+            # Liked then unliked in the same batch, no like row is written
+            self.toggle(first),
+            self.toggle(first),
+            self.toggle(second),
+            self.comment(first),
+            self.comment(second),
+        ]
+        for future in [pipeline.submit(write) for write in writes]:
+            future.result(timeout=5)
+
+        self.assertEqual(self.counters(), (1, 2))
+        self.assertEqual(self.count(Like), 1)
+
+        # Unliking an existing like takes it back off the total
+        pipeline.submit(self.toggle(second)).result(timeout=5)
+        self.assertEqual(self.counters(), (0, 2))
+        self.assertEqual(self.count(Like), 1)
+
+    def test_session_errors_fail_the_batch(self):
+        def session_factory():
+            raise alchexc.OperationalError("connect", {}, Exception())
+
+        pipeline = self.pipeline(session_factory)
+        future = pipeline.submit(self.toggle(self.user_ids[0]))
+
+        with self.assertRaises(alchexc.OperationalError):
+            future.result(timeout=5)
+
+    def blocking_pipeline(self):
+        """
+        Pipeline whose flushes wait for `self.release` once `self.flushing`
+        is set.
+        """
+        self.flushing = threading.Event()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+        def session_factory():
+            self.flushing.set()
+            self.release.wait()
+            return self.session_factory()
+
+        return self.pipeline(session_factory, window=0)
+
+    @override_settings(WRITE_BEHIND_TIMEOUT=0.05)
+    def test_queued_write_is_withdrawn_on_timeout(self):
+        pipeline = self.blocking_pipeline()
+        first = pipeline.submit(self.comment(self.user_ids[0]))
+        self.flushing.wait(timeout=5)
+        queued = pipeline.submit(self.comment(self.user_ids[1]))
+
+        with self.assertRaises(concurrent.futures.TimeoutError):
+            wait(queued)
+        self.release.set()
+
+        first.result(timeout=5)
+        pipeline.stop()
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(self.count(Comment), 1)
+        self.assertEqual(self.counters(), (0, 1))
+
+    @override_settings(WRITE_BEHIND_TIMEOUT=0.05)
+    def test_write_being_flushed_is_awaited_on_timeout(self):
+        pipeline = self.blocking_pipeline()
+        write = self.comment(self.user_ids[0])
+        future = pipeline.submit(write)
+        self.flushing.wait(timeout=5)
+        threading.Timer(0.2, self.release.set).start()
+
+        self.assertEqual(wait(future), write.code)
+        self.assertEqual(self.count(Comment), 1)
+
+
+class GroupDirectoryTests(SimpleTestCase):
+    """
+    A directory reloading while this process deletes a group.
+    """
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        # Readers keep their snapshot while a writer commits
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        self.session_factory = sessionmaker(bind=self.engine)
+        with self.session_factory() as session:
+            group = SocialGroup(name="group")
+            session.add(group)
+            session.commit()
+            self.group_code = group.code
+
+        self.directory = GroupDirectory(self.engine, refresh_seconds=60)
+        self.directory.load()
+
+    def delete_group(self) -> None:
+        with self.session_factory() as session:
+            group = session.execute(
+                select(SocialGroup).where(
+                    SocialGroup.code == self.group_code
+                )
+            ).scalar_one()
+            group.deleted_at = func.now()
+            session.flush()
+            session.refresh(group)
+            self.directory.remember(session, group)
+            session.commit()
+
+    def test_reload_keeps_a_deletion_committed_during_its_read(self):
+        reads = []
+
+        def delete_after_read(connection, cursor, statement, *args):
+            if statement.startswith("SELECT social_groups.code"):
+                reads.append(statement)
+                if len(reads) == 1:
+                    self.delete_group()
+
+        event.listen(self.engine, "after_cursor_execute", delete_after_read)
+        self.directory.load()
+
+        group = self.directory._groups[self.group_code]
+        self.assertIsNotNone(group.deleted_at)
+
+    def test_reload_forgets_deletions_it_has_read(self):
+        self.delete_group()
+        self.directory.load()
+
+        self.assertEqual(self.directory._committed, {})
+        group = self.directory._groups[self.group_code]
+        self.assertIsNotNone(group.deleted_at)
+
+
+class LikeToggleTests(SimpleTestCase):
+    """
+    Likes toggled in the request transaction, as with WRITE_BEHIND off.
+    """
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+        session = settings.DB_SESSION
+        users = [
+            User(
+                name="user {}".format(number),
+                email_address="user{}@example.com".format(number),
+                password="",
+            )
+            for number in range(4)
+        ]
+        group = SocialGroup(name="group")
+        session.add_all(users + [group])
+        session.flush()
+        session.add_all(
+            GroupMembership(user_id=user.id, group_id=group.id)
+            for user in users
+        )
+        post = Post(group_id=group.id, user_id=users[0].id, content="")
+        session.add(post)
+        session.commit()
+        self.user_ids = [user.id for user in users]
+        self.post_id, self.post_code = post.id, post.code
+        session.remove()
+
+    def toggle(self, user_id: int):
+        """
+        Toggle in a request of its own, as a worker thread would.
+        """
+        try:
+            result = likes.toggle_like(
+                self.post_code, user_id, allow_write_behind=False
+            )
+            settings.DB_SESSION.commit()
+            return result
+        finally:
+            settings.DB_SESSION.remove()
+
+    def state(self) -> tuple:
+        with self.engine.connect() as connection:
+            live = connection.execute(
+                select(func.count())
+                .select_from(Like)
+                .where(Like.deleted_at.is_(None))
+            ).scalar()
+            rows = connection.execute(
+                select(func.count()).select_from(Like)
+            ).scalar()
+            like_count = connection.execute(
+                select(Post.like_count).where(Post.id == self.post_id)
+            ).scalar()
+        return rows, live, like_count
+
+    def test_toggles_like_unlike_and_like_again(self):
+        self.assertTrue(self.toggle(self.user_ids[0]))
+        self.assertEqual(self.state(), (1, 1, 1))
+        self.assertTrue(self.toggle(self.user_ids[0]))
+        self.assertEqual(self.state(), (1, 0, 0))
+        self.assertTrue(self.toggle(self.user_ids[0]))
+        self.assertEqual(self.state(), (1, 1, 1))
+
+    def test_concurrent_first_likes_all_succeed(self):
+        barrier = threading.Barrier(len(self.user_ids))
+
+        def first_like(user_id):
+            barrier.wait()
+            return self.toggle(user_id)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            len(self.user_ids)
+        ) as executor:
+            results = list(executor.map(first_like, self.user_ids))
+
+        self.assertEqual(results, [True] * len(self.user_ids))
+        count = len(self.user_ids)
+        self.assertEqual(self.state(), (count, count, count))
+
+
+@override_settings(WRITE_BEHIND=False)
+class ConditionalGetTests(SimpleTestCase):
+    """
+    ETags of the post listing of a group, through the request middleware so
+    writes commit or roll back as they would when served.
+    """
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+        session = settings.DB_SESSION
+        user = User(name="user", email_address="user@example.com", password="")
+        group = SocialGroup(name="group")
+        session.add_all([user, group])
+        session.flush()
+        session.add(GroupMembership(user_id=user.id, group_id=group.id))
+        post = Post(group_id=group.id, user_id=user.id, content="")
+        session.add(post)
+        session.commit()
+        self.user = {"id": user.id}
+        self.group_code, self.post_code = group.code, post.code
+        session.remove()
+
+    def call(self, view_class, request, **kwargs):
+        force_authenticate(request, user=self.user)
+        view = DBSessionMiddleware(
+            lambda request: view_class.as_view()(request, **kwargs)
+        )
+        response = view(request)
+        versions.bumper.flush()
+        return response
+
+    def listing(self, etag: str = None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.call(
+            posts.PostsAPIView,
+            APIRequestFactory().get(
+                "/v1/groups/{}/posts".format(self.group_code), **headers
+            ),
+            group_code=self.group_code,
+        )
+
+    def current_etag(self) -> str:
+        response = self.listing()
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_current_etag_is_not_modified(self):
+        etag = self.current_etag()
+
+        response = self.listing(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def assert_write_changes_the_listing(self, view_class, path, **kwargs):
+        etag = self.current_etag()
+
+        response = self.call(
+            view_class,
+            APIRequestFactory().post(path, {"content": "new"}, format="json"),
+            **kwargs
+        )
+        self.assertLess(response.status_code, 400)
+
+        response = self.listing(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_new_post_changes_the_etag(self):
+        self.assert_write_changes_the_listing(
+            posts.PostsAPIView,
+            "/v1/groups/{}/posts".format(self.group_code),
+            group_code=self.group_code,
+        )
+
+    def test_like_changes_the_etag(self):
+        self.assert_write_changes_the_listing(
+            LikesAPIView,
+            "/v1/posts/{}/likes".format(self.post_code),
+            post_code=self.post_code,
+        )
+
+    def test_comment_changes_the_etag(self):
+        self.assert_write_changes_the_listing(
+            CommentsAPIView,
+            "/v1/posts/{}/comments".format(self.post_code),
+            post_code=self.post_code,
+        )
+
+    def test_rolled_back_write_keeps_the_etag(self):
+        etag = self.current_etag()
+
+        posts.create_post(
+            group_code=self.group_code, user_id=self.user["id"], content=""
+        )
+        settings.DB_SESSION.rollback()
+        settings.DB_SESSION.remove()
+        versions.bumper.flush()
+
+        self.assertEqual(self.listing(etag).status_code, 304)
+
+
+class BatchTests(SimpleTestCase):
+    """
+    A batch of a member of one group, one of whose operations targets a
+    group the user is not a member of.
+    """
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+        session = settings.DB_SESSION
+        user = User(name="user", email_address="user@example.com", password="")
+        groups = [SocialGroup(name="member"), SocialGroup(name="other")]
+        session.add_all([user] + groups)
+        session.flush()
+        session.add(GroupMembership(user_id=user.id, group_id=groups[0].id))
+        post = Post(group_id=groups[0].id, user_id=user.id, content="")
+        session.add(post)
+        session.commit()
+        self.user = {"id": user.id, "code": user.code}
+        self.group_ids = [group.id for group in groups]
+        self.group_codes = [group.code for group in groups]
+        self.post_id, self.post_code = post.id, post.code
+        session.remove()
+
+    def run_batch(self, operations: list):
+        request = APIRequestFactory().post(
+            "/v1/ops/batch", {"operations": operations}, format="json"
+        )
+        force_authenticate(request, user=self.user)
+        response = DBSessionMiddleware(BatchAPIView.as_view())(request)
+        versions.bumper.flush()
+        return response
+
+    def stamps(self) -> list:
+        resources = [versions.group_posts(id) for id in self.group_ids]
+        with self.engine.connect() as connection:
+            stamps = versions.current(connection, resources)
+        return [stamps[resource] for resource in resources]
+
+    def test_failed_operation_keeps_the_others(self):
+        member, other = self.group_codes
+        stamps = self.stamps()
+
+        response = self.run_batch(
+            [
+                {"op": "create_post", "group_code": member, "content": "a"},
+                {"op": "toggle_like", "post_code": self.post_code},
+                {"op": "create_post", "group_code": other, "content": "b"},
+                {
+                    "op": "create_comment",
+                    "post_code": self.post_code,
+                    "content": "c",
+                },
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["status"] for result in response.data["data"]],
+            [201, 204, 400, 201],
+        )
+        self.assertEqual(
+            response.data["data"][2]["message"], "Not a member of group"
+        )
+        with self.engine.connect() as connection:
+            posts = connection.execute(
+                select(Post.group_id, func.count()).group_by(Post.group_id)
+            ).all()
+            counters = connection.execute(
+                select(Post.like_count, Post.comment_count).where(
+                    Post.id == self.post_id
+                )
+            ).one()
+        self.assertEqual(posts, [(self.group_ids[0], 2)])
+        self.assertEqual(counters, (1, 1))
+        # Bumped by the three operations that committed, not by the failed one
+        self.assertGreater(self.stamps()[0], stamps[0])
+        self.assertEqual(self.stamps()[1], stamps[1])
+
+
+class ListingPaginationTests(SimpleTestCase):
+    """
+    Keyset pages of the post, comment and like listings, with creation
+    times shared by several rows and rows added and removed while paging.
+    """
+
+    # Minutes after START each row was created at, in id order
+    CREATED = [0, 1, 1, 1, 2, 3, 3]
+    START = datetime(2024, 1, 1)
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+        session = settings.DB_SESSION
+        users = [
+            User(
+                name="user {}".format(number),
+                email_address="user{}@example.com".format(number),
+                password="",
+            )
+            for number in range(len(self.CREATED) + 1)
+        ]
+        group = SocialGroup(name="group")
+        session.add_all(users + [group])
+        session.flush()
+        session.add_all(
+            GroupMembership(user_id=user.id, group_id=group.id)
+            for user in users
+        )
+        posts = [
+            Post(
+                group_id=group.id,
+                user_id=users[0].id,
+                content="",
+                created_at=self.created(minutes),
+            )
+            for minutes in self.CREATED
+        ]
+        session.add_all(posts)
+        session.flush()
+        post = posts[0]
+        session.add_all(
+            Comment(
+                post_id=post.id,
+                user_id=users[0].id,
+                content="",
+                created_at=self.created(minutes),
+            )
+            for minutes in self.CREATED
+        )
+        session.add_all(
+            Like(
+                post_id=post.id,
+                user_id=user.id,
+                created_at=self.created(minutes),
+            )
+            for user, minutes in zip(users, self.CREATED)
+        )
+        session.commit()
+        self.users = [(user.id, user.name) for user in users]
+        self.group_id, self.post_id = group.id, post.id
+        self.post_code = post.code
+        session.remove()
+
+    def created(self, minutes: int) -> datetime:
+        return self.START + timedelta(minutes=minutes)
+
+    def ordered(self, model, column, newest_first: bool = False) -> list:
+        order = [model.created_at, model.id]
+        if newest_first:
+            order = [field.desc() for field in order]
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(column)
+                .where(model.deleted_at.is_(None))
+                .order_by(*order)
+            ).scalars().all()
+
+    def walk(self, fetch, key: str, change) -> list:
+        """
+        Every row of a listing, `limit` 2 per page, calling `change` once
+        the first page is read.
+        """
+        seen, cursor = [], None
+        while True:
+            rows, next_cursor = fetch(limit=2, cursor=cursor)
+            settings.DB_READ_SESSION.remove()
+            seen += [row[key] for row in rows or []]
+            if next_cursor is None:
+                return seen
+            if len(seen) == 2:
+                change()
+            cursor = decode_cursor(next_cursor)
+
+    def change(self, model, values: dict, seen_id: int) -> None:
+        """
+        Add a row newer than any other and delete one on the first page.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(
+                model.__table__.insert().values(
+                    code=new_code(), created_at=self.created(10), **values
+                )
+            )
+            connection.execute(
+                model.__table__.update()
+                .where(model.id == seen_id)
+                .values(deleted_at=func.now())
+            )
+
+    def test_post_pages_have_no_duplicates_or_gaps(self):
+        expected = self.ordered(Post, Post.code, newest_first=True)
+        first_page = self.ordered(Post, Post.id, newest_first=True)[:2]
+
+        seen = self.walk(
+            lambda **page: posts.fetch_all_posts(self.group_id, **page),
+            "post_code",
+            # Newer than the cursor, so on no page of this walk
+            lambda: self.change(
+                Post,
+                {
+                    "group_id": self.group_id,
+                    "user_id": self.users[0][0],
+                    "content": "",
+                },
+                first_page[0],
+            ),
+        )
+
+        self.assertEqual(seen, expected)
+
+    def test_comment_pages_have_no_duplicates_or_gaps(self):
+        user_id = self.users[0][0]
+        for newest_first in (False, True):
+            with self.subTest(newest_first=newest_first):
+                expected = self.ordered(
+                    Comment, Comment.code, newest_first=newest_first
+                )
+                first_page = self.ordered(
+                    Comment, Comment.id, newest_first=newest_first
+                )[:2]
+                added = []
+
+                def change():
+                    self.change(
+                        Comment,
+                        {
+                            "post_id": self.post_id,
+                            "user_id": user_id,
+                            "content": "",
+                        },
+                        first_page[0],
+                    )
+                    added.append(self.ordered(Comment, Comment.code)[-1])
+
+                seen = self.walk(
+                    lambda **page: fetch_all_comments(
+                        self.post_code,
+                        user_id,
+                        newest_first=newest_first,
+                        **page
+                    ),
+                    "comment_code",
+                    change,
+                )
+
+                # Oldest first walks on to the comment added meanwhile
+                self.assertEqual(
+                    seen, expected + ([] if newest_first else added)
+                )
+
+    def test_like_pages_have_no_duplicates_or_gaps(self):
+        user_id, new_liker = self.users[0][0], self.users[-1]
+        names = dict(self.users)
+        expected = [names[id] for id in self.ordered(Like, Like.user_id)]
+        first_page = self.ordered(Like, Like.id)[:2]
+
+        seen = self.walk(
+            lambda **page: fetch_all_likes(self.post_code, user_id, **page),
+            "name",
+            lambda: self.change(
+                Like,
+                {"post_id": self.post_id, "user_id": new_liker[0]},
+                first_page[0],
+            ),
+        )
+
+        # Oldest like first, so the walk reaches the like added meanwhile
+        self.assertEqual(seen, expected + [new_liker[1]])
+
+    @override_settings(PAGE_SIZE=2, MAX_PAGE_SIZE=3)
+    def test_limit_defaults_to_page_size_and_is_clamped(self):
+        for limit, size in ((None, 2), (1, 1), (3, 3), (1000, 3)):
+            with self.subTest(limit=limit):
+                page, next_cursor = posts.fetch_all_posts(
+                    self.group_id, limit=limit
+                )
+                self.assertEqual(len(page), size)
+                self.assertIsNotNone(next_cursor)
+
+
+@override_settings(BULK_CHUNK_SIZE=3)
+class BulkCreateTests(SimpleTestCase):
+    """
+    Bulk posts and comments of more rows than one INSERT takes, by a
+    member of a group of two.
+    """
+
+    CONTENTS = ["row {}".format(number) for number in range(8)]
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+        session = settings.DB_SESSION
+        users = [
+            User(
+                name=name, email_address=name + "@example.com", password=""
+            )
+            for name in ("author", "member")
+        ]
+        group = SocialGroup(name="group")
+        session.add_all(users + [group])
+        session.flush()
+        session.add_all(
+            GroupMembership(user_id=user.id, group_id=group.id)
+            for user in users
+        )
+        post = Post(group_id=group.id, user_id=users[0].id, content="")
+        session.add(post)
+        session.commit()
+        self.user_ids = [user.id for user in users]
+        self.group_id, self.group_code = group.id, group.code
+        self.post_id, self.post_code = post.id, post.code
+        session.remove()
+
+    def commit(self, codes):
+        settings.DB_SESSION.commit()
+        settings.DB_SESSION.remove()
+        versions.bumper.flush()
+        return codes
+
+    def stamp(self) -> int:
+        resource = versions.group_posts(self.group_id)
+        with self.engine.connect() as connection:
+            return versions.current(connection, [resource])[resource]
+
+    def codes_by_content(self, model) -> dict:
+        with self.engine.connect() as connection:
+            return dict(
+                connection.execute(
+                    select(model.content, model.code).where(
+                        model.content.in_(self.CONTENTS)
+                    )
+                ).all()
+            )
+
+    def test_posts_keep_request_order_and_fan_out(self):
+        stamp = self.stamp()
+        inserts = []
+
+        def count_inserts(connection, cursor, statement, *args):
+            if statement.startswith("INSERT INTO posts"):
+                inserts.append(statement)
+
+        event.listen(self.engine, "before_cursor_execute", count_inserts)
+        self.addCleanup(
+            event.remove, self.engine, "before_cursor_execute", count_inserts
+        )
+        codes = self.commit(
+            posts.create_posts(
+                self.group_code, self.user_ids[0], self.CONTENTS
+            )
+        )
+
+        # Chunks of 3, 3 and 2 rows
+        self.assertEqual(len(inserts), 3)
+        by_content = self.codes_by_content(Post)
+        self.assertEqual(
+            codes, [by_content[content] for content in self.CONTENTS]
+        )
+        with self.engine.connect() as connection:
+            timelines = connection.execute(
+                select(TimelineEntry.user_id, Post.code)
+                .join(Post, Post.id == TimelineEntry.post_id)
+                .where(Post.content.in_(self.CONTENTS))
+            ).all()
+        self.assertCountEqual(
+            timelines,
+            [(user_id, code) for user_id in self.user_ids for code in codes],
+        )
+        self.assertGreater(self.stamp(), stamp)
+
+    def test_comments_keep_request_order_and_count(self):
+        stamp = self.stamp()
+
+        codes = self.commit(
+            create_comments(self.post_code, self.user_ids[1], self.CONTENTS)
+        )
+
+        by_content = self.codes_by_content(Comment)
+        self.assertEqual(
+            codes, [by_content[content] for content in self.CONTENTS]
+        )
+        with self.engine.connect() as connection:
+            comment_count = connection.execute(
+                select(Post.comment_count).where(Post.id == self.post_id)
+            ).scalar_one()
+        self.assertEqual(comment_count, len(self.CONTENTS))
+        self.assertGreater(self.stamp(), stamp)
+
+
+class ImportDataTests(SimpleTestCase):
+    """
+    import_data run on files written by the test, two records per chunk.
+    """
+
+    def setUp(self):
+        self.engine = sqlite_engine(self)
+        use_sqlite(self, self.engine)
+
+    def write(self, suffix: str, lines: list) -> str:
+        descriptor, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(descriptor, "w") as target:
+            target.write("\n".join(lines) + "\n")
+        return path
+
+    def import_file(self, table: str, path: str, offset: int = 0) -> None:
+        call_command(
+            import_data.Command(),
+            table,
+            path,
+            offset=offset,
+            batch_size=2,
+            stdout=io.StringIO(),
+        )
+
+    def rows(self, *columns) -> list:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(*columns).order_by(*columns[0].table.primary_key)
+            ).all()
+
+    def user_record(self, number: int) -> str:
+        return json.dumps(
+            {
+                "name": "user {}".format(number),
+                "email_address": "user{}@example.com".format(number),
+                "password": "",
+            }
+        )
+
+    def test_resume_after_a_failed_chunk_adds_no_duplicates(self):
+        records = [self.user_record(number) for number in range(5)]
+        broken = list(records)
+        broken[3] = json.dumps({"name": "user 3"})
+        path = self.write(".ndjson", broken)
+
+        with self.assertRaises(CommandError) as raised:
+            self.import_file("users", path)
+
+        # The first chunk committed, the chunk holding record 3 did not
+        self.assertEqual(len(self.rows(User.id)), 2)
+        offset = int(
+            re.search(r"--offset (\d+)", str(raised.exception)).group(1)
+        )
+        self.assertEqual(offset, 2)
+
+        self.import_file("users", self.write(".ndjson", records), offset)
+
+        self.assertEqual(
+            [name for name, in self.rows(User.name)],
+            ["user {}".format(number) for number in range(5)],
+        )
+
+    def test_csv_cells_are_typed_and_posts_fan_out(self):
+        session = settings.DB_SESSION
+        user = User(name="user", email_address="user@example.com", password="")
+        group = SocialGroup(name="group")
+        session.add_all([user, group])
+        session.flush()
+        session.add(GroupMembership(user_id=user.id, group_id=group.id))
+        session.commit()
+        user_id, group_id = user.id, group.id
+        session.remove()
+        path = self.write(
+            ".csv",
+            [
+                "group_id,user_id,content,created_at,deleted_at",
+                "{},{},first,2024-01-01T10:00:00,".format(group_id, user_id),
+                "{},{},second,2024-01-02T10:00:00,"
+                "2024-01-03T10:00:00".format(group_id, user_id),
+                "{},{},third,2024-01-04T10:00:00,".format(group_id, user_id),
+            ],
+        )
+
+        self.import_file("posts", path)
+
+        self.assertEqual(
+            self.rows(Post.content, Post.created_at, Post.deleted_at),
+            [
+                ("first", datetime(2024, 1, 1, 10), None),
+                (
+                    "second",
+                    datetime(2024, 1, 2, 10),
+                    datetime(2024, 1, 3, 10),
+                ),
+                ("third", datetime(2024, 1, 4, 10), None),
+            ],
+        )
+        # Every imported post got a code and reached the member's timeline
+        self.assertEqual(len({code for code, in self.rows(Post.code)}), 3)
+        self.assertEqual(len(self.rows(TimelineEntry.post_id)), 3)
+
+
+class FeedTests(SimpleTestCase):
+    """
+    Timelines of a group whose post ids are not in creation order, as
+    after an import.
+    """
+
+    # Minutes after START each post was created at, in id order
+    CREATED = [3, 1, 4, 0, 2, 2]
+    START = datetime(2024, 1, 1)
+
+    def setUp(self):
+        engine = sqlite_engine(self)
+        self.session = sessionmaker(bind=engine)()
+        self.addCleanup(self.session.close)
+
+        author, member = [
+            User(name=name, email_address=name + "@example.com", password="")
+            for name in ("author", "member")
+        ]
+        group = SocialGroup(name="group")
+        self.session.add_all([author, member, group])
+        self.session.flush()
+        posts = [
+            Post(
+                group_id=group.id,
+                user_id=author.id,
+                content="",
+                created_at=self.START + timedelta(minutes=minutes),
+            )
+            for minutes in self.CREATED
+        ]
+        self.session.add_all(posts)
+        self.session.flush()
+        self.member_id, self.group_id = member.id, group.id
+        self.post_ids = [post.id for post in posts]
+
+        # Newest first, ties on creation time broken by the id
+        self.newest_first = [
+            post.id
+            for post in sorted(
+                posts,
+                key=lambda post: (post.created_at, post.id),
+                reverse=True,
+            )
+        ]
+
+    def timeline(self) -> list:
+        return self.session.execute(
+            select(TimelineEntry.post_id)
+            .where(TimelineEntry.user_id == self.member_id)
+            .order_by(
+                TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()
+            )
+        ).scalars().all()
+
+    def test_feed_pages_follow_creation_time(self):
+        self.session.add(
+            GroupMembership(user_id=self.member_id, group_id=self.group_id)
+        )
+        self.session.flush()
+        fan_out_posts(self.session, self.post_ids, self.group_id)
+
+        seen, cursor = [], None
+        while True:
+            rows = self.session.execute(
+                statements.user_feed(self.member_id, limit=3, cursor=cursor)
+            ).mappings().all()
+            page, next_cursor = paginate([dict(row) for row in rows], 2)
+            seen += [row["post_code"] for row in page]
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor)
+
+        codes = dict(
+            self.session.execute(select(Post.id, Post.code)).all()
+        )
+        self.assertEqual(
+            seen, [codes[post_id] for post_id in self.newest_first]
+        )
+
+    @override_settings(FEED_BACKFILL=2, FEED_MAX_ENTRIES=100)
+    def test_backfill_copies_the_newest_posts(self):
+        backfill_member(self.session, self.member_id, self.group_id)
+
+        self.assertEqual(self.timeline(), self.newest_first[:2])
+
+    @override_settings(FEED_BACKFILL=100, FEED_MAX_ENTRIES=3)
+    def test_backfill_trims_the_timeline(self):
+        backfill_member(self.session, self.member_id, self.group_id)
+
+        self.assertEqual(self.timeline(), self.newest_first[:3])
+
+    def test_trim_keeps_the_newest_entries(self):
+        self.session.add(
+            GroupMembership(user_id=self.member_id, group_id=self.group_id)
+        )
+        self.session.flush()
+        fan_out_posts(self.session, self.post_ids, self.group_id)
+
+        self.assertEqual(trim_timeline(self.session, self.member_id, 4), 2)
+        self.assertEqual(self.timeline(), self.newest_first[:4])
+        self.assertEqual(trim_timeline(self.session, self.member_id, 4), 0)
+
+
+class ExplainQueriesTests(SimpleTestCase):
+    def params(self) -> tuple:
+        code = new_code()
+        compiled = statements.post_by_code(code).compile(
+            dialect=mysql.dialect()
+        )
+        return code, list(bind_params(compiled).values())
+
+    @override_settings(CODE_STORAGE="char")
+    def test_codes_are_bound_as_strings_in_char_storage(self):
+        code, params = self.params()
+        self.assertEqual(params, [code])
+
+    @override_settings(CODE_STORAGE="binary")
+    def test_codes_are_bound_as_bytes_in_binary_storage(self):
+        code, params = self.params()
+        self.assertEqual(params, [uuid.UUID(code).bytes])
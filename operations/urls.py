@@ -1,44 +1,67 @@
 from django.urls import path
 from operations.groups import SocialGroupsAPIView
-from operations.posts import PostsAPIView
+from operations.posts import BulkPostsAPIView, PostsAPIView
 from operations.likes import LikesAPIView
-from operations.comments import CommentsAPIView
+from operations.batch import BatchAPIView
+from operations.comments import BulkCommentsAPIView, CommentsAPIView
+from operations.feed import FeedAPIView
+from social_network.utils.async_views import api_view
 
 
 urlpatterns = [
     path(
         "groups",
-        SocialGroupsAPIView.as_view(),
+        api_view(SocialGroupsAPIView),
         name="all-groups",
     ),
     path(
-        "groups/<str:group_code>",
-        SocialGroupsAPIView.as_view(),
+        "groups/<code:group_code>",
+        api_view(SocialGroupsAPIView),
         name="single-group",
     ),
     path(
-        "groups/<str:group_code>/posts",
-        PostsAPIView.as_view(),
+        "groups/<code:group_code>/posts",
+        api_view(PostsAPIView),
         name="all-posts",
     ),
     path(
-        "posts/<str:post_code>",
-        PostsAPIView.as_view(),
+        "groups/<code:group_code>/posts/bulk",
+        api_view(BulkPostsAPIView),
+        name="bulk-posts",
+    ),
+    path(
+        "posts/<code:post_code>",
+        api_view(PostsAPIView),
         name="single-post",
     ),
     path(
-        "posts/<str:post_code>/comments",
-        CommentsAPIView.as_view(),
+        "posts/<code:post_code>/comments",
+        api_view(CommentsAPIView),
         name="all-comments",
     ),
     path(
-        "posts/<str:post_code>/likes",
-        LikesAPIView.as_view(),
+        "posts/<code:post_code>/comments/bulk",
+        api_view(BulkCommentsAPIView),
+        name="bulk-comments",
+    ),
+    path(
+        "posts/<code:post_code>/likes",
+        api_view(LikesAPIView),
         name="all-likes",
     ),
     path(
-        "comments/<str:comment_code>",
-        CommentsAPIView.as_view(),
+        "comments/<code:comment_code>",
+        api_view(CommentsAPIView),
         name="single-comment",
     ),
+    path(
+        "batch",
+        api_view(BatchAPIView),
+        name="batch",
+    ),
+    path(
+        "feed",
+        api_view(FeedAPIView),
+        name="feed",
+    ),
 ]
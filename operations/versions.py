@@ -0,0 +1,231 @@
+"""
+Version stamps of the listed resources, and the ETags derived from them.
+
+Every write that changes what a listing returns bumps the stamp of the
+resources involved once its transaction commits. Writers never touch the
+stamp rows themselves: the bumps are handed to a background thread, which
+coalesces those of every request over VERSION_BUMP_WINDOW_MS and applies
+them in one short transaction, so writes to the same group do not queue on
+its stamp row. A stamp therefore changes a few milliseconds after the data
+it covers. A conditional GET reads the stamps, a primary key lookup, and
+answers 304 before running the listing query when the client already holds
+the current representation.
+
+Rounds that fail (the database is down) are retried with exponential
+backoff, up to VERSION_BUMP_MAX_BACKOFF seconds apart. Bumps still pending
+when a process dies are lost, so ETags also carry a time bucket that turns
+over every VERSION_ETAG_MAX_AGE seconds: a lost bump makes clients keep a
+stale listing for at most that long.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import defaultdict
+from functools import partial
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.http import HttpResponseNotModified
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, sqlite
+
+from operations.models import ResourceVersion
+from social_network.utils.transactions import on_commit
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+# Group listing, changed by creating or deleting a group
+GROUPS = "groups"
+# User lookups, changed by creating a user. A user's code, name and email
+# address are never updated in place today; whatever starts updating them
+# must bump this too
+USERS = "users"
+
+
+def group_posts(group_id: int) -> str:
+    """
+    Post listing of a group, changed by its posts, comments and likes.
+    """
+    return "group-posts:{}".format(group_id)
+
+
+def user_groups(user_code: str) -> str:
+    """
+    Groups a user is a member of.
+    """
+    return "user-groups:{}".format(str(user_code).lower())
+
+
+class VersionBumper:
+    """
+    Pending version bumps, applied by a background thread.
+    """
+
+    def __init__(self, window: float, max_backoff: float):
+        self.window = window
+        self.max_backoff = max_backoff
+        # engine -> resources waiting to be bumped
+        self._pending = defaultdict(set)
+        self._cond = threading.Condition()
+        # One round at a time, flush() returns once the bumps are applied
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.rounds = 0
+        self.failures = 0
+
+    def add(self, engine, resources: Iterable[str]) -> None:
+        with self._cond:
+            self._pending[engine].update(resources)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="version-bumps", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> bool:
+        """
+        Apply every pending bump now, returns whether all of them were.
+        Bumps that fail are kept for the next round.
+        """
+        with self._flush_lock:
+            with self._cond:
+                pending, self._pending = self._pending, defaultdict(set)
+
+            applied = True
+            for engine, resources in pending.items():
+                try:
+                    with engine.begin() as connection:
+                        connection.execute(
+                            upsert(connection.dialect.name, resources)
+                        )
+                except Exception as e:
+                    logger.error("VERSION BUMP: {}".format(e))
+                    applied = False
+                    with self._cond:
+                        self._pending[engine].update(resources)
+            self.rounds += 1
+            self.failures = 0 if applied else self.failures + 1
+            return applied
+
+    def backoff(self) -> float:
+        """
+        Seconds to wait before the next round: the coalescing window, or
+        after failed rounds twice as long as after the previous one.
+        """
+        if not self.failures:
+            return self.window
+        return min(
+            self.max_backoff,
+            max(self.window, 0.1) * 2 ** (self.failures - 1),
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Let the bumps of concurrent requests join this round
+            time.sleep(self.backoff())
+            self.flush()
+
+
+def upsert(dialect: str, resources: Iterable[str]):
+    """
+    Statement advancing the version of each resource by one, creating the
+    stamps never written. SQLite is supported for test databases.
+    """
+    # Sorted, so concurrent rounds lock the rows in the same order
+    rows = [
+        {"resource": resource, "version": 1}
+        for resource in sorted(set(resources))
+    ]
+    if dialect == "sqlite":
+        return (
+            sqlite.insert(ResourceVersion)
+            .values(rows)
+            .on_conflict_do_update(
+                index_elements=[ResourceVersion.resource],
+                set_={"version": ResourceVersion.version + 1},
+            )
+        )
+    return (
+        mysql.insert(ResourceVersion)
+        .values(rows)
+        .on_duplicate_key_update(version=ResourceVersion.version + 1)
+    )
+
+
+bumper = VersionBumper(
+    window=settings.VERSION_BUMP_WINDOW_MS / 1000,
+    max_backoff=settings.VERSION_BUMP_MAX_BACKOFF,
+)
+# Apply what is still pending when the process exits
+atexit.register(bumper.flush)
+
+
+def bump(session, *resources: str) -> None:
+    """
+    Advance the version of each resource once `session`'s transaction
+    commits; nothing is bumped if it rolls back.
+    """
+    if not resources:
+        return
+    on_commit(session, partial(bumper.add, session.get_bind(), resources))
+
+
+def stamps(resources: Iterable[str]):
+    """
+    Resource and version of each of `resources` that was ever written.
+    """
+    return select(ResourceVersion.resource, ResourceVersion.version).where(
+        ResourceVersion.resource.in_(list(resources))
+    )
+
+
+def current(session, resources: Iterable[str]) -> Dict[str, int]:
+    """
+    Current version of each resource, 0 for one never written.
+    """
+    resources = set(resources)
+    versions = dict(session.execute(stamps(resources)).all())
+    return {resource: versions.get(resource, 0) for resource in resources}
+
+
+def etag(request, stamps: Dict[str, int]) -> str:
+    """
+    Strong ETag of the response to `request`, from the versions returned
+    by current() and the current time bucket.
+    """
+    key = "|".join(
+        [request.get_full_path()]
+        + [
+            "{}={}".format(resource, stamps[resource])
+            for resource in sorted(stamps)
+        ]
+    )
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    # Offset per tag, so the tags of all listings do not expire together
+    max_age = settings.VERSION_ETAG_MAX_AGE
+    bucket = int((time.time() + int(digest[:8], 16) % max_age) // max_age)
+    return '"{}-{}"'.format(digest, bucket)
+
+
+def not_modified(request, current: str) -> Optional[HttpResponseNotModified]:
+    """
+    A 304 response if the request's If-None-Match holds `current`.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+
+    # If-None-Match uses the weak comparison
+    candidates = [tag.strip() for tag in header.split(",")]
+    if "*" in candidates or current in [
+        tag[2:] if tag.startswith("W/") else tag for tag in candidates
+    ]:
+        return HttpResponseNotModified(headers={"ETag": current})
+    return None
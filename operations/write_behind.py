@@ -0,0 +1,300 @@
+"""
+Opt-in group commit pipeline for like toggles and new comments.
+
+Writes are queued in-process and a single flusher thread applies them in
+batches (up to WRITE_BEHIND_MAX_BATCH operations or WRITE_BEHIND_WINDOW_MS
+of waiting) with multi-row statements and one COMMIT per batch. Callers
+block until the batch holding their write is committed. A caller that gives
+up after WRITE_BEHIND_TIMEOUT withdraws its write if no batch took it yet,
+otherwise it waits for that batch, so a failed request never leaves a write
+behind.
+"""
+import atexit
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from django.conf import settings
+from sqlalchemy import insert, select, tuple_, update
+
+from operations import statements, versions
+from operations.models import Comment, Like, Post
+from social_network.utils.codes import new_code
+
+# Get an instance of logger
+logger = logging.getLogger("operations")
+
+LIKE_TOGGLE = "like_toggle"
+NEW_COMMENT = "new_comment"
+
+_STOP = object()
+
+
+class PendingWrite:
+    __slots__ = ("kind", "post_id", "user_id", "content", "code", "future")
+
+    def __init__(self, kind, post_id, user_id, content=None, code=None):
+        self.kind = kind
+        self.post_id = post_id
+        self.user_id = user_id
+        self.content = content
+        self.code = code
+        self.future = Future()
+
+
+class WriteBehindPipeline:
+    """
+    Queue of pending writes drained by a background flusher thread.
+    """
+
+    def __init__(self, session_factory, window: float, max_batch: int):
+        self.session_factory = session_factory
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+
+    def submit(self, write: PendingWrite) -> Future:
+        self._ensure_started()
+        self._queue.put(write)
+        return write.future
+
+    def stop(self) -> None:
+        """
+        Flush what is queued and stop the flusher thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "operations": self.operations,
+                "avg_batch_size": (
+                    round(self.operations / self.batches, 2)
+                    if self.batches
+                    else 0.0
+                ),
+                "queued": self._queue.qsize(),
+            }
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    write = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if write is _STOP:
+                    stopping = True
+                    break
+                batch.append(write)
+
+            # Drop the writes withdrawn by their caller, the others can no
+            # longer be withdrawn
+            batch = [
+                write
+                for write in batch
+                if write.future.set_running_or_notify_cancel()
+            ]
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        session = None
+        try:
+            session = self.session_factory()
+            results = apply_batch(session, batch)
+            session.commit()
+        except Exception as e:
+            logger.error("WRITE BEHIND FLUSH: {}".format(e))
+            if session is None:
+                for write in batch:
+                    write.future.set_exception(e)
+                return
+
+            session.rollback()
+            session.close()
+            if len(batch) > 1:
+                # Isolate the failing write, the others still go through
+                for write in batch:
+                    self._flush([write])
+            else:
+                batch[0].future.set_exception(e)
+            return
+
+        session.close()
+        with self._stats_lock:
+            self.batches += 1
+            self.operations += len(batch)
+        for write, result in zip(batch, results):
+            write.future.set_result(result)
+
+
+def apply_batch(session, batch) -> list:
+    """
+    Apply a batch of writes with multi-row statements, returning one result
+    per write: True for like toggles, the new code for comments.
+    """
+    results = [None] * len(batch)
+    # post_id -> [like delta, comment delta]
+    deltas = defaultdict(lambda: [0, 0])
+
+    toggles = [
+        (index, write)
+        for index, write in enumerate(batch)
+        if write.kind == LIKE_TOGGLE
+    ]
+    if toggles:
+        # Two toggles of the same like within the batch cancel out
+        odd = defaultdict(bool)
+        for index, write in toggles:
+            odd[(write.post_id, write.user_id)] ^= True
+            results[index] = True
+
+        flipped = [pair for pair, flip in odd.items() if flip]
+        if flipped:
+            session.execute(
+                statements.flip_likes(
+                    session.get_bind().dialect.name, flipped
+                )
+            )
+            for row in session.execute(
+                select(Like.post_id, Like.deleted_at).where(
+                    tuple_(Like.post_id, Like.user_id).in_(flipped)
+                )
+            ):
+                deltas[row.post_id][0] += 1 if row.deleted_at is None else -1
+
+    new_comments = []
+    for index, write in enumerate(batch):
+        if write.kind == NEW_COMMENT:
+            new_comments.append(
+                {
+                    "code": write.code,
+                    "user_id": write.user_id,
+                    "post_id": write.post_id,
+                    "content": write.content,
+                }
+            )
+            deltas[write.post_id][1] += 1
+            results[index] = write.code
+    if new_comments:
+        session.execute(insert(Comment).values(new_comments))
+
+    changed = [
+        post_id
+        for post_id, (like_delta, comment_delta) in deltas.items()
+        if like_delta or comment_delta
+    ]
+    for post_id in changed:
+        like_delta, comment_delta = deltas[post_id]
+        session.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(
+                like_count=Post.like_count + like_delta,
+                comment_count=Post.comment_count + comment_delta,
+            )
+        )
+    if changed:
+        group_ids = session.execute(
+            select(Post.group_id).where(Post.id.in_(changed)).distinct()
+        ).scalars()
+        versions.bump(
+            session,
+            *[versions.group_posts(group_id) for group_id in group_ids],
+        )
+
+    return results
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> WriteBehindPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = WriteBehindPipeline(
+                session_factory=settings.SAL_SESSION,
+                window=settings.WRITE_BEHIND_WINDOW_MS / 1000,
+                max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+            )
+            atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def wait(future: Future):
+    """
+    Result of a queued write. After WRITE_BEHIND_TIMEOUT the write is
+    withdrawn and TimeoutError raised, unless a batch already took it: its
+    outcome is then awaited, as the write may still be committed.
+    """
+    try:
+        return future.result(timeout=settings.WRITE_BEHIND_TIMEOUT)
+    except concurrent.futures.TimeoutError:
+        if future.cancel():
+            raise
+        logger.error("WRITE BEHIND: timed out while flushing, waiting")
+        return future.result()
+
+
+def submit_like_toggle(post_id: int, user_id: int) -> bool:
+    """
+    Queue a like toggle and wait until its batch is committed.
+    """
+    return wait(
+        get_pipeline().submit(
+            PendingWrite(LIKE_TOGGLE, post_id=post_id, user_id=user_id)
+        )
+    )
+
+
+def submit_comment(post_id: int, user_id: int, content: str) -> str:
+    """
+    Queue a new comment and wait until its batch is committed, returns the
+    comment code.
+    """
+    return wait(
+        get_pipeline().submit(
+            PendingWrite(
+                NEW_COMMENT,
+                post_id=post_id,
+                user_id=user_id,
+                content=content,
+                code=new_code(),
+            )
+        )
+    )
@@ -1,11 +1,16 @@
 import logging
 import jwt
+from sqlalchemy import select, update
 from django.conf import settings
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 from typing import Optional, Union
 
 from social_network.utils import custom_exceptions as ce
+from social_network.utils.cache import MISSING, TTLCache
+from service_auth.models import TokenRevocation
+from service_auth.revocation import revocations
+from social_network.utils.transactions import on_commit
 from users.models import User
 
 from social_network.utils.data_formatter import (
@@ -13,12 +18,22 @@ from social_network.utils.data_formatter import (
     result_row_to_dict,
 )
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 # Get an instance of logger
 logger = logging.getLogger("service_auth")
 
+# user_code -> {id, name, code, token_version} of resolved users, None for unknown codes
+user_cache = TTLCache(
+    "auth_user",
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL,
+)
+
 
 class JWTAuthentication(BaseAuthentication):
     """
@@ -45,9 +60,15 @@ class JWTAuthentication(BaseAuthentication):
                     settings.SECRET_KEY,
                     algorithms=["HS256"],
                 )
-                user = fetch_user_by_criteria(
-                    user_code=payload.get("user_code")
-                )
+                user = None
+                if settings.JWT_STATELESS:
+                    user = user_from_claims(payload)
+                if user is None:
+                    user = fetch_user_by_criteria(
+                        user_code=payload.get("user_code")
+                    )
+                    if user and is_revoked(user, payload.get("ver", 0)):
+                        raise ce.TokenRevoked
 
                 if user:
                     return (user, None)
@@ -75,6 +96,50 @@ class JWTAuthentication(BaseAuthentication):
             raise ce.InvalidTokenError
 
 
+def user_from_claims(payload: dict) -> Optional[dict]:
+    """
+    Build the request user from the claims of a stateless access token.
+
+    Returns None when the token carries no user claims or the revocation
+    list is not loaded yet, the user is then read from the database.
+    """
+    if "uid" not in payload or not revocations.ready:
+        return None
+    if revocations.is_revoked(payload["uid"], payload.get("ver", 0)):
+        raise ce.TokenRevoked
+
+    return {
+        "id": payload["uid"],
+        "name": payload.get("name"),
+        "code": payload.get("user_code"),
+    }
+
+
+def is_revoked(user: dict, token_version: int) -> bool:
+    """
+    Whether a token of a user read from the database or the user cache was
+    revoked, popping the user's token version.
+
+    The cached version can be up to AUTH_USER_CACHE_TTL old and misses
+    revocations made by other processes, so the revocation list, reloaded
+    every JWT_REVOCATION_REFRESH seconds, is checked as well.
+    """
+    if token_version < user.pop("token_version"):
+        return True
+    return revocations.ready and revocations.is_revoked(
+        user["id"], token_version
+    )
+
+
+def token_user(user_code: str):
+    """
+    The user fields an access token is resolved to.
+    """
+    return select(User.id, User.name, User.code, User.token_version).where(
+        User.code == user_code
+    )
+
+
 def fetch_user_by_criteria(user_code: str) -> Optional[User]:
     """
     Fetch a user based on provided criteria.
@@ -88,18 +153,73 @@ def fetch_user_by_criteria(user_code: str) -> Optional[User]:
     Returns:
     Optional[User]: The user object if found, otherwise None.
     """
+    user = user_cache.get(user_code)
+    if user is not MISSING:
+        return dict(user) if user else None
+
     try:
-        query = (
-            session.query(User.id, User.name, User.code)
-            .filter(User.code == user_code)
-            .one_or_none()
-        )
-        session.commit()
-
-        user = result_row_to_dict(query) if query else None
+        row = read_session.execute(token_user(user_code)).one_or_none()
+        if row is None and read_session.get_bind() is not session.get_bind():
+            # A lagging replica misses users who just signed up, only a miss
+            # on the primary is cached
+            row = session.execute(token_user(user_code)).one_or_none()
+
+        user = result_row_to_dict(row) if row else None
+        if user:
+            user_cache.set(user_code, user)
+            user = dict(user)
+        else:
+            user_cache.set(
+                user_code, None, ttl=settings.AUTH_USER_NEGATIVE_TTL
+            )
     except Exception as e:
         logger.error("FETCH USER BY CRITERIA: {}".format(e))
-        session.rollback()
+        read_session.rollback()
         user = None
 
     return user
+
+
+def invalidate_user(user_code: str) -> None:
+    """
+    Forget the cached user (or unknown code) so the next request with this
+    code reads the users table again.
+    """
+    user_cache.pop(user_code)
+
+
+def invalidate_all_users() -> None:
+    user_cache.clear()
+
+
+def revoke_user_tokens(session, user_code: str) -> Optional[int]:
+    """
+    Revoke every token issued so far to the user, returns the new token
+    version or None for an unknown user. Committing is left to the caller.
+    """
+    user_id = session.execute(
+        select(User.id).where(User.code == user_code)
+    ).scalar()
+    if user_id is None:
+        return None
+
+    session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    token_version = session.execute(
+        select(User.token_version).where(User.id == user_id)
+    ).scalar_one()
+    session.add(
+        TokenRevocation(user_id=user_id, token_version=token_version)
+    )
+    session.flush()
+
+    def apply():
+        revocations.revoke(user_id, token_version)
+        invalidate_user(user_code)
+
+    on_commit(session, apply)
+    return token_version
@@ -0,0 +1,47 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from service_auth.auth import revoke_user_tokens
+
+# Get an instance of logger
+logger = logging.getLogger("service_auth")
+
+
+class Command(BaseCommand):
+    help = (
+        "Revoke every access and refresh token issued so far to the given "
+        "users. Other processes apply it on their next revocation list "
+        "refresh."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "user_codes",
+            nargs="+",
+            help="Codes of the users whose tokens are revoked",
+        )
+
+    def handle(self, *args, **options):
+        session = settings.DB_SESSION
+        try:
+            for user_code in options["user_codes"]:
+                token_version = revoke_user_tokens(session, user_code)
+                if token_version is None:
+                    raise CommandError("User {} not found".format(user_code))
+                self.stdout.write(
+                    "{}: tokens before version {} revoked".format(
+                        user_code, token_version
+                    )
+                )
+            session.commit()
+
+        except Exception as e:
+            logger.error("REVOKE TOKENS: {}".format(e))
+            session.rollback()
+            raise
+        finally:
+            settings.DB_SESSION.remove()
+
+        self.stdout.write(self.style.SUCCESS("Tokens revoked"))
@@ -0,0 +1,107 @@
+"""
+In-memory revocation list for stateless access tokens.
+
+A user's tokens are revoked (service_auth.auth.revoke_user_tokens) by
+bumping users.token_version and logging the new version in
+token_revocations. Each process keeps, for the users revoked
+within the lifetime of a refresh token, the lowest token version still
+valid, and reloads that map from the database every
+JWT_REVOCATION_REFRESH seconds in a background thread. Older revocations
+need no entry since every token they covered has expired.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from sqlalchemy import func, select, text
+
+from service_auth.models import TokenRevocation
+
+# Get an instance of logger
+logger = logging.getLogger("service_auth")
+
+
+class RevocationList:
+    def __init__(self, engine, window_minutes: int, refresh_seconds: float):
+        self.engine = engine
+        self.window_minutes = window_minutes
+        self.refresh_seconds = refresh_seconds
+        # user_id -> lowest valid token version
+        self._min_versions = {}
+        self._loaded = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the list was loaded at least once, starting the refresher
+        on first use.
+        """
+        self._ensure_started()
+        return self._loaded.is_set()
+
+    def is_revoked(self, user_id: int, token_version: int) -> bool:
+        return token_version < self._min_versions.get(user_id, 0)
+
+    def refresh(self) -> None:
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(
+                    TokenRevocation.user_id,
+                    func.max(TokenRevocation.token_version),
+                )
+                .where(
+                    TokenRevocation.created_at
+                    >= func.timestampadd(
+                        text("MINUTE"), -self.window_minutes, func.now()
+                    )
+                )
+                .group_by(TokenRevocation.user_id)
+            ).all()
+
+        # Swapped in one assignment, readers never see a partial map
+        self._min_versions = {user_id: version for user_id, version in rows}
+        self._loaded.set()
+
+    def revoke(self, user_id: int, token_version: int) -> None:
+        """
+        Apply a revocation made by this process without waiting for the
+        next refresh.
+        """
+        min_versions = dict(self._min_versions)
+        min_versions[user_id] = max(
+            token_version, min_versions.get(user_id, 0)
+        )
+        self._min_versions = min_versions
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="jwt-revocations", daemon=True
+                )
+                self._thread.start()
+        # Give the first load a moment so the first requests can use it
+        self._loaded.wait(timeout=1)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("REVOCATION LIST REFRESH: {}".format(e))
+            time.sleep(self.refresh_seconds)
+
+
+revocations = RevocationList(
+    engine=settings.ENGINE,
+    window_minutes=max(
+        settings.ACCESS_TOKEN_EXPIRY, settings.REFRESH_TOKEN_EXPIRY
+    ),
+    refresh_seconds=settings.JWT_REVOCATION_REFRESH,
+)
+
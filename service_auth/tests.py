@@ -1,3 +1,114 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from social_network.utils import custom_exceptions as ce
+from social_network.utils.db_router import ReplicaRouter
+from social_network.utils.testing import sqlite_engine, use_sqlite
+from service_auth.auth import (
+    JWTAuthentication,
+    fetch_user_by_criteria,
+    invalidate_user,
+    user_cache,
+)
+from service_auth.revocation import RevocationList, revocations
+from service_auth.views import create_access_token
+from users.models import User
+
+USER_CODE = "0190b6e2-6c1a-7000-8000-000000000001"
+
+
+@override_settings(JWT_STATELESS=False)
+class RevokedTokenTests(SimpleTestCase):
+    """
+    Tokens resolved through the user lookup, with the user cached at the
+    token version it had before the revocation.
+    """
+
+    def setUp(self):
+        user_cache.set(
+            USER_CODE,
+            {"id": 1, "name": "user", "code": USER_CODE, "token_version": 1},
+        )
+        self.addCleanup(invalidate_user, USER_CODE)
+
+        # A loaded revocation list that no refresh overwrites
+        patchers = [
+            mock.patch.object(revocations, "_min_versions", {}),
+            mock.patch.object(
+                RevocationList,
+                "ready",
+                new_callable=mock.PropertyMock,
+                return_value=True,
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def authenticate(self, token_version: int):
+        token = create_access_token(USER_CODE, claims={"ver": token_version})
+        request = APIRequestFactory().get(
+            "/", HTTP_AUTHORIZATION="Bearer {}".format(token)
+        )
+        return JWTAuthentication().authenticate(request)
+
+    def test_valid_token_is_accepted(self):
+        user, _ = self.authenticate(token_version=1)
+        self.assertEqual(user["id"], 1)
+        self.assertNotIn("token_version", user)
+
+    def test_token_revoked_by_another_process_is_rejected(self):
+        # Loaded from token_revocations by the refresher, the cached user
+        # still has the old version
+        revocations.revoke(1, 2)
+
+        with self.assertRaises(ce.TokenRevoked):
+            self.authenticate(token_version=1)
+
+    def test_token_issued_after_revocation_is_accepted(self):
+        revocations.revoke(1, 2)
+
+        user, _ = self.authenticate(token_version=2)
+        self.assertEqual(user["code"], USER_CODE)
+
+
+class ReplicaLagTests(SimpleTestCase):
+    """
+    User lookups routed to a replica that has not caught up with the
+    primary yet.
+    """
+
+    def setUp(self):
+        self.primary = sqlite_engine(self)
+        use_sqlite(self, self.primary)
+        replica = sqlite_engine(self)
+        settings.DB_READ_SESSION.configure(
+            router=ReplicaRouter(primary=self.primary, replicas=[replica])
+        )
+
+    def add_user(self, code: str) -> None:
+        with self.primary.begin() as connection:
+            connection.execute(
+                User.__table__.insert().values(
+                    code=code,
+                    name="user",
+                    email_address="user@example.com",
+                    password="",
+                )
+            )
+
+    def test_user_missing_on_the_replica_is_read_from_the_primary(self):
+        self.add_user(USER_CODE)
+
+        user = fetch_user_by_criteria(USER_CODE)
+
+        self.assertEqual(user["code"], USER_CODE)
+        self.assertEqual(user_cache.get(USER_CODE)["code"], USER_CODE)
+
+    def test_unknown_user_is_cached_once_missing_on_the_primary(self):
+        self.assertIsNone(fetch_user_by_criteria(USER_CODE))
+
+        self.assertIsNone(user_cache.get(USER_CODE))
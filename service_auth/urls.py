@@ -1,11 +1,12 @@
 from django.urls import path
 from service_auth.views import Authentication
+from social_network.utils.async_views import api_view
 
 
 urlpatterns = [
     path(
         "<str:slug>",
-        Authentication.as_view(),
+        api_view(Authentication),
         name="authentication",
     )
 ]
@@ -1,4 +1,3 @@
-import hashlib
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Union
@@ -10,16 +9,23 @@ from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from sqlalchemy import select
 
 from social_network.utils import custom_exceptions as ce
+from social_network.utils.custom_validator import ThreadLocalValidator
+from social_network.utils.passwords import (
+    hash_password,
+    needs_rehash,
+    verify_password,
+)
 from service_auth import schemas
 from service_auth.models import User
 
 # Get an instance of logger
 logger = logging.getLogger("service_auth")
-c_validator = Validator()
+c_validator = ThreadLocalValidator(validator_class=Validator)
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
 
@@ -49,6 +55,12 @@ class Authentication(APIView):
             return Response(
                 {"message": str(vf)}, status=status.HTTP_400_BAD_REQUEST
             )
+        except ce.ServerBusy as sb:
+            logger.error("AUTHENTICATION : {}".format(sb))
+            return Response(
+                {"message": str(sb)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         except Exception as e:
             logger.error("AUTHENTICATION : {}".format(e))
             return Response(
@@ -81,19 +93,17 @@ def handle_authentication(request, slug: str) -> Response:
                     }
                 )
 
-            email_address = request.data["email_address"]
-            password = request.data["password"]
-            password = hashlib.md5(str(password).encode()).hexdigest()
-
-            user = fetch_user(
-                email_address=email_address, password=password
+            user = authenticate_user(
+                email_address=request.data["email_address"],
+                password=request.data["password"],
             )
             if user:
+                claims = token_claims(user)
                 access_token = create_access_token(
-                    user_code=user["code"]
+                    user_code=user["code"], claims=claims
                 )
                 refresh_token = create_refresh_token(
-                    user_code=user["code"]
+                    user_code=user["code"], claims=claims
                 )
 
                 return Response(
@@ -132,17 +142,32 @@ def handle_authentication(request, slug: str) -> Response:
     except ce.ValidationFailed as vf:
         logger.error("AUTHENTICATION : {}".format(vf))
         raise
+    except ce.ServerBusy as sb:
+        logger.error("AUTHENTICATION : {}".format(sb))
+        raise
     except Exception as e:
         logger.error("AUTHENTICATION : {}".format(e))
         raise ce.InternalServerError
 
 
-def create_access_token(user_code: str) -> str:
+def token_claims(user) -> dict:
+    """
+    Claims identifying the user in tokens: the token version always, the
+    id and name too in stateless mode.
+    """
+    claims = {"ver": user["token_version"]}
+    if settings.JWT_STATELESS:
+        claims.update(uid=user["id"], name=user["name"])
+    return claims
+
+
+def create_access_token(user_code: str, claims: Optional[dict] = None) -> str:
     """
     Creates an access token for a user.
 
     Parameters:
     user_code (str): The code of the user.
+    claims (Optional[dict]): Extra claims, see token_claims.
 
     Returns:
     str: The generated access token.
@@ -154,6 +179,7 @@ def create_access_token(user_code: str) -> str:
             + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRY)
         ),
         "iat": datetime.now(),
+        **(claims or {}),
     }
 
     access_token = jwt.encode(
@@ -163,12 +189,13 @@ def create_access_token(user_code: str) -> str:
     return access_token
 
 
-def create_refresh_token(user_code: str) -> str:
+def create_refresh_token(user_code: str, claims: Optional[dict] = None) -> str:
     """
     Creates a refresh token for a user.
 
     Parameters:
     user_code (str): The code of the user.
+    claims (Optional[dict]): Extra claims, see token_claims.
 
     Returns:
     str: The generated refresh token.
@@ -180,6 +207,12 @@ def create_refresh_token(user_code: str) -> str:
             + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRY)
         ),
         "iat": datetime.now(),
+        # Only what is needed to check the refresh token for revocation
+        **{
+            key: value
+            for key, value in (claims or {}).items()
+            if key in ("uid", "ver")
+        },
     }
 
     refresh_token = jwt.encode(
@@ -208,16 +241,22 @@ def regenerate_tokens(refresh_token: Optional[str] = None) -> Response:
             algorithms=["HS256"],
         )
 
+        user = None
         if payload.get("user_code"):
+            user = fetch_user(user_code=payload.get("user_code"))
+
+        # Refresh tokens issued before a revocation cannot be exchanged
+        if user and payload.get("ver", 0) >= user["token_version"]:
+            claims = token_claims(user)
             return Response(
                 {
                     "message": "Token regenerated successfully",
                     "data": {
                         "access_token": create_access_token(
-                            payload.get("user_code")
+                            payload.get("user_code"), claims=claims
                         ),
                         "refresh_token": create_refresh_token(
-                            payload.get("user_code")
+                            payload.get("user_code"), claims=claims
                         ),
                     },
                 },
@@ -261,6 +300,70 @@ def regenerate_tokens(refresh_token: Optional[str] = None) -> Response:
         )
 
 
+def login_user(email_address: str):
+    """
+    The user fields a login needs, by email address.
+    """
+    return select(
+        User.code, User.id, User.name, User.token_version, User.password
+    ).where(User.email_address == email_address)
+
+
+def authenticate_user(email_address: str, password: str) -> Optional[User]:
+    """
+    Check a user's credentials, upgrading a legacy or outdated password
+    hash once the password is known to be right.
+
+    Returns:
+    Optional[User]: The user row if the credentials match, otherwise None.
+    """
+    try:
+        user = session.execute(login_user(email_address)).first()
+        if not user or not verify_password(password, user.password):
+            return None
+
+        if needs_rehash(user.password):
+            session.query(User).filter(User.id == user.id).update(
+                {User.password: hash_password(password)},
+                synchronize_session=False,
+            )
+            session.flush()
+
+    except ce.ServerBusy:
+        raise
+    except Exception as e:
+        logger.error("AUTHENTICATE USER: {}".format(e))
+        session.rollback()
+        user = None
+
+    return user
+
+
+def user_by_criteria(
+    user_id: Optional[int] = None,
+    user_code: Optional[str] = None,
+    email_address: Optional[str] = None,
+    name: Optional[str] = None,
+    password: Optional[str] = None,
+):
+    """
+    Code, id, name and token version of the users matching every given
+    filter.
+    """
+    query = select(User.code, User.id, User.name, User.token_version)
+    if user_id:
+        query = query.where(User.id == user_id)
+    if user_code:
+        query = query.where(User.code == user_code)
+    if email_address:
+        query = query.where(User.email_address == email_address)
+    if name:
+        query = query.where(User.name == name)
+    if password:
+        query = query.where(User.password == password)
+    return query
+
+
 def fetch_user(
     user_id: Optional[int] = None,
     user_code: Optional[str] = None,
@@ -282,20 +385,15 @@ def fetch_user(
     Optional[User]: The user object if found, otherwise None.
     """
     try:
-        query = session.query(User.code)
-        if user_id:
-            query = query.filter(User.id == user_id)
-        if user_code:
-            query = query.filter(User.code == user_code)
-        if email_address:
-            query = query.filter(User.email_address == email_address)
-        if name:
-            query = query.filter(User.name == name)
-        if password:
-            query = query.filter(User.password == password)
-
-        user = query.first()
-        session.commit()
+        user = session.execute(
+            user_by_criteria(
+                user_id=user_id,
+                user_code=user_code,
+                email_address=email_address,
+                name=name,
+                password=password,
+            )
+        ).first()
     except Exception as e:
         logger.error("FETCH USER: {}".format(e))
         session.rollback()
@@ -0,0 +1,70 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from social_network.utils import transactions
+
+# Get an instance of logger
+logger = logging.getLogger("social_network")
+
+
+class DBSessionMiddleware:
+    """
+    Scope the SQLAlchemy sessions and their transaction to a single request.
+
+    The session registries in settings hand out one Session per thread; this
+    middleware applies the transaction policy (read-only for safe methods,
+    a single commit for successful writes) and makes sure those Sessions are
+    closed and removed from their registries when the response is produced,
+    so connections go back to the pool and no state leaks into the next
+    request served by the thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = transactions.begin_request(request)
+        try:
+            response = self.get_response(request)
+            response = transactions.finish_request(response)
+        finally:
+            self.release_session()
+            transactions.end_request(token)
+
+        return response
+
+    async def __acall__(self, request):
+        token = transactions.begin_request(request)
+        try:
+            response = await self.get_response(request)
+            # Sync views are run on the shared sync thread under ASGI
+            response = await sync_to_async(transactions.finish_request)(
+                response
+            )
+        finally:
+            await sync_to_async(self.release_session)()
+            transactions.end_request(token)
+
+        return response
+
+    @staticmethod
+    def release_session() -> None:
+        """
+        Roll back anything left open and discard the thread's sessions.
+        """
+        for registry in (settings.DB_SESSION, settings.DB_READ_SESSION):
+            try:
+                registry.remove()
+            except Exception as e:
+                logger.error("DB SESSION MIDDLEWARE: {}".format(e))
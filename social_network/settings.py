@@ -14,8 +14,13 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from urllib import parse
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import MetaData
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from social_network.utils.db_pool import create_db_engine
+from social_network.utils.db_router import ReadSession, ReplicaRouter
+from social_network.utils.db_scope import session_scope
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -66,6 +71,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "social_network.middleware.DBSessionMiddleware",
 ]
 
 ROOT_URLCONF = "social_network.urls"
@@ -102,6 +108,74 @@ DB_USER = os.getenv(key="DB_USER", default="social_network_user")
 DB_PASSWORD = os.getenv(key="DB_PASSWORD", default="dsfjjwejed")
 DB_PORT = os.getenv(key="DB_PORT", default="3306")
 
+# CONNECTION POOL SETTINGS
+DB_POOL_SIZE = int(os.getenv(key="DB_POOL_SIZE", default=5))
+DB_MAX_OVERFLOW = int(os.getenv(key="DB_MAX_OVERFLOW", default=10))
+# Seconds after which a connection is replaced, keep below MySQL wait_timeout
+DB_POOL_RECYCLE = int(os.getenv(key="DB_POOL_RECYCLE", default=1800))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = int(os.getenv(key="DB_POOL_TIMEOUT", default=30))
+# always: ping on every checkout, idle: ping only connections idle for more
+# than DB_POOL_PRE_PING_IDLE seconds, never: no ping
+DB_POOL_PRE_PING = os.getenv(key="DB_POOL_PRE_PING", default="always")
+DB_POOL_PRE_PING_IDLE = int(
+    os.getenv(key="DB_POOL_PRE_PING_IDLE", default=30)
+)
+
+# INTERNAL ENDPOINTS
+# Comma separated client addresses allowed to read /v1/internal/*
+INTERNAL_IPS = [
+    address.strip()
+    for address in os.getenv(
+        key="INTERNAL_IPS", default="127.0.0.1,::1"
+    ).split(",")
+    if address.strip()
+]
+
+# READ REPLICA SETTINGS
+# Comma separated replica hosts, reads go to DB_HOST when empty
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in os.getenv(key="DB_REPLICA_HOSTS", default="").split(",")
+    if host.strip()
+]
+# round_robin or least_busy
+DB_REPLICA_STRATEGY = os.getenv(
+    key="DB_REPLICA_STRATEGY", default="round_robin"
+)
+# Seconds an unreachable replica is skipped before being tried again
+DB_REPLICA_RETRY_AFTER = int(
+    os.getenv(key="DB_REPLICA_RETRY_AFTER", default=30)
+)
+
+# ASYNC REQUEST PATH
+# Serve reads from native async views over an async MySQL driver
+DB_ASYNC = os.getenv(key="DB_ASYNC", default="False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+DB_ASYNC_DRIVER = os.getenv(key="DB_ASYNC_DRIVER", default="mysql+aiomysql")
+
+# WRITE-BEHIND PIPELINE
+# Group commit like toggles and new comments in batched transactions
+WRITE_BEHIND = os.getenv(key="WRITE_BEHIND", default="False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# A batch is flushed after this many milliseconds or operations
+WRITE_BEHIND_WINDOW_MS = float(
+    os.getenv(key="WRITE_BEHIND_WINDOW_MS", default=5)
+)
+WRITE_BEHIND_MAX_BATCH = int(
+    os.getenv(key="WRITE_BEHIND_MAX_BATCH", default=500)
+)
+# Seconds a request waits for its batch to commit
+WRITE_BEHIND_TIMEOUT = float(
+    os.getenv(key="WRITE_BEHIND_TIMEOUT", default=10)
+)
+
 
 DATABASES = {
     "default": {
@@ -126,10 +200,102 @@ DATABASE_URL = (
     + DB_NAME
 )
 
-ENGINE = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
+ENGINE = create_db_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pre_ping=DB_POOL_PRE_PING,
+    pre_ping_idle=DB_POOL_PRE_PING_IDLE,
+    echo=False,
+)
+REPLICA_ENGINES = [
+    create_db_engine(
+        "mysql://"
+        + DB_USER
+        + ":"
+        + parse.quote_plus(DB_PASSWORD)
+        + "@"
+        + replica_host
+        + "/"
+        + DB_NAME,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pre_ping=DB_POOL_PRE_PING,
+        pre_ping_idle=DB_POOL_PRE_PING_IDLE,
+        echo=False,
+    )
+    for replica_host in DB_REPLICA_HOSTS
+]
+READ_ROUTER = ReplicaRouter(
+    primary=ENGINE,
+    replicas=REPLICA_ENGINES,
+    strategy=DB_REPLICA_STRATEGY,
+    retry_after=DB_REPLICA_RETRY_AFTER,
+)
+
 METADATA = MetaData(bind=ENGINE)
 SAL_SESSION = sessionmaker(bind=ENGINE)
-DB_SESSION = SAL_SESSION()
+
+# Request-scoped session registry. Every module keeps a reference to this
+# proxy and each request thread (or async request) transparently gets its
+# own Session, which is released once the response is ready.
+DB_SESSION = scoped_session(SAL_SESSION, scopefunc=session_scope)
+
+# Same lifecycle as DB_SESSION, but statements are routed to a read replica
+# (falling back to the primary). Only use it for read-only helpers.
+DB_READ_SESSION = scoped_session(
+    sessionmaker(class_=ReadSession, router=READ_ROUTER),
+    scopefunc=session_scope,
+)
+
+# Async engines used by the async views when DB_ASYNC is enabled, the
+# primary and one per read replica
+ASYNC_ENGINE = None
+ASYNC_REPLICA_ENGINES = []
+ASYNC_READ_ROUTER = None
+ASYNC_SESSION = None
+ASYNC_READ_SESSION = None
+if DB_ASYNC:
+    ASYNC_ENGINE, *ASYNC_REPLICA_ENGINES = [
+        create_async_engine(
+            DB_ASYNC_DRIVER
+            + "://"
+            + DB_USER
+            + ":"
+            + parse.quote_plus(DB_PASSWORD)
+            + "@"
+            + host
+            + "/"
+            + DB_NAME,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=(DB_POOL_PRE_PING != "never"),
+            echo=False,
+        )
+        for host in [DB_HOST] + DB_REPLICA_HOSTS
+    ]
+    # Routes the async read sessions like READ_ROUTER does the sync ones
+    ASYNC_READ_ROUTER = ReplicaRouter(
+        primary=ASYNC_ENGINE.sync_engine,
+        replicas=[engine.sync_engine for engine in ASYNC_REPLICA_ENGINES],
+        strategy=DB_REPLICA_STRATEGY,
+        retry_after=DB_REPLICA_RETRY_AFTER,
+    )
+    ASYNC_SESSION = sessionmaker(
+        ASYNC_ENGINE, class_=AsyncSession, expire_on_commit=False
+    )
+    ASYNC_READ_SESSION = sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=ReadSession,
+        router=ASYNC_READ_ROUTER,
+        expire_on_commit=False,
+    )
 
 
 # Password validation
@@ -202,6 +368,11 @@ LOGGING = {
             "level": "INFO",
             "propagate": True,
         },
+        "social_network": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": True,
+        },
     },
 }
 
@@ -234,6 +405,107 @@ REFRESH_TOKEN_EXPIRY = int(
     os.getenv(key="REFRESH_TOKEN_EXPIRY", default=60)
 )
 
+# Issue access tokens carrying the user's id, name and token version, so
+# requests are authenticated without reading the users table
+JWT_STATELESS = os.getenv(key="JWT_STATELESS", default="False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# Seconds between reloads of the token revocation list
+JWT_REVOCATION_REFRESH = int(
+    os.getenv(key="JWT_REVOCATION_REFRESH", default=30)
+)
+
+# PUBLIC CODE STORAGE
+# "char" stores codes as CHAR(36) strings, "binary" as BINARY(16) values
+# (see sql/migrations/optional/binary_codes.sql)
+CODE_STORAGE = os.getenv(key="CODE_STORAGE", default="char").lower()
+
+# IN-PROCESS CACHES
+# Live group memberships, keyed by (user_id, group_id)
+MEMBERSHIP_CACHE_SIZE = int(
+    os.getenv(key="MEMBERSHIP_CACHE_SIZE", default=10000)
+)
+MEMBERSHIP_CACHE_TTL = int(os.getenv(key="MEMBERSHIP_CACHE_TTL", default=60))
+# Users resolved from access tokens, keyed by user code
+AUTH_USER_CACHE_SIZE = int(
+    os.getenv(key="AUTH_USER_CACHE_SIZE", default=10000)
+)
+AUTH_USER_CACHE_TTL = int(os.getenv(key="AUTH_USER_CACHE_TTL", default=300))
+# Seconds an unknown user code is remembered
+AUTH_USER_NEGATIVE_TTL = int(
+    os.getenv(key="AUTH_USER_NEGATIVE_TTL", default=30)
+)
+# Post code -> (id, group_id, deleted_at), for likes and comments
+POST_CACHE_SIZE = int(os.getenv(key="POST_CACHE_SIZE", default=50000))
+POST_CACHE_TTL = int(os.getenv(key="POST_CACHE_TTL", default=60))
+# Pages of group post listings
+GROUP_POSTS_CACHE_SIZE = int(
+    os.getenv(key="GROUP_POSTS_CACHE_SIZE", default=2000)
+)
+GROUP_POSTS_CACHE_TTL = int(
+    os.getenv(key="GROUP_POSTS_CACHE_TTL", default=30)
+)
+# Seconds between full reloads of the group code -> id directory
+GROUP_DIRECTORY_REFRESH = int(
+    os.getenv(key="GROUP_DIRECTORY_REFRESH", default=60)
+)
+
+# LISTING VERSIONS
+# Milliseconds version bumps of committed writes are collected before they
+# are applied together
+VERSION_BUMP_WINDOW_MS = float(
+    os.getenv(key="VERSION_BUMP_WINDOW_MS", default=5)
+)
+# Longest wait, in seconds, between retries of version bumps that failed
+VERSION_BUMP_MAX_BACKOFF = float(
+    os.getenv(key="VERSION_BUMP_MAX_BACKOFF", default=30)
+)
+# Seconds after which an ETag changes even if no bump reached the database,
+# bounding staleness when a process dies with bumps still pending
+VERSION_ETAG_MAX_AGE = int(os.getenv(key="VERSION_ETAG_MAX_AGE", default=300))
+
+# BATCH OPERATIONS
+# Most sub-operations accepted by one POST /v1/ops/batch
+BATCH_MAX_OPERATIONS = int(
+    os.getenv(key="BATCH_MAX_OPERATIONS", default=50)
+)
+
+# BULK CREATION
+# Most posts or comments accepted by one bulk request
+BULK_MAX_ROWS = int(os.getenv(key="BULK_MAX_ROWS", default=5000))
+# Rows written per multi-row INSERT statement
+BULK_CHUNK_SIZE = int(os.getenv(key="BULK_CHUNK_SIZE", default=500))
+
+# HOME FEED
+# Entries kept per timeline by trim_feeds and when joining a group, and
+# posts of a group copied into the timeline of a new member
+FEED_MAX_ENTRIES = int(os.getenv(key="FEED_MAX_ENTRIES", default=1000))
+FEED_BACKFILL = int(os.getenv(key="FEED_BACKFILL", default=50))
+
+# PASSWORD HASHING
+# Worker processes computing scrypt hashes, and how many hashes may be
+# queued or running at once before logins are turned away
+PASSWORD_HASH_WORKERS = int(
+    os.getenv(key="PASSWORD_HASH_WORKERS", default=os.cpu_count() or 2)
+)
+PASSWORD_HASH_MAX_PENDING = int(
+    os.getenv(key="PASSWORD_HASH_MAX_PENDING", default=64)
+)
+# Seconds a request waits for a free slot, then for its hash
+PASSWORD_HASH_TIMEOUT = float(
+    os.getenv(key="PASSWORD_HASH_TIMEOUT", default=10)
+)
+# scrypt cost parameters, changing them rehashes passwords on next login
+PASSWORD_SCRYPT_N = int(os.getenv(key="PASSWORD_SCRYPT_N", default=2**14))
+PASSWORD_SCRYPT_R = int(os.getenv(key="PASSWORD_SCRYPT_R", default=8))
+PASSWORD_SCRYPT_P = int(os.getenv(key="PASSWORD_SCRYPT_P", default=1))
+
+# PAGINATION SETTINGS
+PAGE_SIZE = int(os.getenv(key="PAGE_SIZE", default=20))
+MAX_PAGE_SIZE = int(os.getenv(key="MAX_PAGE_SIZE", default=100))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -0,0 +1,387 @@
+import concurrent.futures
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import path, register_converter
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from sqlalchemy import (
+    Column,
+    MetaData,
+    Table,
+    create_engine,
+    event,
+    select,
+)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from operations.models import SocialGroup
+from social_network.utils import custom_exceptions as ce
+from social_network.utils.async_views import async_api_view
+from social_network.utils.codes import Code, new_code, uuid7
+from social_network.utils.converters import CodeConverter
+from social_network.utils.custom_validator import ThreadLocalValidator
+from social_network.utils.db_router import ReadSession, ReplicaRouter
+from social_network.utils.db_scope import session_scope
+from social_network.utils.pagination import decode_cursor, encode_cursor
+from social_network.utils.passwords import PasswordHasher
+from social_network.utils.testing import (
+    sqlite_async_engine,
+    sqlite_engine,
+    sqlite_path,
+)
+
+
+# A database file in a directory that does not exist, connecting fails
+UNREACHABLE = "/nonexistent/replica.sqlite3"
+
+
+class ProbeView(APIView):
+    """
+    Reports which engines and thread served the request.
+    """
+
+    authentication_classes = []
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        session = settings.DB_SESSION
+        read_session = settings.DB_READ_SESSION
+        return Response(
+            {
+                "bind": session.get_bind(),
+                "read_bind": read_session.get_bind(),
+                "groups": session.execute(
+                    select(SocialGroup.name)
+                ).scalars().all(),
+                "read_groups": read_session.execute(
+                    select(SocialGroup.name)
+                ).scalars().all(),
+            }
+        )
+
+    def post(self, request):
+        session = settings.DB_SESSION
+        session.add(SocialGroup(name=request.GET["name"]))
+        session.flush()
+        return Response(
+            {"bind": session.get_bind(), "thread": threading.get_ident()},
+            status=int(request.GET.get("status", 201)),
+        )
+
+
+class AsyncViewTests(SimpleTestCase):
+    """
+    Async views on SQLite stand-ins for the primary and a read replica,
+    each holding one group named after it.
+    """
+
+    def setUp(self):
+        self.checked_out = 0
+        engines = {}
+        for name in ("primary", "replica"):
+            path = sqlite_path(self)
+            engine = sqlite_engine(self, path)
+            with engine.begin() as connection:
+                connection.execute(
+                    SocialGroup.__table__.insert().values(
+                        code=name, name=name
+                    )
+                )
+            engines[name] = engine, sqlite_async_engine(self, path)
+
+        self.engine, self.async_engine = engines["primary"]
+        self.replica_engine, self.async_replica_engine = engines["replica"]
+        for engine in (
+            self.engine,
+            self.async_engine.sync_engine,
+            self.async_replica_engine.sync_engine,
+        ):
+            event.listen(engine, "checkout", self.on_checkout)
+            event.listen(engine, "checkin", self.on_checkin)
+
+        self.async_router = ReplicaRouter(
+            primary=self.async_engine.sync_engine,
+            replicas=[self.async_replica_engine.sync_engine],
+        )
+        overrides = override_settings(
+            DB_SESSION=scoped_session(
+                sessionmaker(bind=self.engine), scopefunc=session_scope
+            ),
+            DB_READ_SESSION=scoped_session(
+                sessionmaker(
+                    class_=ReadSession,
+                    router=ReplicaRouter(
+                        primary=self.engine, replicas=[self.replica_engine]
+                    ),
+                ),
+                scopefunc=session_scope,
+            ),
+            ASYNC_SESSION=sessionmaker(
+                self.async_engine, class_=AsyncSession, expire_on_commit=False
+            ),
+            ASYNC_READ_SESSION=sessionmaker(
+                class_=AsyncSession,
+                sync_session_class=ReadSession,
+                router=self.async_router,
+                expire_on_commit=False,
+            ),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.view = async_api_view(ProbeView)
+
+    def on_checkout(self, *args):
+        self.checked_out += 1
+
+    def on_checkin(self, *args):
+        self.checked_out -= 1
+
+    def call(self, request):
+        return async_to_sync(self.view)(request)
+
+    def group_names(self) -> list:
+        with self.engine.connect() as connection:
+            return connection.execute(
+                select(SocialGroup.name).order_by(SocialGroup.name)
+            ).scalars().all()
+
+    def test_get_runs_on_the_async_engines(self):
+        response = self.call(RequestFactory().get("/"))
+
+        self.assertIs(response.data["bind"], self.async_engine.sync_engine)
+        self.assertIs(
+            response.data["read_bind"], self.async_replica_engine.sync_engine
+        )
+        self.assertEqual(response.data["groups"], ["primary"])
+        self.assertEqual(response.data["read_groups"], ["replica"])
+
+    def test_get_reads_fall_back_to_the_primary(self):
+        self.async_router.mark_down(self.async_replica_engine.sync_engine)
+
+        response = self.call(RequestFactory().get("/"))
+
+        self.assertIs(
+            response.data["read_bind"], self.async_engine.sync_engine
+        )
+        self.assertEqual(response.data["read_groups"], ["primary"])
+
+    def test_get_reads_fall_back_from_an_unreachable_replica(self):
+        replica = create_async_engine(
+            "sqlite+aiosqlite:///{}".format(UNREACHABLE)
+        ).sync_engine
+        router = ReplicaRouter(
+            primary=self.async_engine.sync_engine, replicas=[replica]
+        )
+        read_session = sessionmaker(
+            class_=AsyncSession,
+            sync_session_class=ReadSession,
+            router=router,
+            expire_on_commit=False,
+        )
+
+        with override_settings(ASYNC_READ_SESSION=read_session):
+            response = self.call(RequestFactory().get("/"))
+
+        self.assertEqual(response.data["read_groups"], ["primary"])
+        self.assertFalse(router.is_available(replica))
+
+    def test_get_releases_its_sessions(self):
+        self.call(RequestFactory().get("/"))
+
+        self.assertEqual(self.checked_out, 0)
+        self.assertFalse(settings.DB_SESSION.registry.has())
+        self.assertFalse(settings.DB_READ_SESSION.registry.has())
+
+    def test_write_runs_in_a_thread_and_commits(self):
+        response = self.call(RequestFactory().post("/?name=new"))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIs(response.data["bind"], self.engine)
+        self.assertNotEqual(response.data["thread"], threading.get_ident())
+        self.assertEqual(self.group_names(), ["new", "primary"])
+        self.assertEqual(self.checked_out, 0)
+
+    def test_failed_write_is_rolled_back(self):
+        response = self.call(RequestFactory().post("/?name=new&status=400"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.group_names(), ["primary"])
+        self.assertEqual(self.checked_out, 0)
+
+
+class ReadSessionTests(SimpleTestCase):
+    """
+    Reads routed to a replica that cannot be connected to.
+    """
+
+    def setUp(self):
+        self.primary = sqlite_engine(self)
+        with self.primary.begin() as connection:
+            connection.execute(
+                SocialGroup.__table__.insert().values(
+                    code="primary", name="primary"
+                )
+            )
+        self.replica = create_engine("sqlite:///{}".format(UNREACHABLE))
+        self.router = ReplicaRouter(
+            primary=self.primary, replicas=[self.replica]
+        )
+        self.session = ReadSession(router=self.router)
+        self.addCleanup(self.session.close)
+
+    def test_unreachable_replica_is_marked_down(self):
+        self.session.execute(select(SocialGroup.name))
+
+        self.assertFalse(self.router.is_available(self.replica))
+        self.assertIs(self.router.get_read_engine(), self.primary)
+
+    def test_failed_read_is_retried_on_the_primary(self):
+        names = self.session.execute(select(SocialGroup.name)).scalars()
+
+        self.assertEqual(names.all(), ["primary"])
+        self.assertIs(self.session.get_bind(), self.primary)
+
+    def test_primary_errors_are_not_retried(self):
+        unreachable = create_engine("sqlite:///{}".format(UNREACHABLE))
+        session = ReadSession(
+            router=ReplicaRouter(primary=unreachable, replicas=[])
+        )
+        self.addCleanup(session.close)
+
+        with self.assertRaises(OperationalError):
+            session.execute(select(SocialGroup.name))
+
+
+class PasswordHasherTests(SimpleTestCase):
+    """
+    A pool of one worker holding one job at a time, running builtins
+    instead of scrypt.
+    """
+
+    def setUp(self):
+        self.hasher = PasswordHasher(
+            workers=1, max_pending=1, timeout=0.5, n=2, r=1, p=1
+        )
+        self.addCleanup(self.hasher.shutdown)
+        # Start the worker before timing anything
+        self.hasher._run(time.sleep, 0)
+
+    def test_timed_out_job_is_server_busy_and_keeps_its_slot(self):
+        with self.assertRaises(ce.ServerBusy):
+            self.hasher._run(time.sleep, 1.5)
+
+        # Still running in the worker, so the only slot is taken
+        with self.assertRaises(ce.ServerBusy):
+            self.hasher._run(time.sleep, 0)
+
+        time.sleep(1)
+        self.assertIsNone(self.hasher._run(time.sleep, 0))
+
+    def test_crashed_worker_is_server_busy(self):
+        with self.assertRaises(ce.ServerBusy):
+            self.hasher._run(os._exit, 1)
+
+        # A new pool serves the next call
+        self.assertIsNone(self.hasher._run(time.sleep, 0))
+
+
+class CodeTests(SimpleTestCase):
+    def round_trip(self) -> str:
+        """
+        Store a new code and look it up by value, returns the SQLite type it
+        was stored as.
+        """
+        engine = sqlite_engine(self)
+        table = Table("coded", MetaData(), Column("code", Code()))
+        table.create(engine)
+        code = new_code()
+        with engine.begin() as connection:
+            connection.execute(table.insert().values(code=code))
+            read = connection.execute(
+                select(table.c.code).where(table.c.code == code)
+            ).scalar_one()
+            stored = connection.exec_driver_sql(
+                "SELECT typeof(code) FROM coded"
+            ).scalar_one()
+
+        self.assertEqual(read, code)
+        return stored
+
+    @override_settings(CODE_STORAGE="char")
+    def test_char_storage_round_trip(self):
+        self.assertEqual(self.round_trip(), "text")
+
+    @override_settings(CODE_STORAGE="binary")
+    def test_binary_storage_round_trip(self):
+        self.assertEqual(self.round_trip(), "blob")
+
+    def test_uuid7_is_monotonic_within_a_millisecond(self):
+        # More than the 12-bit sequence holds, so some borrow the next ms
+        with mock.patch("time.time_ns", return_value=1_700_000_000_000_000):
+            values = [uuid7() for _ in range(5000)]
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+        self.assertEqual({value.version for value in values}, {7})
+
+    def test_converter_rejects_malformed_codes(self):
+        register_converter(CodeConverter, "code")
+        pattern = path("posts/<code:post_code>", lambda request: None)
+        code = str(uuid.uuid4())
+
+        match = pattern.resolve("posts/{}".format(code.upper()))
+        self.assertEqual(match.kwargs, {"post_code": code})
+        for malformed in ("1", code[:-1], code + "0", code.replace("-", "")):
+            self.assertIsNone(pattern.resolve("posts/{}".format(malformed)))
+
+
+class CursorTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        position = (datetime(2024, 1, 1, 12, 30, 0, 123456), 42)
+
+        cursor = encode_cursor(*position)
+
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), position)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("", "%%%", encode_cursor(datetime.now(), 1)[:-2]):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ce.ValidationFailed):
+                    decode_cursor(cursor)
+
+
+class ThreadLocalValidatorTests(SimpleTestCase):
+    SCHEMA = {"name": {"type": "string", "required": True}}
+
+    def test_threads_keep_their_own_errors(self):
+        validator = ThreadLocalValidator({}, allow_unknown=True)
+        validated = threading.Barrier(2)
+
+        def validate(document):
+            valid = validator.validate(document, self.SCHEMA)
+            # Both have validated before either reads its errors
+            validated.wait(timeout=5)
+            return valid, validator.errors, validator.document
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            invalid = executor.submit(validate, {"name": 1})
+            valid = executor.submit(validate, {"name": "name"})
+
+        self.assertEqual(
+            invalid.result(),
+            (False, {"name": ["must be of string type"]}, {"name": 1}),
+        )
+        self.assertEqual(valid.result(), (True, {}, {"name": "name"}))
@@ -16,11 +16,27 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, register_converter
+
+from social_network.utils.converters import CodeConverter
+from social_network.views import CacheStatsAPIView, DBPoolStatsAPIView
+
+# Registered before the app URLconfs below are included
+register_converter(CodeConverter, "code")
 
 urlpatterns = [
     path("v1/admin/", admin.site.urls),
     path("v1/auth/", include("service_auth.urls")),
     path("v1/user/", include("users.urls")),
     path("v1/ops/", include("operations.urls")),
+    path(
+        "v1/internal/db-pool",
+        DBPoolStatsAPIView.as_view(),
+        name="db-pool-stats",
+    ),
+    path(
+        "v1/internal/cache",
+        CacheStatsAPIView.as_view(),
+        name="cache-stats",
+    ),
 ]
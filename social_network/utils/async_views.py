@@ -0,0 +1,74 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+
+from social_network.middleware import DBSessionMiddleware
+from social_network.utils.db_scope import call_in_session_scope
+from social_network.utils.transactions import finish_request
+
+# Methods served on the async driver, everything else runs in a thread
+ASYNC_METHODS = ("GET", "HEAD")
+
+
+def _call_sync_view(view, request, *args, **kwargs):
+    try:
+        return finish_request(view(request, *args, **kwargs))
+    finally:
+        # The view ran in an executor thread, finish its transaction there
+        DBSessionMiddleware.release_session()
+
+
+def _call_in_request_sessions(
+    sync_session, read_session, view, *args, **kwargs
+):
+    return call_in_session_scope(
+        {
+            settings.DB_SESSION: sync_session,
+            settings.DB_READ_SESSION: read_session,
+        },
+        view,
+        *args,
+        **kwargs,
+    )
+
+
+def async_api_view(view_class):
+    """
+    Wrap an APIView in a native async view.
+
+    Reads run the regular view inside AsyncSession.run_sync, so the request
+    sessions are backed by the async engines and every query awaits the
+    async driver instead of blocking a thread; the read session is routed to
+    a replica like on the sync path. Writes are handed to a thread pool.
+    """
+    view = view_class.as_view()
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ASYNC_METHODS:
+            return await sync_to_async(
+                _call_sync_view, thread_sensitive=False
+            )(view, request, *args, **kwargs)
+
+        async with settings.ASYNC_SESSION() as async_session:
+            async with settings.ASYNC_READ_SESSION() as async_read_session:
+                return await async_session.run_sync(
+                    _call_in_request_sessions,
+                    async_read_session.sync_session,
+                    view,
+                    request,
+                    *args,
+                    **kwargs,
+                )
+
+    return csrf_exempt(async_view)
+
+
+def api_view(view_class):
+    """
+    Return the view used for `view_class` in urlpatterns, async when
+    DB_ASYNC is enabled.
+    """
+    if settings.DB_ASYNC:
+        return async_api_view(view_class)
+
+    return view_class.as_view()
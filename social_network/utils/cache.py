@@ -0,0 +1,101 @@
+"""
+Bounded in-process LRU caches with a time to live, and their hit/miss
+statistics.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+MISSING = object()
+
+# name -> cache with a stats() method, for the statistics endpoint
+_caches: Dict[str, Any] = {}
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """
+    List `cache` under `name` in cache_stats().
+    """
+    _caches[name] = cache
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache holding at most `maxsize` entries, each for at
+    most `ttl` seconds.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        register_cache(name, self)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """
+        Store `value` for `ttl` seconds, the cache's own TTL by default.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Drop every entry whose key matches `predicate`.
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (
+                    round(self.hits / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
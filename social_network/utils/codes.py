@@ -0,0 +1,102 @@
+"""
+Public `code` identifiers: time-ordered UUIDv7 values, stored either as
+their canonical CHAR(36) string or as BINARY(16) (CODE_STORAGE=binary).
+
+The application always sees the canonical string; the Code column type
+converts at the database boundary.
+"""
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from sqlalchemy.types import BINARY, CHAR, TypeDecorator
+
+# Regex of a canonical UUID string, for URL converters
+CODE_PATTERN = (
+    "[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-"
+    "[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+)
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = [0, 0]  # last timestamp (ms), last 12-bit sequence
+
+
+def uuid7() -> uuid.UUID:
+    """
+    UUID version 7: 48 bits of Unix time in milliseconds, a 12-bit sequence
+    and random bits, so values generated later in the process always sort
+    after earlier ones.
+    """
+    with _uuid7_lock:
+        timestamp_ms = max(time.time_ns() // 1_000_000, _uuid7_last[0])
+        if timestamp_ms == _uuid7_last[0]:
+            sequence = _uuid7_last[1] + 1
+            if sequence > 0xFFF:
+                # Sequence exhausted, borrow the next millisecond
+                timestamp_ms += 1
+                sequence = 0
+        else:
+            # Random start leaves room to count up within the millisecond
+            sequence = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        _uuid7_last[:] = [timestamp_ms, sequence]
+
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76  # version
+    value |= sequence << 64
+    value |= 0x2 << 62  # RFC 4122 variant
+    value |= int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=value)
+
+
+def new_code() -> str:
+    return str(uuid7())
+
+
+def code_storage() -> str:
+    """
+    The configured storage mode, "char" until Django settings are loaded.
+    """
+    from django.conf import settings
+
+    if not settings.configured:
+        return "char"
+    return getattr(settings, "CODE_STORAGE", "char")
+
+
+def code_to_bytes(code: str) -> Optional[bytes]:
+    try:
+        return uuid.UUID(code).bytes
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def bytes_to_code(value: bytes) -> str:
+    return str(uuid.UUID(bytes=bytes(value)))
+
+
+class Code(TypeDecorator):
+    """
+    Column type of the `code` columns, CHAR(36) or BINARY(16) depending on
+    CODE_STORAGE, always bound and returned as the canonical string.
+    """
+
+    impl = CHAR(36)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if code_storage() == "binary":
+            return dialect.type_descriptor(BINARY(16))
+        return dialect.type_descriptor(CHAR(36))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or code_storage() != "binary":
+            return value
+        # A malformed code matches nothing, as it would in a CHAR column
+        return code_to_bytes(str(value))
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, (bytes, bytearray)):
+            return bytes_to_code(value)
+        return value
@@ -0,0 +1,16 @@
+from social_network.utils.codes import CODE_PATTERN
+
+
+class CodeConverter:
+    """
+    URL converter for public codes, accepting the canonical UUID string
+    whatever the storage mode.
+    """
+
+    regex = CODE_PATTERN
+
+    def to_python(self, value: str) -> str:
+        return value.lower()
+
+    def to_url(self, value) -> str:
+        return str(value)
@@ -96,3 +96,15 @@ class ErrorMSG(APIException):
     status_code = status.HTTP_400_BAD_REQUEST
     default_detail = "Unable to process the request"
     default_code = "unable_to_process"
+
+
+class TokenRevoked(APIException):
+    status_code = status.HTTP_401_UNAUTHORIZED
+    default_detail = "Access token has been revoked"
+    default_code = "token_revoked"
+
+
+class ServerBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server is busy, please retry shortly"
+    default_code = "server_busy"
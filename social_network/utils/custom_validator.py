@@ -1,5 +1,6 @@
 from cerberus import Validator
 import re
+import threading
 
 
 class CustomValidator(Validator):
@@ -7,3 +8,20 @@ class CustomValidator(Validator):
         """Override the default regex validation error message"""
         if not re.match(regex, value):
             self._error(field, f"Invalid {field}")
+
+
+class ThreadLocalValidator(threading.local):
+    """
+    A validator per thread, built with the given arguments on first use.
+
+    Cerberus validators keep the state of the last call (`document`,
+    `errors`), so with threaded workers a module-level validator shared by
+    concurrent requests would report another request's errors. Reading
+    `errors` right after `validate()` is safe with this one.
+    """
+
+    def __init__(self, *args, validator_class=CustomValidator, **kwargs):
+        self.validator = validator_class(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.validator, name)
@@ -1,6 +1,19 @@
+from social_network.utils.codes import bytes_to_code
+
+
+def format_value(value):
+    # Codes read without the Code column type (BINARY(16) storage)
+    if isinstance(value, (bytes, bytearray)) and len(value) == 16:
+        return bytes_to_code(value)
+    return value
+
+
 def result_list_to_dict(result):
-    return [row._asdict() for row in result]
+    return [result_row_to_dict(row) for row in result]
 
 
 def result_row_to_dict(result_row):
-    return result_row._asdict()
+    return {
+        key: format_value(value)
+        for key, value in result_row._asdict().items()
+    }
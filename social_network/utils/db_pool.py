@@ -0,0 +1,185 @@
+import bisect
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds (in milliseconds) of the checkout latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+PRE_PING_MODES = ("always", "idle", "never")
+
+
+class PoolStats:
+    """
+    Thread-safe counters describing how connections are checked out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record_checkout(self, elapsed: float) -> None:
+        """
+        Record a successful checkout that took `elapsed` seconds.
+        """
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+            self.histogram[bucket] += 1
+
+    def record_timeout(self, elapsed: float) -> None:
+        """
+        Record a checkout that gave up after `elapsed` seconds.
+        """
+        with self._lock:
+            self.timeouts += 1
+            self.total_wait += elapsed
+            self.max_wait = max(self.max_wait, elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = ["<={}ms".format(b) for b in LATENCY_BUCKETS_MS]
+            labels.append(">{}ms".format(LATENCY_BUCKETS_MS[-1]))
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "total_wait_ms": round(self.total_wait * 1000, 3),
+                "avg_wait_ms": (
+                    round(self.total_wait * 1000 / self.checkouts, 3)
+                    if self.checkouts
+                    else 0.0
+                ),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "checkout_latency_histogram": dict(
+                    zip(labels, self.histogram)
+                ),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long callers wait for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # Keep the counters when the engine is disposed and the pool rebuilt
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def install_idle_pre_ping(engine, idle_seconds: int) -> None:
+    """
+    Ping connections on checkout only when they sat idle in the pool for
+    longer than `idle_seconds`, instead of on every checkout.
+    """
+
+    @event.listens_for(engine, "checkin")
+    def mark_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def ping_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if (
+            checked_in_at is None
+            or time.monotonic() - checked_in_at < idle_seconds
+        ):
+            return
+
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            # Don't leave an implicit transaction open before the real BEGIN
+            dbapi_connection.rollback()
+        except Exception:
+            # The pool discards this connection and retries with a new one
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def create_db_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_recycle: int,
+    pool_timeout: int,
+    pre_ping: str = "always",
+    pre_ping_idle: int = 30,
+    **kwargs,
+):
+    """
+    Build an engine backed by an instrumented, explicitly sized pool.
+    """
+    if pre_ping not in PRE_PING_MODES:
+        raise ValueError(
+            "Invalid pre-ping mode {!r}, expected one of {}".format(
+                pre_ping, ", ".join(PRE_PING_MODES)
+            )
+        )
+
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_recycle=pool_recycle,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=(pre_ping == "always"),
+        **kwargs,
+    )
+
+    if pre_ping == "idle":
+        install_idle_pre_ping(engine, pre_ping_idle)
+
+    return engine
+
+
+def pool_status(engine) -> dict:
+    """
+    Describe the current state of an engine's pool.
+    """
+    pool = engine.pool
+    status = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        "timeout": pool.timeout(),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+
+    return status
@@ -0,0 +1,121 @@
+import itertools
+import logging
+import threading
+import time
+from typing import List
+
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+
+# Get an instance of logger
+logger = logging.getLogger("social_network")
+
+ROUTING_STRATEGIES = ("round_robin", "least_busy")
+
+
+class ReplicaRouter:
+    """
+    Pick the engine a read-only session should use.
+
+    Replicas that cannot be connected to or drop their connection are
+    skipped for `retry_after` seconds; when no replica is available reads
+    fall back to the primary.
+    """
+
+    def __init__(
+        self,
+        primary,
+        replicas: List,
+        strategy: str = "round_robin",
+        retry_after: int = 30,
+    ):
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(
+                "Invalid routing strategy {!r}, expected one of {}".format(
+                    strategy, ", ".join(ROUTING_STRATEGIES)
+                )
+            )
+
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self._down_until = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", self._handle_error)
+
+    def _handle_error(self, context) -> None:
+        if context.engine is None:
+            return
+        # No connection means connecting failed (refused, unknown host),
+        # which MySQL does not report as a disconnect
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine) -> None:
+        """
+        Stop routing reads to `engine` for `retry_after` seconds.
+        """
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + self.retry_after
+        logger.error(
+            "READ REPLICA DOWN: {}, retrying in {}s".format(
+                engine.url.host, self.retry_after
+            )
+        )
+
+    def is_available(self, engine) -> bool:
+        if engine is self.primary:
+            return True
+        with self._lock:
+            return self._down_until.get(engine, 0) <= time.monotonic()
+
+    def get_read_engine(self):
+        """
+        Return a healthy replica, or the primary if none is available.
+        """
+        healthy = [r for r in self.replicas if self.is_available(r)]
+        if not healthy:
+            return self.primary
+
+        if self.strategy == "least_busy":
+            return min(healthy, key=lambda r: r.pool.checkedout())
+
+        return healthy[next(self._counter) % len(healthy)]
+
+
+class ReadSession(Session):
+    """
+    Session that routes every statement to an engine chosen by a
+    ReplicaRouter, staying on the same engine while it is healthy.
+
+    A statement that fails because its replica went down is retried once,
+    in a new transaction, on the engine picked next.
+    """
+
+    def __init__(self, router: ReplicaRouter, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self._read_bind = None
+        # Picked up by the transaction policy to open READ ONLY transactions
+        self.info["read_only"] = True
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._read_bind is None or not self.router.is_available(
+            self._read_bind
+        ):
+            self._read_bind = self.router.get_read_engine()
+        return self._read_bind
+
+    def execute(self, *args, **kwargs):
+        bind = self.get_bind()
+        try:
+            return super().execute(*args, **kwargs)
+        except exc.OperationalError:
+            if bind is self.router.primary or self.router.is_available(bind):
+                raise
+            self.rollback()
+            return super().execute(*args, **kwargs)
@@ -0,0 +1,31 @@
+import contextvars
+import threading
+
+# Set while a request is served on the async path, so that the scoped
+# session registries resolve per request instead of per (event loop) thread
+_async_scope = contextvars.ContextVar("db_async_scope", default=None)
+
+
+def session_scope():
+    """
+    Scope function for the session registries: the async request scope when
+    one is active, otherwise the current thread.
+    """
+    scope = _async_scope.get()
+    return scope if scope is not None else threading.get_ident()
+
+
+def call_in_session_scope(sessions, func, *args, **kwargs):
+    """
+    Call `func` with each registry of the `sessions` mapping resolving to
+    its session for the duration of the call.
+    """
+    token = _async_scope.set(object())
+    for registry, session in sessions.items():
+        registry.registry.set(session)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        for registry in sessions:
+            registry.registry.clear()
+        _async_scope.reset(token)
@@ -0,0 +1,75 @@
+"""
+Password hash functions run in the hashing worker processes.
+
+Kept free of Django and project imports so spawned workers start fast.
+Hashes are stored as "scrypt$<n>$<r>$<p>$<salt>$<key>" with base64 salt and
+key; 32 hex characters without a "$" are legacy unsalted MD5 digests.
+"""
+import base64
+import hashlib
+import hmac
+import os
+
+ALGORITHM = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=256 * n * r,
+        dklen=KEY_BYTES,
+    )
+
+
+def hash_password(password: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, n, r, p)
+    return "$".join(
+        [
+            ALGORITHM,
+            str(n),
+            str(r),
+            str(p),
+            base64.b64encode(salt).decode(),
+            base64.b64encode(key).decode(),
+        ]
+    )
+
+
+def is_legacy(encoded: str) -> bool:
+    return "$" not in encoded
+
+
+def verify_legacy(password: str, encoded: str) -> bool:
+    digest = hashlib.md5(str(password).encode()).hexdigest()
+    return hmac.compare_digest(digest, encoded)
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    try:
+        algorithm, n, r, p, salt, key = encoded.split("$")
+    except ValueError:
+        return False
+    if algorithm != ALGORITHM:
+        return False
+
+    expected = base64.b64decode(key)
+    actual = _scrypt(
+        password, base64.b64decode(salt), int(n), int(r), int(p)
+    )
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(encoded: str, n: int, r: int, p: int) -> bool:
+    """
+    Whether the hash is legacy or was made with other cost parameters.
+    """
+    if is_legacy(encoded):
+        return True
+    return encoded.split("$")[1:4] != [str(n), str(r), str(p)]
@@ -0,0 +1,54 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from social_network.utils import custom_exceptions as ce
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Build an opaque cursor pointing at a (created_at, id) keyset position.
+    """
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Read back the (created_at, id) position of a cursor.
+
+    Raises ValidationFailed when the cursor was not produced by encode_cursor.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ce.ValidationFailed(
+            {
+                "message": "Some validations have failed",
+                "data": {"cursor": ["Invalid cursor"]},
+            }
+        )
+
+
+def paginate(
+    rows: List[dict], limit: int
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Split `limit + 1` fetched rows into the page and the next cursor.
+
+    Rows must carry `created_at` and `id` keys; `id` is removed from the
+    returned rows since it is internal.
+    """
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1]["created_at"], page[-1]["id"])
+
+    for row in page:
+        row.pop("id", None)
+
+    return page, next_cursor
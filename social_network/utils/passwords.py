@@ -0,0 +1,126 @@
+"""
+Password hashing service backed by a bounded process pool.
+
+scrypt costs tens of milliseconds of CPU per call, so hashes are computed
+in PASSWORD_HASH_WORKERS worker processes instead of the request thread:
+the GIL stays free for the other requests, and at most
+PASSWORD_HASH_MAX_PENDING hashes are queued or running at once. Callers
+beyond that wait up to PASSWORD_HASH_TIMEOUT seconds for a slot and then
+get a 503, as do callers whose hash takes longer than that or whose worker
+crashed. A slot is freed when its job leaves the pool, not when its caller
+gives up waiting, so abandoned jobs still count against the limit.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from social_network.utils import custom_exceptions as ce
+from social_network.utils import kdf
+
+# Get an instance of logger
+logger = logging.getLogger("social_network")
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        timeout: float,
+        n: int,
+        r: int,
+        p: int,
+    ):
+        self.workers = workers
+        self.timeout = timeout
+        self.cost = (n, r, p)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def hash(self, password: str) -> str:
+        return self._run(kdf.hash_password, str(password), *self.cost)
+
+    def verify(self, password: str, encoded: str) -> bool:
+        if kdf.is_legacy(encoded):
+            # A single MD5 is cheaper than the round trip to a worker
+            return kdf.verify_legacy(password, encoded)
+        return self._run(kdf.verify_password, str(password), encoded)
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return kdf.needs_rehash(encoded, *self.cost)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers do not inherit the server's threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ce.ServerBusy
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BrokenProcessPool as bpp:
+            self._slots.release()
+            raise self._restart(bpp)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Free the slot once the job leaves the pool, even if nobody waits
+        future.add_done_callback(lambda future: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            # Drop the job if it is still queued, a running one keeps its slot
+            future.cancel()
+            logger.error(
+                "PASSWORD HASHER: no result after {}s".format(self.timeout)
+            )
+            raise ce.ServerBusy
+        except BrokenProcessPool as bpp:
+            raise self._restart(bpp)
+
+    def _restart(self, error: BrokenProcessPool) -> ce.ServerBusy:
+        logger.error("PASSWORD HASHER: {}".format(error))
+        # A crashed worker breaks the pool, start a new one next time
+        self.shutdown()
+        return ce.ServerBusy()
+
+
+hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT,
+    n=settings.PASSWORD_SCRYPT_N,
+    r=settings.PASSWORD_SCRYPT_R,
+    p=settings.PASSWORD_SCRYPT_P,
+)
+
+
+def hash_password(password: str) -> str:
+    return hasher.hash(password)
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    return hasher.verify(password, encoded)
+
+
+def needs_rehash(encoded: str) -> bool:
+    return hasher.needs_rehash(encoded)
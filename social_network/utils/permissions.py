@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class IsInternalRequest(BasePermission):
+    """
+    Allow only requests coming from one of INTERNAL_IPS, for the endpoints
+    exposing process internals.
+    """
+
+    message = "Only available from internal addresses"
+
+    def has_permission(self, request, view) -> bool:
+        return request.META.get("REMOTE_ADDR") in settings.INTERNAL_IPS
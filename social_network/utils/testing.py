@@ -0,0 +1,127 @@
+"""
+SQLite stand-ins for the MySQL database, for tests that need tables but no
+server. Each database is a temporary file, so the engines of every thread
+(and the async engines) see the same data.
+"""
+import os
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from sqlalchemy import DefaultClause, MetaData, create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from operations import versions
+from operations.group_directory import group_directory
+from operations.models import Base
+from social_network.utils.cache import _caches
+from social_network.utils.db_router import ReplicaRouter
+
+
+def sqlite_path(test_case) -> str:
+    """
+    Path of a new SQLite database file, removed when `test_case` ends.
+    """
+    descriptor, path = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(descriptor)
+    test_case.addCleanup(os.remove, path)
+    return path
+
+
+def sqlite_engine(test_case, path: str = None):
+    """
+    Engine on a SQLite database holding the tables of the models, disposed
+    when `test_case` ends. Creates a database unless `path` is given.
+    """
+    if path is None:
+        path = sqlite_path(test_case)
+    engine = create_engine("sqlite:///{}".format(path))
+    test_case.addCleanup(engine.dispose)
+
+    # pysqlite opens a transaction before DML but not before a SAVEPOINT,
+    # which would then stand for the whole transaction and commit it when
+    # released; open one first so savepoint() nests as it does on MySQL
+    @event.listens_for(engine, "savepoint")
+    def begin_before_savepoint(connection, name):
+        if not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN")
+
+    with engine.begin() as connection:
+        create_tables(connection)
+    return engine
+
+
+def sqlite_async_engine(test_case, path: str):
+    """
+    aiosqlite engine on the SQLite database at `path`, created by
+    sqlite_engine, disposed when `test_case` ends.
+    """
+    engine = create_async_engine("sqlite+aiosqlite:///{}".format(path))
+    test_case.addCleanup(async_to_sync(engine.dispose))
+    return engine
+
+
+def create_tables(connection) -> None:
+    """
+    Create the tables of the models, replacing the MySQL-only server
+    defaults: timestamps default to CURRENT_TIMESTAMP, codes are always
+    generated by the application.
+    """
+    metadata = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(metadata)
+
+    for table in metadata.sorted_tables:
+        for column in table.columns:
+            if column.server_default is None:
+                continue
+            default = column.server_default.arg.text
+            if default.startswith("CURRENT_TIMESTAMP"):
+                column.server_default = DefaultClause(
+                    text("CURRENT_TIMESTAMP")
+                )
+            elif not default.strip("'").isdigit():
+                column.server_default = None
+
+    metadata.create_all(connection)
+
+
+def use_sqlite(test_case, engine) -> None:
+    """
+    Serve the request sessions (DB_SESSION and DB_READ_SESSION) and the
+    group directory from `engine` until `test_case` ends, with every
+    in-process cache emptied before and after.
+    """
+    registries = {
+        settings.DB_SESSION: {"bind": engine},
+        settings.DB_READ_SESSION: {
+            "router": ReplicaRouter(primary=engine, replicas=[])
+        },
+    }
+    for registry, kwargs in registries.items():
+        registry.remove()
+        saved = {key: registry.session_factory.kw.get(key) for key in kwargs}
+        registry.configure(**kwargs)
+        test_case.addCleanup(registry.configure, **saved)
+        test_case.addCleanup(registry.remove)
+
+    for name, value in (
+        ("engine", engine),
+        ("_groups", {}),
+        ("_committed", {}),
+    ):
+        patcher = mock.patch.object(group_directory, name, value)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+
+    clear_caches()
+    test_case.addCleanup(clear_caches)
+    # Apply the bumps of the test before the engine is disposed
+    test_case.addCleanup(versions.bumper.flush)
+
+
+def clear_caches() -> None:
+    for cache in _caches.values():
+        if hasattr(cache, "clear"):
+            cache.clear()
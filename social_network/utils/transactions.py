@@ -0,0 +1,119 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Get an instance of logger
+logger = logging.getLogger("social_network")
+
+# Requests with these methods run in a single read-only transaction
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_only_request = contextvars.ContextVar(
+    "db_read_only_request", default=False
+)
+
+
+@event.listens_for(Session, "after_begin")
+def start_read_only_transaction(session, transaction, connection):
+    """
+    Open the transaction as READ ONLY for read sessions and safe requests,
+    which lets InnoDB skip read-write transaction bookkeeping. Other
+    databases (SQLite in tests) keep their default transactions.
+    """
+    if transaction.nested or connection.dialect.name != "mysql":
+        return
+    if session.info.get("read_only") or _read_only_request.get():
+        connection.exec_driver_sql("START TRANSACTION READ ONLY")
+
+
+def begin_request(request):
+    """
+    Apply the transaction policy for `request`, returns a token for
+    end_request.
+    """
+    return _read_only_request.set(request.method in READ_ONLY_METHODS)
+
+
+def end_request(token) -> None:
+    _read_only_request.reset(token)
+
+
+def finish_request(response):
+    """
+    Commit the request's write transaction once if the response succeeded,
+    roll it back otherwise. Must run in the thread that served the view.
+    """
+    registry = settings.DB_SESSION
+    if not registry.registry.has():
+        return response
+
+    session = registry()
+    try:
+        if response.status_code < 400 and not _read_only_request.get():
+            session.commit()
+        else:
+            session.rollback()
+    except Exception as e:
+        logger.error("FINISH REQUEST: {}".format(e))
+        session.rollback()
+        return JsonResponse(
+            {"message": "Internal Server Error", "data": None},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    return response
+
+
+@contextmanager
+def savepoint(session):
+    """
+    Run a block in a SAVEPOINT of `session`'s transaction.
+
+    When the block raises, or rolls the savepoint back itself, its writes
+    are undone and the on_commit callbacks it registered are dropped; the
+    rest of the transaction carries on.
+    """
+    callbacks = session.info.setdefault("on_commit", [])
+    mark = len(callbacks)
+    nested = session.begin_nested()
+    try:
+        yield
+    except Exception:
+        if nested.is_active:
+            nested.rollback()
+        del callbacks[mark:]
+        raise
+
+    if nested.is_active:
+        nested.commit()
+    else:
+        del callbacks[mark:]
+
+
+def on_commit(session, callback) -> None:
+    """
+    Run `callback` once the current transaction of `session` commits, it is
+    dropped if the transaction rolls back.
+    """
+    session.info.setdefault("on_commit", []).append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def run_commit_callbacks(session):
+    for callback in session.info.pop("on_commit", []):
+        try:
+            callback()
+        except Exception as e:
+            logger.error("ON COMMIT: {}".format(e))
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def drop_commit_callbacks(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("on_commit", None)
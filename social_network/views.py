@@ -0,0 +1,104 @@
+import logging
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.versioning import NamespaceVersioning
+from rest_framework.views import APIView
+
+from operations import write_behind
+from social_network.utils import custom_exceptions as ce
+from social_network.utils.cache import cache_stats
+from social_network.utils.db_pool import pool_status
+from social_network.utils.permissions import IsInternalRequest
+
+# Get an instance of logger
+logger = logging.getLogger("social_network")
+
+
+class VersioningConfig(NamespaceVersioning):
+    default_version = "v1"
+    allowed_versions = ["v1"]
+    version_param = "version"
+
+
+class DBPoolStatsAPIView(APIView):
+    """
+    Expose connection pool statistics used to size workers.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (IsInternalRequest,)
+
+    def get(self, request):
+        """
+        Retrieve the current pool state and checkout latency statistics.
+        """
+        try:
+            if request.version == "v1":
+                return Response(
+                    {
+                        "message": "Pool statistics found successfully",
+                        "data": {
+                            "primary": pool_status(settings.ENGINE),
+                            "replicas": {
+                                replica.url.host: pool_status(replica)
+                                for replica in settings.REPLICA_ENGINES
+                            },
+                            "async": (
+                                pool_status(settings.ASYNC_ENGINE.sync_engine)
+                                if settings.ASYNC_ENGINE is not None
+                                else None
+                            ),
+                            "write_behind": (
+                                write_behind.get_pipeline().stats()
+                                if settings.WRITE_BEHIND
+                                else None
+                            ),
+                        },
+                    },
+                    status=status.HTTP_200_OK,
+                )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.VersionNotSupported as vns:
+            logger.error("DB POOL STATS API VIEW - GET: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("DB POOL STATS API VIEW - GET: {}".format(e))
+            raise ce.InternalServerError
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Expose the size and hit/miss counts of the in-process caches.
+    """
+
+    versioning_class = VersioningConfig
+    permission_classes = (IsInternalRequest,)
+
+    def get(self, request):
+        """
+        Retrieve the statistics of every in-process cache.
+        """
+        try:
+            if request.version == "v1":
+                return Response(
+                    {
+                        "message": "Cache statistics found successfully",
+                        "data": cache_stats(),
+                    },
+                    status=status.HTTP_200_OK,
+                )
+            else:
+                raise ce.VersionNotSupported
+
+        except ce.VersionNotSupported as vns:
+            logger.error("CACHE STATS API VIEW - GET: {}".format(vns))
+            raise
+
+        except Exception as e:
+            logger.error("CACHE STATS API VIEW - GET: {}".format(e))
+            raise ce.InternalServerError
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'social_network.settings')
 
 application = get_wsgi_application()
+
+# Warm the in-process group directory before the first request
+from operations.group_directory import preload  # noqa: E402
+
+preload()
@@ -8,7 +8,8 @@ CREATE TABLE `social_groups` (
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `deleted_at` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`id`),
-  UNIQUE KEY `name` (`name`)
+  UNIQUE KEY `name` (`name`),
+  UNIQUE KEY `uq_social_groups_code` (`code`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 
@@ -20,12 +21,13 @@ CREATE TABLE `users` (
   `name` varchar(100) NOT NULL,
   `email_address` varchar(100) NOT NULL,
   `password` varchar(255) NOT NULL,
+  `token_version` int NOT NULL DEFAULT '0',
   `last_used` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `deleted_at` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `email_address` (`email_address`),
-  KEY `idx_email_address` (`email_address`)
+  UNIQUE KEY `uq_users_code` (`code`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
 
@@ -40,6 +42,7 @@ CREATE TABLE `group_memberships` (
   PRIMARY KEY (`id`),
   KEY `user_id` (`user_id`),
   KEY `group_id` (`group_id`),
+  KEY `idx_memberships_user_group` (`user_id`,`group_id`,`deleted_at`),
   CONSTRAINT `group_memberships_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
   CONSTRAINT `group_memberships_ibfk_2` FOREIGN KEY (`group_id`) REFERENCES `social_groups` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -53,11 +56,15 @@ CREATE TABLE `posts` (
   `user_id` int DEFAULT NULL,
   `group_id` int DEFAULT NULL,
   `content` text NOT NULL,
+  `like_count` int NOT NULL DEFAULT '0',
+  `comment_count` int NOT NULL DEFAULT '0',
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `deleted_at` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_posts_code` (`code`),
   KEY `user_id` (`user_id`),
   KEY `group_id` (`group_id`),
+  KEY `idx_posts_group_created` (`group_id`,`deleted_at`,`created_at`,`id`),
   CONSTRAINT `posts_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
   CONSTRAINT `posts_ibfk_2` FOREIGN KEY (`group_id`) REFERENCES `social_groups` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -74,8 +81,10 @@ CREATE TABLE `comments` (
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `deleted_at` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_comments_code` (`code`),
   KEY `user_id` (`user_id`),
   KEY `post_id` (`post_id`),
+  KEY `idx_comments_post_created` (`post_id`,`deleted_at`,`created_at`,`id`),
   CONSTRAINT `comments_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
   CONSTRAINT `comments_ibfk_2` FOREIGN KEY (`post_id`) REFERENCES `posts` (`id`)
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -91,8 +100,51 @@ CREATE TABLE `likes` (
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
   `deleted_at` timestamp NULL DEFAULT NULL,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_likes_code` (`code`),
+  UNIQUE KEY `uq_likes_post_user` (`post_id`,`user_id`),
   KEY `user_id` (`user_id`),
   KEY `post_id` (`post_id`),
+  KEY `idx_likes_post_created` (`post_id`,`deleted_at`,`created_at`,`id`),
   CONSTRAINT `likes_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
   CONSTRAINT `likes_ibfk_2` FOREIGN KEY (`post_id`) REFERENCES `posts` (`id`)
-) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
\ No newline at end of file
+) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+
+-- social_network.token_revocations definition
+
+CREATE TABLE `token_revocations` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `token_version` int NOT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `user_id` (`user_id`),
+  KEY `created_at` (`created_at`),
+  CONSTRAINT `token_revocations_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+
+-- social_network.timeline_entries definition
+
+CREATE TABLE `timeline_entries` (
+  `user_id` int NOT NULL,
+  `post_id` int NOT NULL,
+  `group_id` int NOT NULL,
+  `created_at` timestamp NOT NULL,
+  PRIMARY KEY (`user_id`,`post_id`),
+  KEY `post_id` (`post_id`),
+  KEY `group_id` (`group_id`),
+  KEY `idx_timeline_user_created` (`user_id`,`created_at`,`post_id`,`group_id`),
+  CONSTRAINT `timeline_entries_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
+  CONSTRAINT `timeline_entries_ibfk_2` FOREIGN KEY (`post_id`) REFERENCES `posts` (`id`),
+  CONSTRAINT `timeline_entries_ibfk_3` FOREIGN KEY (`group_id`) REFERENCES `social_groups` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+
+-- social_network.resource_versions definition
+
+CREATE TABLE `resource_versions` (
+  `resource` varchar(100) NOT NULL,
+  `version` bigint NOT NULL DEFAULT '0',
+  PRIMARY KEY (`resource`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,4 @@
+-- Keyset pagination of group post listings (newest first)
+
+ALTER TABLE `posts`
+  ADD KEY `idx_posts_group_created` (`group_id`,`deleted_at`,`created_at`,`id`);
@@ -0,0 +1,4 @@
+-- Keyset pagination of post comments (oldest and newest first)
+
+ALTER TABLE `comments`
+  ADD KEY `idx_comments_post_created` (`post_id`,`deleted_at`,`created_at`,`id`);
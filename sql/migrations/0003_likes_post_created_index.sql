@@ -0,0 +1,4 @@
+-- Index-only like totals and keyset pagination of post likers
+
+ALTER TABLE `likes`
+  ADD KEY `idx_likes_post_created` (`post_id`,`deleted_at`,`created_at`,`id`);
@@ -0,0 +1,18 @@
+-- Denormalized live like/comment totals on posts
+
+ALTER TABLE `posts`
+  ADD COLUMN `like_count` int NOT NULL DEFAULT '0' AFTER `content`,
+  ADD COLUMN `comment_count` int NOT NULL DEFAULT '0' AFTER `like_count`;
+
+-- Backfill, `python manage.py reconcile_post_counters` does the same in
+-- batches and can be re-run at any time to repair drift
+UPDATE `posts` p
+SET
+  p.`like_count` = (
+    SELECT COUNT(*) FROM `likes` l
+    WHERE l.`post_id` = p.`id` AND l.`deleted_at` IS NULL
+  ),
+  p.`comment_count` = (
+    SELECT COUNT(*) FROM `comments` c
+    WHERE c.`post_id` = p.`id` AND c.`deleted_at` IS NULL
+  );
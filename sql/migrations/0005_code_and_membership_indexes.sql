@@ -0,0 +1,22 @@
+-- Unique indexes for the public code lookups, a composite index for the
+-- membership checks and removal of the email index duplicating its UNIQUE key.
+-- Creating the unique indexes fails if a table already holds duplicate codes.
+
+ALTER TABLE `social_groups`
+  ADD UNIQUE KEY `uq_social_groups_code` (`code`);
+
+ALTER TABLE `users`
+  ADD UNIQUE KEY `uq_users_code` (`code`),
+  DROP KEY `idx_email_address`;
+
+ALTER TABLE `group_memberships`
+  ADD KEY `idx_memberships_user_group` (`user_id`,`group_id`,`deleted_at`);
+
+ALTER TABLE `posts`
+  ADD UNIQUE KEY `uq_posts_code` (`code`);
+
+ALTER TABLE `comments`
+  ADD UNIQUE KEY `uq_comments_code` (`code`);
+
+ALTER TABLE `likes`
+  ADD UNIQUE KEY `uq_likes_code` (`code`);
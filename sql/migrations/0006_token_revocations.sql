@@ -0,0 +1,15 @@
+-- Token versions and the revocation log read by stateless JWT validation
+
+ALTER TABLE `users`
+  ADD COLUMN `token_version` int NOT NULL DEFAULT '0' AFTER `password`;
+
+CREATE TABLE `token_revocations` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `user_id` int NOT NULL,
+  `token_version` int NOT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `user_id` (`user_id`),
+  KEY `created_at` (`created_at`),
+  CONSTRAINT `token_revocations_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
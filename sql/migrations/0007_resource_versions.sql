@@ -0,0 +1,7 @@
+-- Version stamps behind the ETags of the group, post and user listings
+
+CREATE TABLE `resource_versions` (
+  `resource` varchar(100) NOT NULL,
+  `version` bigint NOT NULL DEFAULT '0',
+  PRIMARY KEY (`resource`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,13 @@
+-- Per-user home feed entries written when a post is created
+
+CREATE TABLE `timeline_entries` (
+  `user_id` int NOT NULL,
+  `post_id` int NOT NULL,
+  `group_id` int NOT NULL,
+  PRIMARY KEY (`user_id`,`post_id`),
+  KEY `post_id` (`post_id`),
+  KEY `group_id` (`group_id`),
+  CONSTRAINT `timeline_entries_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`),
+  CONSTRAINT `timeline_entries_ibfk_2` FOREIGN KEY (`post_id`) REFERENCES `posts` (`id`),
+  CONSTRAINT `timeline_entries_ibfk_3` FOREIGN KEY (`group_id`) REFERENCES `social_groups` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
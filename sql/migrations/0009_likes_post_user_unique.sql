@@ -0,0 +1,29 @@
+-- One like row per user and post, so concurrent toggles cannot insert the
+-- same like twice. Existing duplicates are merged into their oldest row,
+-- live if any of them is; run `python manage.py reconcile_post_counters`
+-- afterwards to fix the like totals they inflated.
+
+UPDATE `likes` l
+JOIN (
+  SELECT MIN(`id`) AS `keep_id`
+  FROM `likes`
+  WHERE `post_id` IS NOT NULL AND `user_id` IS NOT NULL
+  GROUP BY `post_id`, `user_id`
+  HAVING COUNT(*) > 1 AND SUM(`deleted_at` IS NULL) > 0
+) d ON l.`id` = d.`keep_id`
+SET l.`deleted_at` = NULL;
+
+DELETE l FROM `likes` l
+JOIN (
+  SELECT `post_id`, `user_id`, MIN(`id`) AS `keep_id`
+  FROM `likes`
+  WHERE `post_id` IS NOT NULL AND `user_id` IS NOT NULL
+  GROUP BY `post_id`, `user_id`
+  HAVING COUNT(*) > 1
+) d
+  ON l.`post_id` = d.`post_id`
+  AND l.`user_id` = d.`user_id`
+  AND l.`id` <> d.`keep_id`;
+
+ALTER TABLE `likes`
+  ADD UNIQUE KEY `uq_likes_post_user` (`post_id`,`user_id`);
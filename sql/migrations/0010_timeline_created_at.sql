@@ -0,0 +1,13 @@
+-- Home feeds ordered by post creation time, like the group post listing, so
+-- the feed cursor and ORDER BY use the same (created_at, post_id) key
+
+ALTER TABLE `timeline_entries`
+  ADD COLUMN `created_at` timestamp NULL DEFAULT NULL AFTER `group_id`;
+
+UPDATE `timeline_entries` t
+JOIN `posts` p ON p.`id` = t.`post_id`
+SET t.`created_at` = p.`created_at`;
+
+ALTER TABLE `timeline_entries`
+  MODIFY `created_at` timestamp NOT NULL,
+  ADD KEY `idx_timeline_user_created` (`user_id`,`created_at`,`post_id`,`group_id`);
@@ -0,0 +1,49 @@
+-- Store the public codes as BINARY(16) instead of CHAR(36).
+-- Run together with CODE_STORAGE=binary; the application keeps reading and
+-- writing the canonical string form. Existing codes are converted without
+-- swapping, so every code keeps its current string value.
+
+ALTER TABLE `social_groups` ADD COLUMN `code_bin` BINARY(16) NULL AFTER `code`;
+UPDATE `social_groups` SET `code_bin` = UUID_TO_BIN(`code`);
+ALTER TABLE `social_groups`
+  DROP KEY `uq_social_groups_code`,
+  DROP COLUMN `code`;
+ALTER TABLE `social_groups`
+  CHANGE COLUMN `code_bin` `code` BINARY(16) NOT NULL DEFAULT (UUID_TO_BIN(UUID())),
+  ADD UNIQUE KEY `uq_social_groups_code` (`code`);
+
+ALTER TABLE `users` ADD COLUMN `code_bin` BINARY(16) NULL AFTER `code`;
+UPDATE `users` SET `code_bin` = UUID_TO_BIN(`code`);
+ALTER TABLE `users`
+  DROP KEY `uq_users_code`,
+  DROP COLUMN `code`;
+ALTER TABLE `users`
+  CHANGE COLUMN `code_bin` `code` BINARY(16) NOT NULL DEFAULT (UUID_TO_BIN(UUID())),
+  ADD UNIQUE KEY `uq_users_code` (`code`);
+
+ALTER TABLE `posts` ADD COLUMN `code_bin` BINARY(16) NULL AFTER `code`;
+UPDATE `posts` SET `code_bin` = UUID_TO_BIN(`code`);
+ALTER TABLE `posts`
+  DROP KEY `uq_posts_code`,
+  DROP COLUMN `code`;
+ALTER TABLE `posts`
+  CHANGE COLUMN `code_bin` `code` BINARY(16) NOT NULL DEFAULT (UUID_TO_BIN(UUID())),
+  ADD UNIQUE KEY `uq_posts_code` (`code`);
+
+ALTER TABLE `comments` ADD COLUMN `code_bin` BINARY(16) NULL AFTER `code`;
+UPDATE `comments` SET `code_bin` = UUID_TO_BIN(`code`);
+ALTER TABLE `comments`
+  DROP KEY `uq_comments_code`,
+  DROP COLUMN `code`;
+ALTER TABLE `comments`
+  CHANGE COLUMN `code_bin` `code` BINARY(16) NOT NULL DEFAULT (UUID_TO_BIN(UUID())),
+  ADD UNIQUE KEY `uq_comments_code` (`code`);
+
+ALTER TABLE `likes` ADD COLUMN `code_bin` BINARY(16) NULL AFTER `code`;
+UPDATE `likes` SET `code_bin` = UUID_TO_BIN(`code`);
+ALTER TABLE `likes`
+  DROP KEY `uq_likes_code`,
+  DROP COLUMN `code`;
+ALTER TABLE `likes`
+  CHANGE COLUMN `code_bin` `code` BINARY(16) NOT NULL DEFAULT (UUID_TO_BIN(UUID())),
+  ADD UNIQUE KEY `uq_likes_code` (`code`);
@@ -1,21 +1,22 @@
 from django.urls import path
 from users.views import UserAPIView
+from social_network.utils.async_views import api_view
 
 
 urlpatterns = [
     path(
         "fetch",
-        UserAPIView.as_view(),
+        api_view(UserAPIView),
         name="get_user",
     ),
     path(
         "create",
-        UserAPIView.as_view(),
+        api_view(UserAPIView),
         name="create_user",
     ),
     path(
-        "join/<str:group_code>",
-        UserAPIView.as_view(),
+        "join/<code:group_code>",
+        api_view(UserAPIView),
         name="join_group",
     ),
 ]
@@ -1,9 +1,10 @@
-import hashlib
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Union
 import uuid
+from functools import partial
 import sqlalchemy.exc as alchexc
+from sqlalchemy import select
 
 import jwt
 from django.conf import settings
@@ -14,23 +15,33 @@ from rest_framework.versioning import NamespaceVersioning
 from rest_framework.views import APIView
 
 from social_network.utils import custom_exceptions as ce
-from social_network.utils.custom_validator import CustomValidator
+from social_network.utils.custom_validator import ThreadLocalValidator
+from social_network.utils.passwords import hash_password
+from social_network.utils.transactions import on_commit
 from social_network.utils.data_formatter import (
     result_list_to_dict,
     result_row_to_dict,
 )
+from operations import statements, versions
+from operations.feed import backfill_member
+from operations.group_directory import resolve_live_group
+from operations.membership import invalidate_membership
+from service_auth.auth import invalidate_user
 from users import schemas
-from users.models import User, GroupMembership, SocialGroup
+from users.models import User, GroupMembership
 
 # Get an instance of logger
 logger = logging.getLogger("users")
 
 # Get an instance of Custom Validator
-c_validator = CustomValidator({}, allow_unknown=True)
+c_validator = ThreadLocalValidator({}, allow_unknown=True)
 
-# Create DB Session
+# Request-scoped DB session (proxy to the current thread's Session)
 session = settings.DB_SESSION
 
+# Request-scoped read-only session, routed to a read replica when configured
+read_session = settings.DB_READ_SESSION
+
 
 class VersioningConfig(NamespaceVersioning):
     default_version = "v1"
@@ -140,6 +151,10 @@ class UserAPIView(APIView):
             logger.error("USER API VIEW - POST: {}".format(dk))
             raise
 
+        except ce.ServerBusy as sb:
+            logger.error("USER API VIEW - POST: {}".format(sb))
+            raise
+
         except Exception as e:
             logger.error("USER API VIEW - POST: {}".format(e))
             raise ce.InternalServerError
@@ -191,7 +206,7 @@ def create_user_instance(request) -> Response:
         password = request.data["password"]
         email_address = request.data.get("email_address")
 
-        password = hashlib.md5(str(password).encode()).hexdigest()
+        password = hash_password(password)
 
         user = insert_user(
             name=name,
@@ -221,6 +236,9 @@ def create_user_instance(request) -> Response:
     except ce.ValidationFailed as vf:
         logger.error("CREATE USER INSTANCE: {}".format(vf))
         raise
+    except ce.ServerBusy as sb:
+        logger.error("CREATE USER INSTANCE: {}".format(sb))
+        raise
     except Exception as e:
         logger.error("CREATE USER INSTANCE: {}".format(e))
         raise ce.InternalServerError
@@ -237,6 +255,13 @@ def retrieve_user(request) -> Response:
         user_code = request.query_params.get("user_code")
         email_address = request.query_params.get("email_address")
 
+        etag = versions.etag(
+            request, versions.current(read_session, [versions.USERS])
+        )
+        not_modified = versions.not_modified(request, etag)
+        if not_modified:
+            return not_modified
+
         user = fetch_user_details(
             user_code=user_code,
             email_address=email_address,
@@ -248,6 +273,7 @@ def retrieve_user(request) -> Response:
                     "data": user,
                 },
                 status=status.HTTP_200_OK,
+                headers={"ETag": etag},
             )
 
         return Response(
@@ -277,6 +303,7 @@ def join_group(request, group_code) -> Response:
         group_membership = insert_group_membership(
             user_id=request.user["id"],
             group_code=group_code,
+            user_code=request.user["code"],
         )
         if group_membership:
             return Response(
@@ -307,7 +334,7 @@ def join_group(request, group_code) -> Response:
 
 
 def insert_group_membership(
-    user_id: int, group_code: uuid.UUID
+    user_id: int, group_code: uuid.UUID, user_code: str
 ) -> Optional[GroupMembership]:
     """
     Insert a new group membership.
@@ -316,25 +343,12 @@ def insert_group_membership(
     Optional[GroupMembership]: Created GroupMembership or None if failed.
     """
     try:
-        group = (
-            session.query(SocialGroup)
-            .filter(
-                SocialGroup.code == group_code,
-                SocialGroup.deleted_at.is_(None),
-            )
-            .one_or_none()
-        )
+        group = resolve_live_group(session, group_code)
         if not group:
             raise ce.ErrorMSG("Group does not exist")
-        if (
-            session.query(GroupMembership)
-            .filter(
-                GroupMembership.user_id == user_id,
-                GroupMembership.group_id == group.id,
-                GroupMembership.deleted_at.is_(None),
-            )
-            .first()
-        ):
+        if session.execute(
+            statements.live_membership(user_id, group.id)
+        ).first():
             raise ce.ErrorMSG("Already member of group")
 
         membership = GroupMembership(
@@ -342,7 +356,10 @@ def insert_group_membership(
             group_id=group.id,
         )
         session.add(membership)
-        session.commit()
+        versions.bump(session, versions.user_groups(user_code))
+        session.flush()
+        backfill_member(session, user_id, group.id)
+        invalidate_membership(session, user_id, group.id)
 
     except ce.ErrorMSG as em:
         logger.error("INSERT GROUP MEMBERSHIP: {}".format(em))
@@ -374,7 +391,10 @@ def insert_user(
             password=password,
         )
         session.add(user)
-        session.commit()
+        session.flush()
+        versions.bump(session, versions.USERS)
+        # Drop a negative entry left by a token probing this code
+        on_commit(session, partial(invalidate_user, user.code))
 
     except alchexc.IntegrityError as ie:
         logger.error("NSERT USER: {}".format(ie))
@@ -389,6 +409,30 @@ def insert_user(
     return user
 
 
+def user_details(
+    user_id: Optional[int] = None,
+    user_code: Optional[str] = None,
+    name: Optional[str] = None,
+    password: Optional[str] = None,
+    email_address: Optional[str] = None,
+):
+    """
+    Code, name and email address of the users matching every given filter.
+    """
+    query = select(User.code, User.name, User.email_address)
+    if user_id:
+        query = query.where(User.id == user_id)
+    if user_code:
+        query = query.where(User.code == user_code)
+    if name:
+        query = query.where(User.name == name)
+    if password:
+        query = query.where(User.password == password)
+    if email_address:
+        query = query.where(User.email_address == email_address)
+    return query
+
+
 def fetch_user_details(
     user_id: Optional[int] = None,
     user_code: Optional[str] = None,
@@ -403,20 +447,15 @@ def fetch_user_details(
     Optional[User]: User details or None if not found.
     """
     try:
-        query = session.query(User.code, User.name, User.email_address)
-        if user_id:
-            query = query.filter(User.id == user_id)
-        if user_code:
-            query = query.filter(User.code == user_code)
-        if name:
-            query = query.filter(User.name == name)
-        if password:
-            query = query.filter(User.password == password)
-        if email_address:
-            query = query.filter(User.email_address == email_address)
-
-        user = query.one_or_none()
-        session.commit()
+        user = read_session.execute(
+            user_details(
+                user_id=user_id,
+                user_code=user_code,
+                name=name,
+                password=password,
+                email_address=email_address,
+            )
+        ).one_or_none()
 
         user = result_row_to_dict(user) if user else None
 